@@ -0,0 +1,299 @@
+"""This module provides admission control in front of the booking engine.
+
+When prime-time slots open, many members try to book at once. Every booking attempt, the call of
+Client.book made once the client has chosen the time and the length of the reservation, is
+submitted to an AdmissionController instead of being run directly:
+- Each client has a token bucket, so a client retrying in a loop is rejected with the time
+  after which a new attempt is accepted, instead of slowing down the other clients.
+- Admitted attempts wait in a bounded queue. When it is full, new attempts are shed at once.
+- The queue is served round-robin across clients, one attempt per client in turn, so a client
+  with many queued attempts does not delay the others.
+The depth of the queue and the numbers of admitted, completed and rejected attempts are
+available as metrics.
+
+It includes the following classes:
+- TokenBucket: A class limiting the rate of attempts of a single client.
+- BookingRequest: A class representing a booking attempt submitted for admission.
+- AdmissionController: A class admitting, queueing and running booking attempts fairly.
+"""
+
+from collections import deque
+import itertools
+import threading
+from time import monotonic
+
+
+class TokenBucket:
+    """Limits the rate of attempts of a single client.
+
+    The bucket holds up to capacity tokens and gains rate tokens per second.
+    Every attempt takes a token and is rejected if there is none.
+
+    Attributes:
+        rate (float): The number of tokens gained per second.
+        capacity (int): The largest number of tokens, i.e. the number of attempts allowed in a burst.
+
+    Methods:
+        take(self)
+            Takes a token. Returns False if there is none.
+        retry_after(self)
+            Returns the number of seconds until a token is available.
+    """
+
+    __slots__ = ('rate', 'capacity', '_tokens', '_updated', '_clock')
+
+    def __init__(self, rate, capacity, clock=monotonic):
+        """Initializes a new instance of the TokenBucket class. The bucket starts full.
+        Raises ValueError if the rate is not positive or the capacity is less than one.
+        """
+
+        if rate <= 0 or capacity < 1:
+            raise ValueError("The rate must be positive and the capacity at least one.")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        """Adds the tokens gained since the last update."""
+
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self):
+        """Takes a token. Returns False if there is none."""
+
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def retry_after(self):
+        """Returns the number of seconds until a token is available."""
+
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+
+class BookingRequest:
+    """A booking attempt submitted for admission.
+
+    Attributes:
+        request_id (int): The identifier of the request.
+        client (str): The name of the client.
+        status (str): One of 'queued', 'running', 'done', 'failed' or 'rejected'.
+        reason (str): Why the request was rejected, 'rate limited' or 'queue full', None otherwise.
+        retry_after (float): The number of seconds after which a rate limited client may try again.
+        result: The value returned by the booking attempt.
+        error (Exception): The exception raised by the booking attempt, None otherwise.
+
+    Methods:
+        wait(self, timeout)
+            Blocks until the request is finished or rejected. Returns False on timeout.
+        notice(self)
+            Returns a message for the client if the request was rejected, None otherwise.
+    """
+
+    def __init__(self, request_id, client, function):
+        """Initializes a new instance of the BookingRequest class."""
+
+        self.request_id = request_id
+        self.client = client
+        self.status = 'queued'
+        self.reason = None
+        self.retry_after = 0.0
+        self.result = None
+        self.error = None
+        self._function = function
+        self._finished = threading.Event()
+
+    def _reject(self, reason, retry_after=0.0):
+        """Marks the request as rejected."""
+
+        self.status = 'rejected'
+        self.reason = reason
+        self.retry_after = retry_after
+        self._finished.set()
+
+    def _run(self):
+        """Runs the booking attempt and stores its result."""
+
+        self.status = 'running'
+        try:
+            self.result = self._function()
+            self.status = 'done'
+        except Exception as error:
+            self.error = error
+            self.status = 'failed'
+        finally:
+            self._finished.set()
+
+    def wait(self, timeout=None):
+        """Blocks until the request is finished or rejected. Returns False on timeout."""
+
+        return self._finished.wait(timeout)
+
+    def notice(self):
+        """Returns a message for the client if the request was rejected, None otherwise."""
+
+        if self.reason == 'rate limited':
+            return (f"You are trying to book too often. "
+                    f"Please try again in {max(1, round(self.retry_after))} seconds.\n")
+        if self.reason == 'queue full':
+            return "The booking service is busy. Please try again in a moment.\n"
+        return None
+
+
+class AdmissionController:
+    """Admits, queues and runs booking attempts fairly across clients.
+
+    Requests are run by process, on the calling thread, or by a worker thread started with start.
+
+    Attributes:
+        rate (float): The number of attempts per second allowed to each client in the long run.
+        burst (int): The number of attempts a client can make at once.
+        max_queue (int): The number of requests which can wait in the queue.
+
+    Methods:
+        submit(self, client, function)
+            Admits or rejects a booking attempt. Returns a BookingRequest.
+        process(self, limit)
+            Runs queued requests round-robin across clients. Returns the number of requests run.
+        start(self)
+            Starts a worker thread running the queued requests.
+        queue_depth(self)
+            Returns the number of queued requests.
+        metrics(self)
+            Returns a dictionary with the queue depth and the numbers of requests by outcome.
+        report(self)
+            Returns the metrics as a line of text.
+    """
+
+    def __init__(self, rate=0.2, burst=5, max_queue=100, clock=monotonic):
+        """Initializes a new instance of the AdmissionController class.
+        Raises ValueError if the rate is not positive, the burst is less than one or the queue size is negative.
+        """
+
+        if rate <= 0 or burst < 1 or max_queue < 0:
+            raise ValueError("The rate must be positive, the burst at least one and the queue size not negative.")
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self._clock = clock
+        self._buckets = {}
+        # Queued requests of every client, and the clients with queued requests in the order they are served
+        self._queues = {}
+        self._turns = deque()
+        self._depth = 0
+        self._ids = itertools.count(1)
+        self._counts = {'admitted': 0, 'completed': 0, 'failed': 0, 'rate_limited': 0, 'shed': 0}
+        self._peak_depth = 0
+        self._condition = threading.Condition()
+        self._worker = None
+
+    def submit(self, client, function):
+        """Admits or rejects a booking attempt of the client with the given name. Returns a BookingRequest.
+
+        The function makes the attempt and is called without arguments when the request is run.
+        """
+
+        with self._condition:
+            request = BookingRequest(next(self._ids), client, function)
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst, self._clock)
+            if not bucket.take():
+                self._counts['rate_limited'] += 1
+                request._reject('rate limited', bucket.retry_after())
+                return request
+            if self._depth >= self.max_queue:
+                self._counts['shed'] += 1
+                request._reject('queue full')
+                return request
+            self._counts['admitted'] += 1
+            if client not in self._queues:
+                self._queues[client] = deque()
+                self._turns.append(client)
+            self._queues[client].append(request)
+            self._depth += 1
+            self._peak_depth = max(self._peak_depth, self._depth)
+            self._condition.notify()
+        return request
+
+    def _next_request(self):
+        """Removes the next request from the queue, None if it is empty. The client is moved to the end of the turns."""
+
+        with self._condition:
+            if not self._turns:
+                return None
+            client = self._turns.popleft()
+            requests = self._queues[client]
+            request = requests.popleft()
+            if requests:
+                self._turns.append(client)
+            else:
+                del self._queues[client]
+            self._depth -= 1
+            return request
+
+    def _run(self, request):
+        """Runs a request and counts its outcome."""
+
+        request._run()
+        with self._condition:
+            self._counts['completed' if request.status == 'done' else 'failed'] += 1
+
+    def process(self, limit=None):
+        """Runs queued requests round-robin across clients, until the queue is empty or limit requests were run.
+        Returns the number of requests run.
+        """
+
+        processed = 0
+        while limit is None or processed < limit:
+            request = self._next_request()
+            if request is None:
+                break
+            self._run(request)
+            processed += 1
+        return processed
+
+    def start(self):
+        """Starts a worker thread running the queued requests until the program exits."""
+
+        with self._condition:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, daemon=True)
+                self._worker.start()
+
+    def _work(self):
+        """Runs the queued requests, waiting for new ones when the queue is empty."""
+
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._depth > 0)
+            self.process()
+
+    def queue_depth(self):
+        """Returns the number of queued requests."""
+
+        return self._depth
+
+    def metrics(self):
+        """Returns a dictionary with the queue depth, its peak, the number of clients waiting
+        and the numbers of requests admitted, completed, failed, rate limited and shed.
+        """
+
+        with self._condition:
+            return dict(self._counts, queue_depth=self._depth, peak_queue_depth=self._peak_depth,
+                        clients_waiting=len(self._turns))
+
+    def report(self):
+        """Returns the metrics as a line of text."""
+
+        metrics = self.metrics()
+        return (f"{metrics['admitted']} booking attempts admitted, {metrics['completed']} completed, "
+                f"{metrics['failed']} failed, {metrics['rate_limited']} rate limited, {metrics['shed']} shed; "
+                f"queue depth {metrics['queue_depth']} (peak {metrics['peak_queue_depth']}).")
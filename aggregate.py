@@ -0,0 +1,104 @@
+"""This module provides a base class of subscribers keeping aggregates of all reservations.
+
+The aggregates are computed from the current reservations and the reservations of Reservation.store
+once, then updated from the events published when reservations are made and cancelled. Reservations
+kept in a store and not loaded into memory are counted as well, and loading or unloading them does
+not change the aggregates.
+
+It includes the following class:
+- ReservationAggregate: A base class of subscribers keeping aggregates of all reservations.
+"""
+
+from datetime import date
+
+from events import ReservationCancelled, ReservationCreated, ReservationLoaded
+from reservation import Reservation
+
+
+class ReservationAggregate:
+    """A base class of subscribers keeping aggregates of all reservations, in memory or in the store.
+
+    The reservations of days which are in the store only are kept, so when such a day is loaded,
+    the reservations counted from the store are replaced by the loaded ones. Cancellations of
+    reservations which were never counted are ignored.
+
+    Subclasses implement _add, _remove and _counted, which receive events about a single reservation.
+
+    Methods:
+        close(self)
+            Stops updating the aggregates.
+        _add(self, event)
+            Adds the reservation of the event to the aggregates.
+        _remove(self, event)
+            Subtracts the reservation of the event from the aggregates.
+        _counted(self, event)
+            Checks if the reservation of the event is counted in the aggregates.
+        _cancel(self, event)
+            Subtracts a cancelled reservation from the aggregates.
+    """
+
+    def __init__(self, events=None):
+        """Counts the current reservations and the reservations of the store, and subscribes to the bus.
+        Subclasses initialize their aggregates before calling it.
+
+        The events of Reservation.events are used if no bus is given.
+        """
+
+        # Maps days which are not in memory to the events of the reservations counted from the store
+        self._stored = {}
+        self._events = events if events is not None else Reservation.events
+        snapshot = Reservation.snapshot()
+        for day in snapshot.dates():
+            for reservation in snapshot.reservations_on(day):
+                self._add(ReservationCreated.of(0, reservation))
+        if Reservation.store is not None:
+            for day, records in Reservation.store.stored_between(date.min, date.max).items():
+                self._stored[day] = [ReservationLoaded(0, day, start_time, end_time, name)
+                                     for name, start_time, end_time in records]
+                for event in self._stored[day]:
+                    self._add(event)
+        self._events.subscribe(self)
+
+    def close(self):
+        """Stops updating the aggregates."""
+
+        self._events.unsubscribe(self)
+
+    def _add(self, event):
+        """Adds the reservation of the event to the aggregates."""
+
+        raise NotImplementedError
+
+    def _remove(self, event):
+        """Subtracts the reservation of the event from the aggregates."""
+
+        raise NotImplementedError
+
+    def _counted(self, event):
+        """Checks if the reservation of the event is counted in the aggregates."""
+
+        raise NotImplementedError
+
+    def _cancel(self, event):
+        """Subtracts a cancelled reservation from the aggregates. Subclasses counting cancellations extend it."""
+
+        self._remove(event)
+
+    def __call__(self, events):
+        """Updates the aggregates with a list of events."""
+
+        for event in events:
+            if isinstance(event, ReservationCreated):
+                self._add(event)
+            elif isinstance(event, ReservationCancelled):
+                if self._counted(event):
+                    self._cancel(event)
+            elif isinstance(event, ReservationLoaded):
+                for stored in self._stored.pop(event.date, ()):
+                    self._remove(stored)
+                self._add(event)
+            elif Reservation.store is not None and not Reservation.store.is_loaded(event.date):
+                # An unloaded reservation stays counted, as a reservation of the store
+                self._stored.setdefault(event.date, []).append(event)
+            elif self._counted(event):
+                self._remove(event)
@@ -0,0 +1,176 @@
+"""This module provides running statistics of the clients and leaderboard queries.
+
+The statistics are updated from the events published when reservations are made and cancelled,
+so reports and fair-use checks do not iterate the reservations of every client. Reservations kept
+in a store and not loaded into memory are counted as well, and loading or unloading them
+does not change the statistics.
+
+It includes the following classes:
+- ClientRecord: A class holding the running aggregates of a single client.
+- ClientStatistics: A class maintaining the aggregates of all clients and sorted indexes for top-K queries.
+"""
+
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime
+
+from aggregate import ReservationAggregate
+from opening_hours import MINUTES_PER_DAY, minute_of_day
+
+
+class ClientRecord:
+    """The running aggregates of a single client.
+
+    Attributes:
+        name (str): The name of the client.
+        total_minutes (int): The number of minutes of all reservations.
+        bookings (int): The number of reservations.
+        cancellations (int): The number of cancelled reservations.
+        per_week (Counter): The number of reservations per (ISO year, ISO week) pair.
+        per_month (Counter): The number of reservations per (year, month) pair.
+        starts (list): The sorted start date and times of the reservations.
+    """
+
+    __slots__ = ('name', 'total_minutes', 'bookings', 'cancellations', 'per_week', 'per_month', 'starts')
+
+    def __init__(self, name):
+        """Initializes a new instance of the ClientRecord class."""
+
+        self.name = name
+        self.total_minutes = 0
+        self.bookings = 0
+        self.cancellations = 0
+        self.per_week = Counter()
+        self.per_month = Counter()
+        self.starts = []
+
+    def last_booking(self):
+        """Returns the start of the latest reservation of the client, None if there are none."""
+
+        return self.starts[-1] if self.starts else None
+
+    def __repr__(self):
+        """Returns a string representation of the record."""
+
+        return f"ClientRecord({self.name}, {self.total_minutes} minutes, {self.bookings} bookings)"
+
+
+class ClientStatistics(ReservationAggregate):
+    """Maintains the aggregates of all clients and sorted indexes for top-K queries.
+
+    The aggregates are computed from the current reservations and the reservations of
+    Reservation.store once, then updated by the events of the given bus, see ReservationAggregate.
+    Each index is a sorted list of (negated value, name) pairs, so top-K queries slice the first K entries.
+
+    Methods:
+        record(self, name)
+            Returns the aggregates of the client with the given name.
+        top_by_minutes(self, k)
+            Returns the K clients with the most minutes booked.
+        top_by_cancellations(self, k)
+            Returns the K clients with the most cancelled reservations.
+        bookings_in_week(self, name, date)
+            Returns the number of reservations of the client in the week of the given date.
+        bookings_in_month(self, name, date)
+            Returns the number of reservations of the client in the month of the given date.
+        close(self)
+            Stops updating the statistics, see ReservationAggregate.
+    """
+
+    def __init__(self, events=None):
+        """Initializes a new instance of the ClientStatistics class and subscribes it to the bus.
+
+        The events of Reservation.events are used if no bus is given.
+        """
+
+        self._records = {}
+        self._by_minutes = []
+        self._by_cancellations = []
+        super().__init__(events)
+
+    def record(self, name):
+        """Returns the aggregates of the client with the given name."""
+
+        return self._records.get(name) or ClientRecord(name)
+
+    def _record(self, name):
+        """Returns the aggregates of the client with the given name, creating them if needed."""
+
+        record = self._records.get(name)
+        if record is None:
+            record = self._records[name] = ClientRecord(name)
+            insort(self._by_minutes, (0, name))
+            insort(self._by_cancellations, (0, name))
+        return record
+
+    @staticmethod
+    def _move(index, name, old_value, new_value):
+        """Moves a client to its new place in a sorted index."""
+
+        del index[bisect_left(index, (-old_value, name))]
+        insort(index, (-new_value, name))
+
+    def _counted(self, event):
+        """Checks if the reservation of the event is counted in the aggregates."""
+
+        record = self._records.get(event.client)
+        if record is None:
+            return False
+        start = datetime.combine(event.date, event.start_time)
+        index = bisect_left(record.starts, start)
+        return index < len(record.starts) and record.starts[index] == start
+
+    def _add(self, event):
+        """Adds the reservation of the event to the aggregates."""
+
+        record = self._record(event.client)
+        insort(record.starts, datetime.combine(event.date, event.start_time))
+        self._change(record, event, 1)
+
+    def _remove(self, event):
+        """Subtracts the reservation of the event from the aggregates."""
+
+        record = self._records[event.client]
+        del record.starts[bisect_left(record.starts, datetime.combine(event.date, event.start_time))]
+        self._change(record, event, -1)
+
+    def _change(self, record, event, sign):
+        """Adds the minutes and the counts of the reservation of the event to the record, or subtracts them
+        if sign is -1.
+        """
+
+        # Reservations ending after midnight are counted as well
+        minutes = (minute_of_day(event.end_time) - minute_of_day(event.start_time)) % MINUTES_PER_DAY
+        self._move(self._by_minutes, record.name, record.total_minutes, record.total_minutes + sign * minutes)
+        record.total_minutes += sign * minutes
+        record.bookings += sign
+        record.per_week[event.date.isocalendar()[:2]] += sign
+        record.per_month[(event.date.year, event.date.month)] += sign
+
+    def _cancel(self, event):
+        """Subtracts a cancelled reservation from the aggregates and counts the cancellation."""
+
+        super()._cancel(event)
+        record = self._records[event.client]
+        self._move(self._by_cancellations, record.name, record.cancellations, record.cancellations + 1)
+        record.cancellations += 1
+
+    def top_by_minutes(self, k):
+        """Returns a list of (name, minutes) pairs of the K clients with the most minutes booked."""
+
+        return [(name, -minutes) for minutes, name in self._by_minutes[:k]]
+
+    def top_by_cancellations(self, k):
+        """Returns a list of (name, cancellations) pairs of the K clients with the most cancelled reservations."""
+
+        return [(name, -cancellations) for cancellations, name in self._by_cancellations[:k]]
+
+    def bookings_in_week(self, name, date):
+        """Returns the number of reservations of the client in the week of the given date."""
+
+        return self.record(name).per_week[date.isocalendar()[:2]]
+
+    def bookings_in_month(self, name, date):
+        """Returns the number of reservations of the client in the month of the given date."""
+
+        return self.record(name).per_month[(date.year, date.month)]
@@ -0,0 +1,141 @@
+"""This module parses the dates and times entered by users and read by importers.
+
+Dates are given as DD.MM.YY or DD.MM.YYYY, optionally followed by a time as HH:MM.
+The parser splits the text with string methods and builds the date directly, which is
+much faster than trying datetime.strptime with a two-digit and then a four-digit year.
+Recently parsed texts are memoized, as replayed sessions and imports repeat the same dates.
+
+The parser accepts the same texts as the strptime formats "%d.%m.%y", "%d.%m.%Y", "%d.%m.%y %H:%M"
+and "%d.%m.%Y %H:%M": one or two digit days, months, hours and minutes, and two-digit years
+from 1969 to 2068.
+
+It includes the following functions:
+- normalize_separators: Replaces the separators users type in dates with dots.
+- parse_date: Returns the date of a DD.MM.YY(YY) text.
+- parse_date_time: Returns the date and time of a DD.MM.YY(YY) HH:MM text.
+- benchmark: Compares the parser with the strptime formats.
+
+Run this module to see the benchmark: `python date_parser.py`.
+"""
+
+from datetime import date, datetime
+from functools import lru_cache
+import random
+from timeit import timeit
+
+CACHE_SIZE = 1024
+
+
+def normalize_separators(text):
+    """Replaces the '/' and '-' separators users type in dates with dots and strips the text."""
+
+    return text.replace('/', '.').replace('-', '.').strip()
+
+
+def _number(text, lengths):
+    """Returns the number written with the given numbers of ASCII digits, None otherwise."""
+
+    if len(text) not in lengths or not text.isascii() or not text.isdigit():
+        return None
+    return int(text)
+
+
+def _date_fields(text):
+    """Returns the (year, month, day) numbers of a DD.MM.YY(YY) text, None if the text is not in this format."""
+
+    parts = text.split('.')
+    if len(parts) != 3:
+        return None
+    day = _number(parts[0], (1, 2))
+    month = _number(parts[1], (1, 2))
+    year = _number(parts[2], (2, 4))
+    if day is None or month is None or year is None:
+        return None
+    if len(parts[2]) == 2:
+        year += 1900 if year >= 69 else 2000
+    return year, month, day
+
+
+def _time_fields(text):
+    """Returns the (hour, minute) numbers of a HH:MM text, None if the text is not in this format."""
+
+    parts = text.split(':')
+    if len(parts) != 2:
+        return None
+    hour = _number(parts[0], (1, 2))
+    minute = _number(parts[1], (1, 2))
+    if hour is None or minute is None:
+        return None
+    return hour, minute
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_date(text):
+    """Returns the date of a DD.MM.YY(YY) text, None if the text is not a valid date."""
+
+    fields = _date_fields(text)
+    if fields is None:
+        return None
+    try:
+        return date(*fields)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_date_time(text):
+    """Returns the datetime of a DD.MM.YY(YY) HH:MM text, None if the text is not a valid date and time.
+    The date and the time are separated by whitespace.
+    """
+
+    parts = text.split()
+    if len(parts) != 2:
+        return None
+    date_fields = _date_fields(parts[0])
+    time_fields = _time_fields(parts[1])
+    if date_fields is None or time_fields is None:
+        return None
+    try:
+        return datetime(*date_fields, *time_fields)
+    except ValueError:
+        return None
+
+
+def _strptime_date_time(text):
+    """Parses a date and time with the strptime formats Session used before this module."""
+
+    try:
+        return datetime.strptime(text, "%d.%m.%y %H:%M")
+    except ValueError:
+        try:
+            return datetime.strptime(text, "%d.%m.%Y %H:%M")
+        except ValueError:
+            return None
+
+
+def benchmark(count=20000, distinct=500):
+    """Reports the time to parse dates and times with the parser, with and without the cache,
+    and with the strptime formats.
+    """
+
+    generator = random.Random(0)
+    texts = [f"{generator.randint(1, 28):02}.{generator.randint(1, 12):02}."
+             f"{generator.choice(('', '20'))}{generator.randint(24, 40)} "
+             f"{generator.randint(8, 21):02}:{generator.choice(('00', '30'))}" for _ in range(distinct)]
+    texts = [generator.choice(texts) for _ in range(count)]
+    assert all(parse_date_time(text) == _strptime_date_time(text) for text in texts)
+
+    def uncached():
+        parse_date_time.cache_clear()
+        for text in texts:
+            parse_date_time.__wrapped__(text)
+
+    results = (("strptime", timeit(lambda: [_strptime_date_time(text) for text in texts], number=1)),
+               ("parser without cache", timeit(uncached, number=1)),
+               ("parser with cache", timeit(lambda: [parse_date_time(text) for text in texts], number=1)))
+    for name, elapsed in results:
+        print(f"{name:>20}: {count} texts in {elapsed * 1000:.1f} ms, {elapsed / count * 1e6:.2f} µs per text")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,345 @@
+"""This module provides per-day aggregates of the schedule and range queries over them.
+
+Dashboards ask for the number of reservations and the booked minutes of the next 90 days,
+or of the last year. The aggregates of every day are updated from the events published when
+reservations are made and cancelled, and kept in Fenwick trees indexed by the ordinal of the day,
+so the totals of any date range are two prefix sums in O(log D) operations, where D is the number
+of days covered, instead of a pass over the reservations of every day. Reservations kept in a store
+and not loaded into memory are counted as well, and loading or unloading them does not change the aggregates.
+
+It includes the following classes and function:
+- FenwickTree: A class keeping prefix sums of a list of numbers under updates.
+- DaySummary: A class holding the aggregates of a single day.
+- ScheduleAggregates: A class maintaining the aggregates of all days and answering range queries.
+- benchmark: Compares range totals of the aggregates with a pass over the schedule snapshot.
+
+Run this module to see the benchmark: `python day_aggregates.py`.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, time, timedelta
+import random
+from timeit import timeit
+
+from aggregate import ReservationAggregate
+from isolation import isolated_state
+from opening_hours import MINUTES_PER_DAY, minute_of_day
+from reservation import Reservation
+
+INITIAL_DAYS = 64
+
+
+def _minutes(event):
+    """Returns the length of a reservation in minutes. Reservations ending after midnight are counted as well."""
+
+    return (minute_of_day(event.end_time) - minute_of_day(event.start_time)) % MINUTES_PER_DAY
+
+
+class FenwickTree:
+    """Keeps prefix sums of a list of numbers under updates, both in O(log N) operations.
+
+    Methods:
+        from_values(cls, values)
+            Returns a tree holding the given numbers, built in O(N) operations.
+        add(self, index, delta)
+            Adds delta to the number with the given index.
+        prefix(self, index)
+            Returns the sum of the numbers before the given index.
+        range_sum(self, start, stop)
+            Returns the sum of the numbers from index start up to, but not including, index stop.
+    """
+
+    __slots__ = ('_tree',)
+
+    def __init__(self, size):
+        """Initializes a new instance of the FenwickTree class holding size zeros."""
+
+        self._tree = [0] * (size + 1)
+
+    @classmethod
+    def from_values(cls, values):
+        """Returns a tree holding the given numbers, built in O(N) operations."""
+
+        tree = cls(len(values))
+        nodes = tree._tree
+        nodes[1:] = values
+        for index in range(1, len(nodes)):
+            parent = index + (index & -index)
+            if parent < len(nodes):
+                nodes[parent] += nodes[index]
+        return tree
+
+    def __len__(self):
+        """Returns the number of numbers in the tree."""
+
+        return len(self._tree) - 1
+
+    def add(self, index, delta):
+        """Adds delta to the number with the given index."""
+
+        nodes = self._tree
+        index += 1
+        while index < len(nodes):
+            nodes[index] += delta
+            index += index & -index
+
+    def prefix(self, index):
+        """Returns the sum of the numbers before the given index."""
+
+        nodes = self._tree
+        index = max(0, min(index, len(nodes) - 1))
+        total = 0
+        while index:
+            total += nodes[index]
+            index -= index & -index
+        return total
+
+    def range_sum(self, start, stop):
+        """Returns the sum of the numbers from index start up to, but not including, index stop."""
+
+        return self.prefix(stop) - self.prefix(start) if start < stop else 0
+
+
+class DaySummary:
+    """The aggregates of a single day.
+
+    Attributes:
+        date (date): The day.
+        count (int): The number of reservations starting on the day.
+        minutes (int): The number of minutes booked by these reservations.
+        first (time): The start time of the earliest reservation, None if there are none.
+        last (time): The start time of the latest reservation, None if there are none.
+    """
+
+    __slots__ = ('date', 'count', 'minutes', 'first', 'last')
+
+    def __init__(self, date, count=0, minutes=0, first=None, last=None):
+        """Initializes a new instance of the DaySummary class."""
+
+        self.date = date
+        self.count = count
+        self.minutes = minutes
+        self.first = first
+        self.last = last
+
+    def __eq__(self, other):
+        """Checks if two summaries hold the same aggregates."""
+
+        if not isinstance(other, DaySummary):
+            return NotImplemented
+        return ((self.date, self.count, self.minutes, self.first, self.last)
+                == (other.date, other.count, other.minutes, other.first, other.last))
+
+    def __repr__(self):
+        """Returns a string representation of the summary."""
+
+        return f"DaySummary({self.date}, {self.count} reservations, {self.minutes} minutes)"
+
+
+class ScheduleAggregates(ReservationAggregate):
+    """Maintains the aggregates of all days and answers date range queries.
+
+    The aggregates are computed from the current reservations and the days of the store once,
+    then updated by the events of the given bus, see ReservationAggregate. The counts and minutes
+    of the days are kept in two Fenwick trees over the ordinals of a span of days, which doubles
+    when a reservation falls outside of it. The start
+    times of every day are kept sorted, and the days with reservations are kept in a sorted list,
+    so the first and the last booking of a range are found by bisection.
+
+    Methods:
+        totals(self, date_start, date_end)
+            Returns the number of reservations and the booked minutes in the date range.
+        day(self, date)
+            Returns the aggregates of the given day.
+        days(self, date_start, date_end)
+            Returns the aggregates of the days with reservations in the date range.
+        first_booking(self, date_start, date_end)
+            Returns the start of the earliest reservation in the date range.
+        last_booking(self, date_start, date_end)
+            Returns the start of the latest reservation in the date range.
+        close(self)
+            Stops updating the aggregates, see ReservationAggregate.
+    """
+
+    def __init__(self, events=None):
+        """Initializes a new instance of the ScheduleAggregates class and subscribes it to the bus.
+
+        The events of Reservation.events are used if no bus is given.
+        """
+
+        # Ordinal of the day at index 0 of the trees, None until the first reservation
+        self._origin = None
+        self._counts = FenwickTree(0)
+        self._minutes = FenwickTree(0)
+        self._day_minutes = {}
+        self._starts = {}
+        self._booked = []
+        super().__init__(events)
+
+    def _index(self, ordinal):
+        """Returns the index of the day with the given ordinal in the trees, growing them if needed."""
+
+        if self._origin is None:
+            self._origin = ordinal - INITIAL_DAYS // 2
+            self._resize(self._origin, INITIAL_DAYS)
+        size = len(self._counts)
+        if not self._origin <= ordinal < self._origin + size:
+            start = min(self._origin, ordinal)
+            stop = max(self._origin + size, ordinal + 1)
+            while size < stop - start:
+                size *= 2
+            # The span grows away from the day that did not fit, so later days on that side fit as well
+            self._resize(stop - size if ordinal < self._origin else start, size)
+        return ordinal - self._origin
+
+    def _resize(self, origin, size):
+        """Rebuilds the trees over size days starting at the day with the given ordinal."""
+
+        counts = [0] * size
+        minutes = [0] * size
+        for ordinal, starts in self._starts.items():
+            counts[ordinal - origin] = len(starts)
+            minutes[ordinal - origin] = self._day_minutes[ordinal]
+        self._origin = origin
+        self._counts = FenwickTree.from_values(counts)
+        self._minutes = FenwickTree.from_values(minutes)
+
+    def _counted(self, event):
+        """Checks if the reservation of the event is counted in the aggregates."""
+
+        starts = self._starts.get(event.date.toordinal())
+        if starts is None:
+            return False
+        start = minute_of_day(event.start_time)
+        index = bisect_left(starts, start)
+        return index < len(starts) and starts[index] == start
+
+    def _add(self, event):
+        """Adds the reservation of the event to the aggregates."""
+
+        ordinal = event.date.toordinal()
+        # The trees are rebuilt from the start times if they grow, so the day is indexed before it changes
+        index = self._index(ordinal)
+        starts = self._starts.get(ordinal)
+        if starts is None:
+            starts = self._starts[ordinal] = []
+            self._day_minutes[ordinal] = 0
+            insort(self._booked, ordinal)
+        insort(starts, minute_of_day(event.start_time))
+        self._change(ordinal, index, 1, _minutes(event))
+
+    def _remove(self, event):
+        """Subtracts the reservation of the event from the aggregates."""
+
+        ordinal = event.date.toordinal()
+        starts = self._starts[ordinal]
+        del starts[bisect_left(starts, minute_of_day(event.start_time))]
+        self._change(ordinal, self._index(ordinal), -1, -_minutes(event))
+        if not starts:
+            del self._starts[ordinal], self._day_minutes[ordinal]
+            del self._booked[bisect_left(self._booked, ordinal)]
+
+    def _change(self, ordinal, index, count, minutes):
+        """Adds the given count and minutes to the totals of the day with the given ordinal and index."""
+
+        self._day_minutes[ordinal] += minutes
+        self._counts.add(index, count)
+        self._minutes.add(index, minutes)
+
+    def _indexes(self, date_start, date_end):
+        """Returns the start and stop indexes of the date range in the trees."""
+
+        return date_start.toordinal() - self._origin, date_end.toordinal() + 1 - self._origin
+
+    def totals(self, date_start, date_end):
+        """Returns a (count, minutes) pair with the number of reservations starting in the date range
+        and the minutes booked by them.
+        """
+
+        if self._origin is None:
+            return 0, 0
+        start, stop = self._indexes(date_start, date_end)
+        return self._counts.range_sum(start, stop), self._minutes.range_sum(start, stop)
+
+    def day(self, date):
+        """Returns the DaySummary of the given day."""
+
+        ordinal = date.toordinal()
+        starts = self._starts.get(ordinal)
+        if not starts:
+            return DaySummary(date)
+        return DaySummary(date, len(starts), self._day_minutes[ordinal], self._time(starts[0]), self._time(starts[-1]))
+
+    def days(self, date_start, date_end):
+        """Returns a list of DaySummary of the days with reservations in the date range, in order of the days."""
+
+        booked = self._booked
+        return [self.day(date.fromordinal(ordinal))
+                for ordinal in booked[bisect_left(booked, date_start.toordinal()):
+                                      bisect_right(booked, date_end.toordinal())]]
+
+    @staticmethod
+    def _time(minute):
+        """Returns the time at the given number of minutes from midnight."""
+
+        return time(minute // 60, minute % 60)
+
+    def first_booking(self, date_start, date_end):
+        """Returns the start of the earliest reservation in the date range, None if there are none."""
+
+        position = bisect_left(self._booked, date_start.toordinal())
+        if position == len(self._booked) or self._booked[position] > date_end.toordinal():
+            return None
+        ordinal = self._booked[position]
+        return datetime.combine(date.fromordinal(ordinal), self._time(self._starts[ordinal][0]))
+
+    def last_booking(self, date_start, date_end):
+        """Returns the start of the latest reservation in the date range, None if there are none."""
+
+        position = bisect_right(self._booked, date_end.toordinal())
+        if position == 0 or self._booked[position - 1] < date_start.toordinal():
+            return None
+        ordinal = self._booked[position - 1]
+        return datetime.combine(date.fromordinal(ordinal), self._time(self._starts[ordinal][-1]))
+
+
+def benchmark(days=3650, reservations=50000, queries=200):
+    """Reports the time to compute the totals of random date ranges with the aggregates
+    and with a pass over the schedule snapshot.
+    """
+
+    generator = random.Random(0)
+    first_day = date(2099, 1, 1)
+    records = [(first_day + timedelta(days=generator.randrange(days)), f"Member{index % 500} Surname",
+                time(generator.randint(6, 21), generator.choice((0, 30))), None)
+               for index in range(reservations)]
+    records = [(day, name, start, time(start.hour + 1, start.minute)) for day, name, start, _ in records]
+    ranges = [sorted(first_day + timedelta(days=generator.randrange(days)) for _ in range(2))
+              for _ in range(queries)]
+
+    with isolated_state():
+        Reservation.load_records(records)
+        aggregates = ScheduleAggregates()
+        try:
+            def scan(date_start, date_end):
+                snapshot = Reservation.snapshot()
+                count = minutes = 0
+                for day in snapshot.dates_between(date_start, date_end):
+                    for reservation in snapshot.reservations_on(day):
+                        count += 1
+                        minutes += _minutes(reservation)
+                return count, minutes
+
+            assert all(aggregates.totals(*dates) == scan(*dates) for dates in ranges[:100])
+            results = (("snapshot pass", timeit(lambda: [scan(*dates) for dates in ranges], number=1)),
+                       ("aggregates", timeit(lambda: [aggregates.totals(*dates) for dates in ranges], number=1)))
+        finally:
+            aggregates.close()
+    print(f"{reservations} reservations over {days} days:")
+    for name, elapsed in results:
+        print(f"{name:>15}: {queries} range totals in {elapsed * 1000:.1f} ms, "
+              f"{elapsed / queries * 1e6:.1f} µs per query")
+
+
+if __name__ == '__main__':
+    benchmark()
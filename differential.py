@@ -0,0 +1,357 @@
+"""This module provides a randomized differential test harness for the reservation engine.
+
+Long random sequences of booking, cancellation and schedule operations are run against
+a reference backend and against the engine. The reference backend replaces the lookups of the engine,
+the vacancy and free time checks, which the engine answers from the per-day index of the schedule snapshot,
+the next available time and the schedule of a date range. The baseline functions below are the original
+implementation of these lookups, which scanned every reservation, kept as they were. The semantics changed
+on purpose since then, so every intended change is made by a documented adapter around the baseline:
+reservations running past midnight, the slot tables and opening hours of the club configuration,
+the later slots offered when the court is occupied, and sparse schedules. The engine is thus checked against
+independent code rather than against itself. The clock is frozen, answers to prompts are scripted,
+and every operation records its result, printed output, prompts and exported bytes, which must be
+identical.
+
+It includes the following classes and functions:
+- isolated_state: Runs operations on empty lists of clients and reservations with a frozen clock.
+- baseline_check_if_vacant, baseline_time_to_next_reservation, baseline_next_available_time,
+  baseline_period_schedule: The original lookups, scanning every reservation.
+- reference_check_if_vacant, reference_free_slots, reference_next_available_time,
+  reference_period_schedule: The lookups of the reference backend, adapting the baseline to the intended changes.
+- generate_operations: Generates a reproducible sequence of operations from a seed.
+- run_operations: Runs a sequence of operations against one backend and returns the outcomes.
+- first_difference: Returns the index of the first operation where a backend differs from the reference.
+- shrink: Reduces a failing sequence of operations to a small one which still fails.
+- check_seed: Runs the sequence of a seed against all backends and reports a shrunk failure.
+
+Run this module to check many seeds: `python differential.py --seeds 200`,
+or to replay a failure: `python differential.py --replay 42`.
+"""
+
+import argparse
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from datetime import datetime, timedelta, time
+from functools import partial
+from io import StringIO
+import os
+import random
+from unittest.mock import patch
+
+import isolation
+from opening_hours import minute_of_day
+from reservation import Client, Reservation
+
+NOW = datetime(2030, 1, 7, 8, 0)
+# The first backend is the reference the others are compared with
+BACKENDS = ('reference', 'engine')
+
+
+def baseline_check_if_vacant(date, time, all_reservations):
+    """Checks if the court is vacant at the given date and time."""
+
+    for reservation in all_reservations:
+        if reservation.date == date and reservation.start_time <= time < reservation.end_time:
+            return False
+    return True
+
+
+def baseline_time_to_next_reservation(date, time, all_reservations):
+    """Returns the time to the next reservation for the given date and time."""
+
+    date_time_var = datetime.combine(date, time)
+    filter_reservations = [reservation for reservation in all_reservations
+                           if datetime.combine(reservation.date, reservation.start_time) > date_time_var and
+                           timedelta(minutes=0) < datetime.combine(reservation.date, reservation.start_time) -
+                           date_time_var < timedelta(minutes=90)]
+    if len(filter_reservations) > 0:
+        timediff = min(datetime.combine(reservation.date, reservation.start_time) - date_time_var
+                       for reservation in filter_reservations)
+    else:
+        timediff = timedelta(minutes=90)
+    return timediff
+
+
+def baseline_next_available_time(date, time, all_reservations):
+    """Returns the next available time for the client to make a reservation."""
+
+    for reservation in all_reservations:
+        if reservation.date == date and reservation.start_time <= time < reservation.end_time:
+            time = reservation.end_time
+            if baseline_time_to_next_reservation(date, time, all_reservations) >= timedelta(minutes=30):
+                return time
+    return False
+
+
+def baseline_period_schedule(date_start, date_end, all_reservations):
+    """Returns the schedule of the given date range, with a list of reservations for every day."""
+
+    # Creates the dictionary with all days in the given range
+    period_schedule = {}
+    for day in range((date_end - date_start).days + 1):
+        current_date = date_start + timedelta(days=day)
+        period_schedule[current_date] = []
+
+    # Adds a reservation object to the dictionary, where each key corresponds
+    # to a date on which the reservation is made.
+    for reservation in all_reservations:
+        if date_start <= reservation.date <= date_end:
+            period_schedule.get(reservation.date).append((reservation.client,
+                                                          reservation.start_time, reservation.end_time))
+
+    # Sorts all the reservations for each day in a period by the time the reservation starts
+    for date, reservation in period_schedule.items():
+        period_schedule[date] = sorted(reservation, key=lambda details: details[1])
+    return period_schedule
+
+
+_Piece = namedtuple('_Piece', 'date start_time end_time')
+
+
+def _split_at_midnight(reservations):
+    """Adapter for reservations running past midnight, which the club allows if it is open around midnight.
+
+    The baseline compares the times of a reservation on its own date only, so a reservation ending
+    after midnight, with an end time before its start time, occupies no time at all. Each such reservation
+    is split into a piece until the end of its day and a piece from midnight on the next day.
+    """
+
+    for reservation in reservations:
+        if reservation.end_time > reservation.start_time:
+            yield reservation
+        else:
+            yield _Piece(reservation.date, reservation.start_time, time.max)
+            yield _Piece(reservation.date + timedelta(days=1), time.min, reservation.end_time)
+
+
+def reference_check_if_vacant(cls, date, time, snapshot):
+    """Checks if the court is vacant with the baseline check, adapted to reservations running past midnight."""
+
+    return baseline_check_if_vacant(date, time, list(_split_at_midnight(Reservation.list_of_reservations())))
+
+
+def reference_free_slots(cls, date, time, snapshot):
+    """Adapter of the baseline time to the next reservation to the slot tables of the club configuration.
+
+    The baseline returns the minutes to the next reservation, looking at most 90 minutes ahead, the longest
+    reservation of the default configuration the harness runs with. The engine compares the free slots only
+    with the durations of the configuration, so any number of slots covering the longest one is equivalent.
+    The minutes are converted to slots of the table of the day and bounded by the end of its open period.
+    """
+
+    table = Client.config.table(date)
+    start = minute_of_day(time)
+    minutes = baseline_time_to_next_reservation(date, time, Reservation.list_of_reservations()) // timedelta(minutes=1)
+    return table.free_slots(table.slot_of(start), min(table.limit, start + minutes))
+
+
+def reference_next_available_time(client, date, time, snapshot):
+    """Adapter of the baseline next available time to the slot tables of the club configuration.
+
+    The baseline offers only the end of the reservation occupying the given time, if the shortest reservation
+    fits there. That is the first slot at which the court may be vacant, as the reservation occupies every
+    earlier one, and it is kept whenever it is a vacant slot with room for the shortest reservation.
+    Otherwise the client is offered the first later slot of the day which the reference lookups find vacant
+    with room for the shortest reservation, or nothing if there is none.
+    """
+
+    def available(slot_time):
+        return (reference_check_if_vacant(Client, date, slot_time, None) and
+                Client.config.menu(reference_free_slots(Client, date, slot_time, None))[0] is not None)
+
+    table = Client.config.table(date)
+    offered = baseline_next_available_time(date, time, list(_split_at_midnight(Reservation.list_of_reservations())))
+    slot = table.slot_of(minute_of_day(offered)) if offered else None
+    if slot is not None and offered == table.time_of(slot) and available(offered):
+        return offered
+    index = table.next_slot(minute_of_day(time) + 1)
+    while index is not None:
+        if available(table.time_of(index)):
+            return table.time_of(index)
+        index = table.next_slot(table.minute_of(index) + 1)
+    return False
+
+
+def reference_period_schedule(date_start, date_end, sparse=False):
+    """Adapter of the baseline schedule to sparse schedules, which leave out the days without reservations."""
+
+    period_schedule = baseline_period_schedule(date_start, date_end, Reservation.list_of_reservations())
+    if sparse:
+        return {day: reservations for day, reservations in period_schedule.items() if reservations}
+    return period_schedule
+
+
+@contextmanager
+def _reference_backend():
+    """Replaces the lookups of the engine by the adapted baseline functions while the body runs."""
+
+    with patch.object(Client, '_check_if_vacant', classmethod(reference_check_if_vacant)), \
+            patch.object(Client, '_free_slots', classmethod(reference_free_slots)), \
+            patch.object(Client, '_next_available_time', reference_next_available_time), \
+            patch.object(Reservation, 'period_schedule', staticmethod(reference_period_schedule)):
+        yield
+
+
+class _ScriptedInput:
+    """Answers prompts with scripted answers and records the prompts."""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.prompts = []
+
+    def __call__(self, prompt=''):
+        self.prompts.append(prompt)
+        if not self.answers:
+            raise EOFError("No more scripted answers.")
+        return self.answers.pop(0)
+
+
+def generate_operations(seed, length=200, clients=30, days=10):
+    """Generates a reproducible sequence of operations from a seed.
+
+    Operations are tuples of one of the forms:
+    - ('book', client index, day offset, minute of the day, answers to the prompts)
+    - ('cancel', client index, day offset)
+    - ('schedule', first day offset, number of days, 'print', 'json' or 'csv')
+    Day offsets are counted from the frozen current date. There are enough clients for few days,
+    so bookings often collide and the suggestion of another time is exercised.
+    """
+
+    generator = random.Random(seed)
+    operations = []
+    for _ in range(length):
+        kind = generator.choices(('book', 'cancel', 'schedule'), weights=(6, 2, 1))[0]
+        client = generator.randrange(clients)
+        day = generator.randrange(days)
+        if kind == 'book':
+            minute = generator.randrange(0, 24 * 60, 15)
+            answers = [generator.choice(('yes', 'yes', 'no', 'maybe')),
+                       generator.choice(('0', '1', '2', '3', 'yes', 'no', '30', '90'))]
+            operations.append(('book', client, day, minute, answers))
+        elif kind == 'cancel':
+            operations.append(('cancel', client, day))
+        else:
+            operations.append(('schedule', day, generator.randrange(4), generator.choice(('print', 'json', 'csv'))))
+    return operations
+
+
+def isolated_state(now=NOW):
+    """Runs the body with empty lists of clients and reservations and the clock frozen at the given moment,
+    in a temporary working directory, see isolation.isolated_state. Yields the Clock of the state.
+    """
+
+    return isolation.isolated_state(now)
+
+
+def _run_operation(operation, clients):
+    """Runs a single operation and returns its outcome."""
+
+    today = NOW.date()
+    answers = []
+    if operation[0] == 'book':
+        _, client, day, minute, answers = operation
+        call = partial(clients[client].make_reservation, today + timedelta(days=day),
+                       time(minute // 60, minute % 60))
+    elif operation[0] == 'cancel':
+        _, client, day = operation
+        call = partial(clients[client].cancel_reservation, today + timedelta(days=day))
+    else:
+        _, day, length, param = operation
+        answers = ['export']
+        call = partial(Reservation.schedule, today + timedelta(days=day),
+                       today + timedelta(days=day + length), param)
+
+    scripted_input = _ScriptedInput(answers)
+    output = StringIO()
+    with patch('builtins.input', scripted_input), redirect_stdout(output):
+        try:
+            result = repr(call())
+        except Exception as error:  # pylint: disable=broad-except
+            result = f"{type(error).__name__}: {error}"
+    exported = b''
+    if operation[0] == 'schedule' and operation[3] != 'print':
+        with open(f"export.{operation[3]}", 'rb') as export_file:
+            exported = export_file.read()
+        os.remove(f"export.{operation[3]}")
+    # Reports the time it took to write the file, which differs from run to run
+    lines = [line for line in output.getvalue().splitlines() if not line.endswith(" seconds.")]
+    return result, lines, scripted_input.prompts, exported
+
+
+def run_operations(operations, backend, clients=6):
+    """Runs a sequence of operations against one backend and returns the list of their outcomes."""
+
+    with isolated_state(), (_reference_backend() if backend == 'reference' else nullcontext()):
+        members = [Client(f"Member{index} Surname") for index in range(clients)]
+        return [_run_operation(operation, members) for operation in operations]
+
+
+def first_difference(operations):
+    """Returns the index of the first operation where the outcome of a backend differs
+    from the outcome of the reference backend, or None.
+    """
+
+    clients = 1 + max((operation[1] for operation in operations if operation[0] != 'schedule'), default=0)
+    reference, *optimized = [run_operations(operations, backend, clients) for backend in BACKENDS]
+    for index, (expected, *outcomes) in enumerate(zip(reference, *optimized)):
+        if any(outcome != expected for outcome in outcomes):
+            return index
+    return None
+
+
+def shrink(operations, fails):
+    """Reduces a failing sequence of operations to a small one which still fails.
+
+    Chunks of operations, from halves of the sequence down to single operations, are removed
+    as long as the given function still returns True for the remaining sequence.
+    """
+
+    chunk = len(operations) // 2
+    while chunk >= 1:
+        index = 0
+        while index < len(operations):
+            candidate = operations[:index] + operations[index + chunk:]
+            if candidate and fails(candidate):
+                operations = candidate
+            else:
+                index += chunk
+        chunk //= 2
+    return operations
+
+
+def check_seed(seed, length=200):
+    """Runs the sequence of a seed against all backends.
+
+    Returns None if the outcomes are identical, otherwise the shrunk failing sequence.
+    """
+
+    operations = generate_operations(seed, length)
+    index = first_difference(operations)
+    if index is None:
+        return None
+    return shrink(operations[:index + 1], lambda candidate: first_difference(candidate) is not None)
+
+
+def main():
+    """Checks the given number of seeds, or replays a single seed, and prints failures."""
+
+    parser = argparse.ArgumentParser(description="Differential test of the indexed reservation lookups.")
+    parser.add_argument('--seeds', type=int, default=100, help="number of seeds to check (default: 100)")
+    parser.add_argument('--length', type=int, default=200, help="operations per sequence (default: 200)")
+    parser.add_argument('--replay', type=int, help="replay and shrink a single seed")
+    arguments = parser.parse_args()
+
+    seeds = [arguments.replay] if arguments.replay is not None else range(arguments.seeds)
+    failures = 0
+    for seed in seeds:
+        failing = check_seed(seed, arguments.length)
+        if failing is not None:
+            failures += 1
+            print(f"Seed {seed} fails, shrunk to {len(failing)} operations:")
+            for operation in failing:
+                print(f"\t{operation}")
+    print(f"{len(seeds) - failures} of {len(seeds)} seeds passed.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""This module provides a publish/subscribe feed of changes to the reservations.
+
+Every reservation added to or removed from the list of reservations is published as a typed
+event with a sequence number, so consumers can update their state incrementally instead of
+scanning all reservations. Out-of-process consumers can follow the feed through a file.
+
+Reservations made and cancelled are published as ReservationCreated and ReservationCancelled events.
+Reservations a store loads into memory or unloads from it are published as ReservationLoaded and
+ReservationUnloaded events, so consumers keeping totals of all reservations can tell them apart.
+
+It includes the following classes:
+- ReservationEvent: A base class of the events, with ReservationCreated, ReservationCancelled,
+  ReservationLoaded and ReservationUnloaded subclasses.
+- EventBus: A class delivering events to subscribers, one by one or in batches.
+- EventLog: A subscriber appending events to a file, one JSON object per line.
+- EventTailReader: A class reading the events appended to a file since the last read.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, time
+import itertools
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationEvent:
+    """A change to the reservations.
+
+    Attributes:
+        sequence (int): The number of the event, increasing by one with every event.
+        date (datetime.date): The date of the reservation.
+        start_time (datetime.time): The start time of the reservation.
+        end_time (datetime.time): The end time of the reservation.
+        client (str): The name of the client.
+        reservation (Reservation): The reservation, None for events read from a file.
+    """
+
+    kind = None
+    __slots__ = ('sequence', 'date', 'start_time', 'end_time', 'client', 'reservation')
+
+    def __init__(self, sequence, day, start_time, end_time, client, reservation=None):
+        """Initializes a new instance of the event."""
+
+        self.sequence = sequence
+        self.date = day
+        self.start_time = start_time
+        self.end_time = end_time
+        self.client = client
+        self.reservation = reservation
+
+    @classmethod
+    def of(cls, sequence, reservation):
+        """Returns an event about the given reservation."""
+
+        return cls(sequence, reservation.date, reservation.start_time, reservation.end_time,
+                   str(reservation.client), reservation)
+
+    def to_json(self):
+        """Returns the event as a JSON string."""
+
+        return json.dumps({"sequence": self.sequence, "type": self.kind, "date": self.date.isoformat(),
+                           "start_time": self.start_time.strftime("%H:%M"),
+                           "end_time": self.end_time.strftime("%H:%M"), "client": self.client})
+
+    @staticmethod
+    def from_json(line):
+        """Returns the event stored in a JSON string."""
+
+        data = json.loads(line)
+        event_class = next(event_class for event_class in (ReservationCreated, ReservationCancelled,
+                                                           ReservationLoaded, ReservationUnloaded)
+                           if event_class.kind == data["type"])
+        return event_class(data["sequence"], date.fromisoformat(data["date"]),
+                           time.fromisoformat(data["start_time"]), time.fromisoformat(data["end_time"]),
+                           data["client"])
+
+    def __repr__(self):
+        """Returns a string representation of the event."""
+
+        return f"{type(self).__name__}({self.sequence}, {self.client}, {self.date} {self.start_time}-{self.end_time})"
+
+
+class ReservationCreated(ReservationEvent):
+    """A reservation was added to the list of reservations."""
+
+    kind = 'created'
+    __slots__ = ()
+
+
+class ReservationCancelled(ReservationEvent):
+    """A reservation was removed from the list of reservations."""
+
+    kind = 'cancelled'
+    __slots__ = ()
+
+
+class ReservationLoaded(ReservationEvent):
+    """A reservation made earlier was loaded into memory by a store."""
+
+    kind = 'loaded'
+    __slots__ = ()
+
+
+class ReservationUnloaded(ReservationEvent):
+    """A reservation was unloaded from memory by a store, and is still kept in the store."""
+
+    kind = 'unloaded'
+    __slots__ = ()
+
+
+class EventBus:
+    """Delivers events to subscribers.
+
+    Subscribers are functions called with a list of events. Events published inside a batch
+    are delivered together when the outermost batch ends, other events as soon as they are published.
+    Events are not published while the bus is muted.
+
+    Events are delivered in the order of their sequence numbers, by one thread at a time. A thread
+    publishing events while the bus is held delivers them when it stops holding the bus, so
+    a writer can publish under its own lock and call the subscribers after releasing it.
+    An error raised by a subscriber is logged and does not stop the delivery to the other subscribers.
+
+    Methods:
+        subscribe(self, subscriber)
+            Adds a subscriber. Returns the subscriber, so it can be used as a decorator.
+        unsubscribe(self, subscriber)
+            Removes a subscriber.
+        subscribers(self)
+            Returns a list of the subscribers.
+        publish(self, event_class, reservations)
+            Publishes events of the given class about the given reservations.
+        batch(self)
+            A context manager delivering the events published inside it in a single batch.
+        muted(self)
+            A context manager in which no events are published.
+        held(self)
+            A context manager delaying the delivery of the events published inside it until it ends.
+        last_sequence(self)
+            Returns the sequence number of the last published event.
+    """
+
+    def __init__(self):
+        """Initializes a new instance of the EventBus class."""
+
+        self._subscribers = []
+        self._sequence = itertools.count(1)
+        self._last_sequence = 0
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        # Batches of events waiting for delivery, in the order of their sequence numbers
+        self._outbox = deque()
+        # Whether a thread is delivering the events of the outbox
+        self._delivering = False
+
+    def subscribe(self, subscriber):
+        """Adds a subscriber. Returns the subscriber, so it can be used as a decorator."""
+
+        self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Removes a subscriber."""
+
+        self._subscribers.remove(subscriber)
+
+    def subscribers(self):
+        """Returns a list of the subscribers."""
+
+        return list(self._subscribers)
+
+    def last_sequence(self):
+        """Returns the sequence number of the last published event."""
+
+        return self._last_sequence
+
+    def publish(self, event_class, reservations):
+        """Publishes events of the given class about the given reservations."""
+
+        if getattr(self._local, 'muted', 0) or not reservations:
+            return
+        with self._lock:
+            events = []
+            for reservation in reservations:
+                self._last_sequence = next(self._sequence)
+                events.append(event_class.of(self._last_sequence, reservation))
+            pending = getattr(self._local, 'pending', None)
+            if pending is not None:
+                pending.extend(events)
+                return
+            if self._subscribers:
+                self._outbox.append(events)
+        self._deliver()
+
+    def _deliver(self):
+        """Delivers the events waiting in the outbox, unless the bus is held on this thread.
+
+        If another thread is delivering, it delivers these events as well, after the ones published before them.
+        Events published by a subscriber are delivered after the subscriber returns, by the same loop.
+        """
+
+        if getattr(self._local, 'held', 0) or getattr(self._local, 'delivering', False):
+            return
+        with self._lock:
+            if self._delivering:
+                return
+            self._delivering = self._local.delivering = True
+        try:
+            while True:
+                with self._lock:
+                    if not self._outbox:
+                        self._delivering = self._local.delivering = False
+                        return
+                    events = self._outbox.popleft()
+                for subscriber in list(self._subscribers):
+                    try:
+                        subscriber(events)
+                    except Exception:
+                        logger.exception("Subscriber %r failed to handle %d events", subscriber, len(events))
+        finally:
+            if self._local.delivering:
+                with self._lock:
+                    self._delivering = self._local.delivering = False
+
+    @contextmanager
+    def batch(self):
+        """A context manager delivering the events published inside it in a single batch."""
+
+        if getattr(self._local, 'pending', None) is not None:
+            yield
+            return
+        self._local.pending = []
+        try:
+            yield
+        finally:
+            with self._lock:
+                events, self._local.pending = self._local.pending, None
+                if events and self._subscribers:
+                    self._outbox.append(events)
+            self._deliver()
+
+    @contextmanager
+    def muted(self):
+        """A context manager in which no events are published."""
+
+        self._local.muted = getattr(self._local, 'muted', 0) + 1
+        try:
+            yield
+        finally:
+            self._local.muted -= 1
+
+    @contextmanager
+    def held(self):
+        """A context manager delaying the delivery of the events published inside it until it ends."""
+
+        self._local.held = getattr(self._local, 'held', 0) + 1
+        try:
+            yield
+        finally:
+            self._local.held -= 1
+            self._deliver()
+
+
+class EventLog:
+    """Appends events to a file, one JSON object per line. Instances are subscribers of an EventBus.
+
+    Only reservations made and cancelled are logged, as loading and unloading do not change the reservations.
+    """
+
+    def __init__(self, path):
+        """Initializes a new instance of the EventLog class."""
+
+        self.path = path
+
+    def __call__(self, events):
+        """Appends the events to the file."""
+
+        lines = [f"{event.to_json()}\n" for event in events
+                 if isinstance(event, (ReservationCreated, ReservationCancelled))]
+        if lines:
+            with open(self.path, 'a', encoding='utf-8') as log_file:
+                log_file.write("".join(lines))
+
+
+class EventTailReader:
+    """Reads the events appended to a file by an EventLog since the last read.
+
+    New events are told apart by their offset in the file, not by their sequence numbers, which start
+    again at 1 when the writing process restarts, and are not unique if several processes append to the file.
+
+    Methods:
+        read(self)
+            Returns a list of events appended to the file since the last read.
+    """
+
+    def __init__(self, path, after_sequence=0):
+        """Initializes a new instance of the EventTailReader class.
+        Events with a sequence number not greater than the given one are skipped by the first read,
+        which catches up with the events already in the file.
+        """
+
+        self.path = path
+        self.after_sequence = after_sequence
+        self._offset = 0
+        self._caught_up = False
+
+    def read(self):
+        """Returns a list of events appended to the file since the last read."""
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as log_file:
+                log_file.seek(self._offset)
+                lines = []
+                # A line without the line break is still being written and is read next time
+                for line in iter(log_file.readline, ''):
+                    if not line.endswith('\n'):
+                        break
+                    lines.append(line)
+                    self._offset = log_file.tell()
+        except FileNotFoundError:
+            return []
+        events = [ReservationEvent.from_json(line) for line in lines]
+        if not self._caught_up:
+            events = [event for event in events if event.sequence > self.after_sequence]
+            self._caught_up = True
+        return events
@@ -0,0 +1,60 @@
+"""This module compares the serial export of the schedule with the parallel export in worker processes.
+
+It includes the following function:
+- benchmark: Reports the time to export a large schedule to JSON and CSV files, serially
+  and with a growing number of worker processes.
+
+Run this module to see the benchmark: `python export_benchmark.py`.
+"""
+
+from contextlib import redirect_stdout
+from datetime import date, time, timedelta
+from io import StringIO
+import random
+from time import perf_counter
+from unittest.mock import patch
+
+from isolation import isolated_state
+from reservation import Reservation, export_path
+from sharding import available_cpus
+
+
+def _export(date_start, date_end, param, file_name, workers):
+    """Exports the schedule of the date range to a file. Returns the seconds it took and the content of the file."""
+
+    with patch.object(Reservation, 'provide_file_name', return_value=file_name), redirect_stdout(StringIO()):
+        started = perf_counter()
+        Reservation.schedule(date_start, date_end, param, workers)
+        elapsed = perf_counter() - started
+    with open(export_path(file_name, param), 'rb') as export_file:
+        return elapsed, export_file.read()
+
+
+def benchmark(days=3650, per_day=8, worker_counts=None):
+    """Reports the time to export the schedule of the given number of days to JSON and CSV files,
+    serially and with a growing number of worker processes, and checks that the files are identical.
+
+    The speedup of the parallel export is bounded by the number of CPUs available to this process.
+    """
+
+    generator = random.Random(0)
+    first_day = date(2099, 1, 1)
+    names = [f"Member{index} Surname" for index in range(500)]
+    records = [(first_day + timedelta(days=day), generator.choice(names), time(6 + 2 * slot, 0), time(7 + 2 * slot, 30))
+               for day in range(days) for slot in range(per_day)]
+    last_day = first_day + timedelta(days=days - 1)
+    cpus = available_cpus()
+    print(f"{len(records)} reservations over {days} days, {cpus} CPUs available to this process:")
+    with isolated_state(records=records):
+        for param in ('json', 'csv'):
+            serial, expected = _export(first_day, last_day, param, 'serial', None)
+            print(f"{param:>5} serial: {serial:.3f} seconds, {len(expected)} bytes")
+            for workers in worker_counts or sorted({1, 2, cpus}):
+                elapsed, content = _export(first_day, last_day, param, f'parallel{workers}', workers)
+                assert content == expected
+                print(f"{param:>5} {workers:>2} workers: {elapsed:.3f} seconds, "
+                      f"{serial / elapsed:.2f} times the serial speed")
+
+
+if __name__ == '__main__':
+    benchmark()
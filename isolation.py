@@ -0,0 +1,126 @@
+"""This module runs code on a separate state of the reservation system, with a controlled clock.
+
+The clients, the reservations, the store and the configuration of the club are class attributes
+of the reservation module, which reads the clock with datetime.now(). Replays of transcripts,
+benchmarks and tests run on a separate state instead, set up from given clients and reservations,
+in a temporary working directory and with the clock of the reservation module showing given moments.
+The previous state is restored afterwards.
+
+It includes the following class and functions:
+- Clock: A clock showing the moment it was last set to.
+- frozen_datetime: Returns a datetime class whose now() returns the moment shown by a clock.
+- answering: A context manager in which input() is answered by a function.
+- current_state: Returns the names of the clients and the records of the reservations.
+- isolated_state: A context manager running its body on a separate state of the reservation system.
+"""
+
+import builtins
+from contextlib import contextmanager
+from datetime import date, datetime
+import os
+import tempfile
+
+import reservation
+from reservation import Client, Reservation
+
+
+class Clock:
+    """A clock showing the moment it was last set to.
+
+    Attributes:
+        moment (datetime): The moment shown by the clock.
+    """
+
+    def __init__(self, moment):
+        """Initializes a new instance of the Clock class."""
+
+        self.moment = moment
+
+
+def frozen_datetime(clock):
+    """Returns a datetime class whose now() returns the moment shown by the given clock."""
+
+    class FrozenDateTime(datetime):
+        """A datetime class whose now() returns the moment shown by a clock."""
+
+        @classmethod
+        def now(cls, tz=None):
+            moment = clock.moment
+            return cls.combine(moment.date(), moment.time(), tz)
+
+    return FrozenDateTime
+
+
+@contextmanager
+def answering(function):
+    """A context manager in which input() calls the given function with the prompt and returns its answer."""
+
+    previous = builtins.input
+    builtins.input = function
+    try:
+        yield
+    finally:
+        builtins.input = previous
+
+
+def current_state():
+    """Returns a list of the names of all clients and a list of (date, client name, start time, end time)
+    records of all reservations, including the reservations of the store which are not in memory.
+    """
+
+    names = [client.name for client in Client.list_of_client()]
+    records = [(item.date, str(item.client), item.start_time, item.end_time)
+               for item in Reservation.list_of_reservations()]
+    if Reservation.store is not None:
+        for day, reservations in sorted(Reservation.store.stored_between(date.min, date.max).items()):
+            records.extend((day, str(name), start_time, end_time) for name, start_time, end_time in reservations)
+    return names, records
+
+
+@contextmanager
+def isolated_state(now=None, clients=(), records=(), config=None):
+    """Runs the body on a separate state of the reservation system and restores the previous state afterwards.
+
+    The state starts with clients of the given names and the reservations of the given
+    (date, client name, start time, end time) records, without a store, and with the given
+    configuration of the club, or the current one if None. The body runs in a temporary working
+    directory. If a moment is given as now, the clock of the reservation module is frozen at it
+    and can be moved through the yielded Clock. The subscribers of Reservation.events are detached
+    meanwhile, so statistics of the previous state do not see the changes of the body.
+    """
+
+    saved_clients = list(Client.list_of_client())
+    saved_reservations = list(Reservation.list_of_reservations())
+    store, saved_config = Reservation.store, Client.config
+    saved_datetime = reservation.datetime
+    working_directory = os.getcwd()
+    clock = Clock(now)
+    subscribers = Reservation.events.subscribers()
+    for subscriber in subscribers:
+        Reservation.events.unsubscribe(subscriber)
+    Client.list_of_client().clear()
+    Reservation.list_of_reservations().clear()
+    Reservation.store = None
+    if config is not None:
+        Client.config = config
+    try:
+        for name in clients:
+            Client(name)
+        Reservation.load_records(records)
+        if now is not None:
+            reservation.datetime = frozen_datetime(clock)
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                yield clock
+            finally:
+                os.chdir(working_directory)
+    finally:
+        reservation.datetime = saved_datetime
+        Client.list_of_client()[:] = saved_clients
+        Reservation.list_of_reservations().clear()
+        with Reservation.events.muted():
+            Reservation.list_of_reservations().extend(saved_reservations)
+        Reservation.store, Client.config = store, saved_config
+        for subscriber in subscribers:
+            Reservation.events.subscribe(subscriber)
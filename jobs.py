@@ -0,0 +1,304 @@
+"""This module provides background export of the club's schedule to JSON and CSV files.
+
+It includes the following classes:
+- ExportJob: A class representing an export of the schedule running on a worker thread.
+- ExportQueue: A class that runs submitted export jobs one by one on a worker thread.
+
+Every job works on a snapshot of the reservations taken when the job is submitted,
+so bookings made while the export is running neither change nor stall it. Taking the
+snapshot is a single read, and the schedule of the date range, including the days read from
+the store, is built from it on the worker thread, so submitting a job does not keep the session waiting.
+"""
+
+from functools import partial
+import itertools
+import os
+import queue
+import threading
+from time import perf_counter
+
+from reservation import (CSV_HEADER, Reservation, export_path, format_csv_chunk, format_json_chunk,
+                         open_export_file, write_json_fragments)
+
+
+def _period_schedule(date_start, date_end, sparse, snapshot, store, in_memory):
+    """Returns a list of (date, reservations) pairs of the snapshot in the date range, with the days
+    which were not in memory read from the store. Clients are replaced by their names and the lists
+    by tuples, so the result does not share any mutable state with the reservations.
+    """
+
+    stored = store.stored_between(date_start, date_end, in_memory) if store is not None else {}
+    return [(date, tuple((str(record[0]), record[1], record[2]) for record in reservations))
+            for date, reservations in Reservation.period_schedule(date_start, date_end, sparse, snapshot,
+                                                                   stored).items()]
+
+
+class ExportJob:
+    """Represents an export of the schedule to a file, running in the background.
+
+    Attributes
+    ----------
+    job_id : int
+        The identifier of the job.
+    param : str
+        The format of the file, 'json' or 'csv'.
+    path : str
+        The path of the file, including the extensions of the format and the compression.
+    compression : str
+        One of reservation.COMPRESSIONS, or None to write the file uncompressed.
+    compact : bool
+        Whether JSON is written without indentation.
+    status : str
+        One of 'queued', 'running', 'done', 'cancelled' or 'failed'.
+    days_written : int
+        The number of days already written.
+    total_days : int
+        The number of days in the exported date range, None until the job has started.
+    error : Exception
+        The error which made the job fail, None if it did not fail.
+    bytes_written : int
+        The size of the written file, once the job is done.
+    elapsed : float
+        The number of seconds the job took to write the file, once it is done.
+
+    Methods
+    -------
+    cancel(self)
+        Requests the cancellation of the job. Returns False if it has already finished.
+    progress(self)
+        Returns the progress of the job as a string.
+    notice(self)
+        Returns a message describing the result of the job.
+    run(self)
+        Builds the days of the schedule and writes them to the file.
+    """
+
+    def __init__(self, job_id, load, param, file_name, compression=None, compact=False):
+        """Initializes a new instance of the ExportJob class.
+
+        Load is a function returning a list of (date, reservations) pairs to write, with client names.
+        It is called when the job starts, on the thread running the job.
+        """
+
+        self.job_id = job_id
+        self.param = param
+        self.path = export_path(file_name, param, compression)
+        self.compression = compression
+        self.compact = compact
+        self.status = 'queued'
+        self.days_written = 0
+        self.total_days = None
+        self.error = None
+        self.bytes_written = None
+        self.elapsed = None
+        self._load = load
+        self._snapshot = None
+        self._cancelled = threading.Event()
+        # Guards the status, so a job is not cancelled after it has finished
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Requests the cancellation of the job. Returns False if it has already finished."""
+
+        with self._lock:
+            if self.status not in ('queued', 'running'):
+                return False
+            self._cancelled.set()
+            return True
+
+    def _finish(self, status, error=None):
+        """Sets the final status of the job, unless it has been cancelled meanwhile."""
+
+        with self._lock:
+            self.error = error
+            self.status = 'cancelled' if self._cancelled.is_set() and status == 'done' else status
+
+    def progress(self):
+        """Returns the progress of the job as a string."""
+
+        total_days = '?' if self.total_days is None else self.total_days
+        return f"{self.days_written}/{total_days} days"
+
+    def notice(self):
+        """Returns a message describing the result of the job."""
+
+        match self.status:
+            case 'done':
+                return (f"Export job {self.job_id}: the schedule has been saved in {self.path} file. "
+                        f"{self.bytes_written} bytes were written in {self.elapsed:.3f} seconds.")
+            case 'cancelled':
+                return f"Export job {self.job_id} was cancelled."
+            case 'failed':
+                return f"Export job {self.job_id} failed: {self.error}"
+        return f"Export job {self.job_id} is {self.status}, {self.progress()} written."
+
+    def run(self):
+        """Builds the days of the schedule and writes them to the file.
+
+        The data is written to a temporary file, which replaces the target file only
+        when the whole range has been written, so a cancelled or failed job leaves no partial file.
+        """
+
+        with self._lock:
+            if self._cancelled.is_set():
+                self.status = 'cancelled'
+                return
+            self.status = 'running'
+        started = perf_counter()
+        part_path = f"{self.path}.part"
+        try:
+            self._snapshot = self._load()
+            self.total_days = len(self._snapshot)
+            newline = '' if self.param == 'csv' else None
+            with open_export_file(part_path, self.compression, newline) as export_file:
+                if self.param == 'json':
+                    self._write_json(export_file)
+                else:
+                    self._write_csv(export_file)
+            if self._cancelled.is_set():
+                os.remove(part_path)
+                self._finish('cancelled')
+                return
+            os.replace(part_path, self.path)
+            self.bytes_written = os.path.getsize(self.path)
+            self.elapsed = perf_counter() - started
+            self._finish('done')
+        except Exception as error:
+            # Any error fails this job only, the worker goes on with the next one
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            self._finish('failed', error)
+
+    def _days(self):
+        """Yields days of the snapshot and counts them, until the job is cancelled."""
+
+        for date, reservations in self._snapshot:
+            if self._cancelled.is_set():
+                return
+            yield date, reservations
+            self.days_written += 1
+
+    def _write_json(self, export_file):
+        """Writes the snapshot in the format of Reservation.serialize_to_json, day by day."""
+
+        write_json_fragments(export_file, [date.strftime("%d.%m") for date, _ in self._snapshot],
+                             (fragment for day in self._days() for fragment in format_json_chunk([day], self.compact)),
+                             self.compact)
+
+    def _write_csv(self, export_file):
+        """Writes the snapshot in the format of Reservation.write_to_csv."""
+
+        export_file.write(CSV_HEADER)
+        for day in self._days():
+            export_file.write(format_csv_chunk([day]))
+
+
+class ExportQueue:
+    """Runs submitted export jobs one by one on a worker thread.
+
+    Methods
+    -------
+    submit(self, date_start, date_end, param, file_name, compression, compact, sparse)
+        Takes a snapshot of the reservations and queues an export job for it.
+    jobs(self)
+        Returns a list of all submitted jobs.
+    cancel(self, job_id)
+        Cancels the job with the given identifier.
+    finished_jobs(self)
+        Returns the jobs finished since the last call.
+    wait(self)
+        Blocks until all submitted jobs are finished.
+    close(self, cancel)
+        Waits for the submitted jobs, or cancels them, and stops the worker thread.
+    """
+
+    def __init__(self):
+        """Initializes a new instance of the ExportQueue class."""
+
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._reported = set()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, date_start, date_end, param, file_name, compression=None, compact=False, sparse=False):
+        """Takes a snapshot of the reservations and queues an export job for it.
+        If sparse, days without reservations are left out of the export.
+
+        Only the snapshot and the days the store has in memory are taken here,
+        the schedule of the date range is built by the job.
+        """
+
+        snapshot = Reservation.snapshot()
+        store = Reservation.store
+        in_memory = store.days_in_memory() if store is not None else None
+        load = partial(_period_schedule, date_start, date_end, sparse, snapshot, store, in_memory)
+        with self._lock:
+            job = ExportJob(next(self._ids), load, param, file_name, compression, compact)
+            self._jobs[job.job_id] = job
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        self._queue.put(job)
+        return job
+
+    def jobs(self):
+        """Returns a list of all submitted jobs."""
+
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Cancels the job with the given identifier. Returns False if there is no such unfinished job."""
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job is not None and job.cancel()
+
+    def finished_jobs(self):
+        """Returns the jobs finished since the last call."""
+
+        finished = []
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status in ('done', 'cancelled', 'failed') and job.job_id not in self._reported:
+                    self._reported.add(job.job_id)
+                    finished.append(job)
+        return finished
+
+    def wait(self):
+        """Blocks until all submitted jobs are finished."""
+
+        self._queue.join()
+
+    def close(self, cancel=False):
+        """Waits for the submitted jobs to finish, or cancels the unfinished ones if cancel is True,
+        and stops the worker thread. Jobs submitted later start a new worker.
+
+        The worker is a daemon thread so that it never keeps a crashed program alive,
+        which is why the program has to close the queue before it exits.
+        """
+
+        with self._lock:
+            worker, self._worker = self._worker, None
+            jobs = list(self._jobs.values())
+        if worker is None:
+            return
+        if cancel:
+            for job in jobs:
+                job.cancel()
+        self._queue.put(None)
+        worker.join()
+
+    def _run(self):
+        """Runs the queued jobs until the queue is closed."""
+
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                job.run()
+            finally:
+                self._queue.task_done()
@@ -1,7 +1,100 @@
-"""This module initializes a Session object and runs it."""
+"""This module initializes a Session object and runs it.
 
+If a binary schedule file is given with --data, the reservations of the booking horizon are
+loaded from it at startup, other days are loaded on demand, and all reservations are saved
+to it when the session is over. With --shared, the reservations are kept in a database shared with
+other processes of the program, see the shared_store module.
+
+The opening hours, slot length and reservation lengths of the club are read from --club,
+see the opening_hours module.
+
+With --rate-limit, booking attempts are admitted per client at the given rate,
+see the admission module.
+
+With --record the session is saved to a transcript, and --replay runs transcripts
+non-interactively, see the transcript module.
+"""
+
+import argparse
+from datetime import datetime
+import sys
+from time import perf_counter
+
+from admission import AdmissionController
+from opening_hours import ClubConfig
+from reservation import CHECKED_DAYS, Client, Reservation
 from session import Session
+from storage import LazyScheduleStore
+import transcript
+
+
+def parse_arguments():
+    """Parses the command line arguments."""
+
+    parser = argparse.ArgumentParser(description="Tennis court reservation system.")
+    parser.add_argument('--club', metavar='CONFIG',
+                        help="JSON file with the opening hours, slot length and reservation lengths of the club")
+    stores = parser.add_mutually_exclusive_group()
+    stores.add_argument('--data', help="binary schedule file to load reservations from and save them to")
+    stores.add_argument('--shared', metavar='DATABASE',
+                        help="SQLite database shared with other processes running on this host, "
+                             "not available on Windows")
+    parser.add_argument('--horizon', type=int, default=60,
+                        help="number of days, starting today, loaded at startup from --data or --shared "
+                             "(default: 60)")
+    parser.add_argument('--loaded-days', type=int, default=32,
+                        help=f"number of other days kept in memory when loaded on demand, at least {CHECKED_DAYS} "
+                             f"(default: 32)")
+    parser.add_argument('--rate-limit', type=float, metavar='PER_MINUTE',
+                        help="booking attempts allowed per client and minute, no limit if not given")
+    parser.add_argument('--burst', type=int, default=5,
+                        help="booking attempts a client can make at once with --rate-limit (default: 5)")
+    parser.add_argument('--max-queue', type=int, default=100,
+                        help="booking attempts waiting to be run before new ones are rejected, at least 1 "
+                             "(default: 100)")
+    parser.add_argument('--record', metavar='TRANSCRIPT',
+                        help="record the session to a transcript file, not with --rate-limit")
+    parser.add_argument('--replay', metavar='TRANSCRIPT', nargs='+',
+                        help="replay transcript files instead of running an interactive session")
+    parser.add_argument('--jobs', type=int, default=1, help="number of transcripts replayed in parallel (default: 1)")
+    arguments = parser.parse_args()
+    if arguments.loaded_days < CHECKED_DAYS:
+        parser.error(f"--loaded-days must be at least {CHECKED_DAYS}, the days checked by a reservation")
+    if arguments.rate_limit is not None and arguments.rate_limit <= 0:
+        parser.error("--rate-limit must be positive")
+    if arguments.burst < 1 or arguments.max_queue < 1:
+        parser.error("--burst and --max-queue must be at least 1")
+    if arguments.record and arguments.rate_limit is not None:
+        parser.error("--record cannot be combined with --rate-limit, as transcripts are replayed without admission")
+    return arguments
+
 
 if __name__ == '__main__':
-    session = Session()
-    session.main()
+    arguments = parse_arguments()
+    if arguments.club:
+        Client.config = ClubConfig.from_json(arguments.club)
+    if arguments.replay:
+        sys.exit(0 if transcript.replay_many(arguments.replay, arguments.jobs) else 1)
+    if arguments.data or arguments.shared:
+        started = perf_counter()
+        if arguments.data:
+            Reservation.store = LazyScheduleStore(arguments.data, arguments.horizon, arguments.loaded_days)
+        else:
+            # Imported only when needed, as the shared store locks days with fcntl, which Windows does not have
+            from shared_store import SharedScheduleStore
+            Reservation.store = SharedScheduleStore(arguments.shared, arguments.horizon)
+        loaded = Reservation.store.load_horizon(datetime.now().date())
+        print(f"{loaded} reservations were loaded in {perf_counter() - started:.3f} seconds.")
+    if arguments.record:
+        transcript.record(arguments.record)
+    else:
+        admission = None
+        if arguments.rate_limit is not None:
+            admission = AdmissionController(arguments.rate_limit / 60, arguments.burst, arguments.max_queue)
+        session = Session(admission)
+        session.main()
+        if admission is not None:
+            print(admission.report())
+    if Reservation.store is not None:
+        Reservation.store.save()
+        Reservation.store.close()
@@ -0,0 +1,158 @@
+"""This module profiles the memory footprint of clients and reservations with tracemalloc.
+
+Synthetic clubs of increasing size are loaded on empty lists of clients and reservations.
+The memory retained by the clients and by the reservations is reported per object,
+broken down by the structure which allocated it, and compared with per-object budgets.
+
+It includes the following functions:
+- profile_club: Loads a synthetic club and returns the bytes per client and per reservation by structure.
+- check_budgets: Returns the budgets exceeded by a profile.
+- main: Profiles clubs of increasing size, prints the reports and fails if a budget is exceeded.
+
+Run this module to see the report: `python memory_profile.py --budget-reservation 1200`.
+"""
+
+import argparse
+from collections import Counter
+from datetime import date, time, timedelta
+import inspect
+import random
+import sys
+import tracemalloc
+
+from isolation import isolated_state
+from reservation import Client, Reservation, ReservationList, ScheduleSnapshot
+
+SIZES = ((100, 1000), (1000, 10000), (5000, 50000))
+BUDGETS = {'client': 1024, 'reservation': 1536}
+
+
+def _synthetic_clients(clients):
+    """Creates the clients of a synthetic club. Returns the list of their names."""
+
+    names = [f"Member{index} Surname" for index in range(clients)]
+    for name in names:
+        Client(name)
+    return names
+
+
+def _synthetic_records(names, reservations, per_day=8):
+    """Yields (date, client name, start time, end time) tuples of a synthetic club."""
+
+    generator = random.Random(0)
+    first_day = date(2030, 1, 1)
+    for index in range(reservations):
+        slot = index % per_day
+        yield (first_day + timedelta(days=index // per_day), generator.choice(names),
+               time(8 + slot, 0), time(9 + slot, 0))
+
+
+def _structure_lines():
+    """Returns a dictionary mapping (file name, line number) pairs to the structure allocated on the line.
+
+    A structure is given by a function and optionally by a text, which selects the lines of the function
+    containing it, as an object is allocated on the line which calls its class.
+    """
+
+    structures = (
+        ('Client names', _synthetic_clients, 'f"Member'),
+        ('Client objects', _synthetic_clients, 'Client(name)'),
+        ('Client objects', Client.__init__, None),
+        ('Reservation objects', Reservation.load_records, 'cls('),
+        ('Reservation objects', Reservation.__init__, None),
+        ('Client reservation lists', Reservation.load_records, 'client.reservation.append'),
+        ('Reservation list', ReservationList.append, None),
+        ('Reservation list', ReservationList.extend, None),
+        ('Schedule snapshots', ReservationList._next_snapshot, None),
+        ('Schedule snapshots', ScheduleSnapshot.__init__, None),
+        ('Dates and times', _synthetic_records, None),
+    )
+    lines = {}
+    for structure, function, text in structures:
+        source, first = inspect.getsourcelines(function)
+        file_name = inspect.getsourcefile(function)
+        for offset, line in enumerate(source):
+            if text is None or text in line:
+                lines[(file_name, first + offset)] = structure
+    return lines
+
+
+def _by_structure(statistics, lines):
+    """Sums the size differences of tracemalloc statistics by the structure allocated on their line."""
+
+    sizes = Counter()
+    for statistic in statistics:
+        frame = statistic.traceback[0]
+        sizes[lines.get((frame.filename, frame.lineno), 'Other')] += statistic.size_diff
+    return sizes
+
+
+def profile_club(clients, reservations):
+    """Loads a synthetic club and returns two Counters with the bytes per client
+    and per reservation, by the structure which allocated them.
+    """
+
+    lines = _structure_lines()
+    with isolated_state():
+        tracemalloc.start()
+        try:
+            empty = tracemalloc.take_snapshot()
+            names = _synthetic_clients(clients)
+            with_clients = tracemalloc.take_snapshot()
+            Reservation.load_records(_synthetic_records(names, reservations))
+            with_reservations = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    client_sizes = _by_structure(with_clients.filter_traces(filters).compare_to(
+        empty.filter_traces(filters), 'lineno'), lines)
+    reservation_sizes = _by_structure(with_reservations.filter_traces(filters).compare_to(
+        with_clients.filter_traces(filters), 'lineno'), lines)
+    per_client = Counter({structure: size / clients for structure, size in client_sizes.items()})
+    per_reservation = Counter({structure: size / reservations for structure, size in reservation_sizes.items()})
+    return per_client, per_reservation
+
+
+def check_budgets(per_client, per_reservation, budgets=None):
+    """Returns a list of messages about the per-object budgets exceeded by a profile."""
+
+    budgets = budgets or BUDGETS
+    exceeded = []
+    for kind, profile in (('client', per_client), ('reservation', per_reservation)):
+        total = sum(profile.values())
+        if total > budgets[kind]:
+            exceeded.append(f"{total:.0f} bytes per {kind} exceed the budget of {budgets[kind]} bytes")
+    return exceeded
+
+
+def main():
+    """Profiles clubs of increasing size, prints the reports and exits with 1 if a budget is exceeded."""
+
+    parser = argparse.ArgumentParser(description="Memory footprint of clients and reservations.")
+    parser.add_argument('--budget-client', type=int, default=BUDGETS['client'],
+                        help=f"bytes allowed per client (default: {BUDGETS['client']})")
+    parser.add_argument('--budget-reservation', type=int, default=BUDGETS['reservation'],
+                        help=f"bytes allowed per reservation (default: {BUDGETS['reservation']})")
+    arguments = parser.parse_args()
+    budgets = {'client': arguments.budget_client, 'reservation': arguments.budget_reservation}
+
+    exceeded = []
+    for clients, reservations in SIZES:
+        per_client, per_reservation = profile_club(clients, reservations)
+        print(f"{clients} clients, {reservations} reservations:")
+        for kind, profile in (('client', per_client), ('reservation', per_reservation)):
+            print(f"\t{sum(profile.values()):8.1f} bytes per {kind}")
+            for structure, size in profile.most_common():
+                if round(size, 1) == 0:
+                    continue
+                print(f"\t\t{size:8.1f} {structure}")
+        exceeded.extend(f"{clients} clients, {reservations} reservations: {message}"
+                        for message in check_budgets(per_client, per_reservation, budgets))
+    for message in exceeded:
+        print(message)
+    sys.exit(1 if exceeded else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""This module provides the configuration of a club: opening hours, slot grid and reservation lengths.
+
+The configuration is compiled once into per-weekday slot tables and into tables of duration menus
+indexed by the number of free slots, so checking a booking time and offering durations are integer
+lookups instead of datetime arithmetic.
+
+Times are given as "HH:MM" strings, "24:00" closes a day at midnight. A club open until midnight
+which opens at midnight the next day allows reservations running past midnight.
+The default configuration is open all day on a one-minute grid with reservations of 30, 60 and 90 minutes.
+
+It includes the following function and classes:
+- minute_of_day: Returns the number of minutes from midnight to a time.
+- SlotTable: The slots of a single weekday.
+- ClubConfig: The configuration of a club, compiled into slot tables and duration menus.
+
+A configuration can be read from a JSON file, for example:
+{"opening_hours": [["08:00", "22:00"], ["08:00", "22:00"], ["08:00", "22:00"], ["08:00", "22:00"],
+                   ["08:00", "22:00"], ["09:00", "18:00"], null],
+ "slot_minutes": 30, "durations": [30, 60, 90]}
+"""
+
+from datetime import time
+import json
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def minute_of_day(value):
+    """Returns the number of minutes from midnight to the given time."""
+
+    return value.hour * 60 + value.minute
+
+
+def _minutes(value):
+    """Returns the number of minutes from midnight to a "HH:MM" string."""
+
+    hours, minutes = value.split(':')
+    minutes = int(hours) * 60 + int(minutes)
+    if not 0 <= minutes <= MINUTES_PER_DAY:
+        raise ValueError(f"{value} is not a time of the day.")
+    return minutes
+
+
+class SlotTable:
+    """The slots of a single weekday.
+
+    Slot indexes count the slots from the opening time. A reservation can start at any slot
+    before the closing time and last until the end of the open period, which runs into the next day
+    if the club is open around midnight.
+
+    Attributes:
+        opening (int): The opening minute of the day, None if the club is closed on the day.
+        closing (int): The closing minute of the day.
+        limit (int): The minute at which the open period started on the day ends. Minutes of the next day
+            are counted from 1440.
+        slot_minutes (int): The length of a slot in minutes.
+    """
+
+    __slots__ = ('opening', 'closing', 'limit', 'slot_minutes', '_limit_slot')
+
+    def __init__(self, opening, closing, limit, slot_minutes):
+        """Initializes a new instance of the SlotTable class."""
+
+        self.opening = opening
+        self.closing = closing
+        self.limit = limit
+        self.slot_minutes = slot_minutes
+        self._limit_slot = None if opening is None else (limit - opening) // slot_minutes
+
+    def is_open(self, minute):
+        """Checks if the club is open at the given minute of the day."""
+
+        return self.opening is not None and self.opening <= minute < self.closing
+
+    def slot_of(self, minute):
+        """Returns the index of the slot starting at the given minute of the day,
+        None if the club is closed or no slot starts at the minute."""
+
+        if not self.is_open(minute):
+            return None
+        index, offset = divmod(minute - self.opening, self.slot_minutes)
+        return None if offset else index
+
+    def next_slot(self, minute):
+        """Returns the index of the first slot starting at or after the given minute of the day,
+        None if there is no such slot before the closing time."""
+
+        if self.opening is None:
+            return None
+        index = max(0, -(-(minute - self.opening) // self.slot_minutes))
+        return index if self.opening + index * self.slot_minutes < self.closing else None
+
+    def minute_of(self, index):
+        """Returns the minute at which the slot with the given index starts, counted from midnight of the day."""
+
+        return self.opening + index * self.slot_minutes
+
+    def time_of(self, index):
+        """Returns the time at which the slot with the given index starts."""
+
+        minute = self.minute_of(index) % MINUTES_PER_DAY
+        return time(minute // 60, minute % 60)
+
+    def free_slots(self, index, bound):
+        """Returns the number of whole slots from the slot with the given index to the given minute
+        or to the end of the open period, whichever comes first."""
+
+        return max(0, min(self._limit_slot, (bound - self.opening) // self.slot_minutes) - index)
+
+
+class ClubConfig:
+    """The configuration of a club, compiled into per-weekday slot tables and duration menus.
+
+    Attributes:
+        opening_hours (tuple): The (opening, closing) pair of "HH:MM" strings for every weekday,
+            starting on Monday, or None for days on which the club is closed.
+        slot_minutes (int): The granularity of the booking times in minutes.
+        durations (tuple): The allowed lengths of a reservation in minutes, in increasing order.
+
+    Methods:
+        from_json(cls, path)
+            Reads a configuration from a JSON file.
+        from_dict(cls, data), to_dict(self)
+            Convert a configuration from and to a dictionary in the format of the JSON file.
+        table(self, date)
+            Returns the slot table of the weekday of the given date.
+        longest_slots(self)
+            Returns the number of slots of the longest reservation.
+        menu(self, free_slots)
+            Returns the prompt and the answers for the durations fitting in the given number of slots.
+    """
+
+    def __init__(self, opening_hours=('00:00', '24:00'), slot_minutes=1, durations=(30, 60, 90)):
+        """Initializes a new instance of the ClubConfig class.
+
+        The opening hours are a single (opening, closing) pair used on every day,
+        or a sequence of seven pairs or None values, starting on Monday.
+        """
+
+        if len(opening_hours) == 2 and isinstance(opening_hours[0], str):
+            opening_hours = (tuple(opening_hours),) * 7
+        if len(opening_hours) != 7:
+            raise ValueError("Opening hours must be given for every day of the week.")
+        durations = tuple(sorted(set(durations)))
+        if slot_minutes <= 0 or not durations or any(duration <= 0 or duration % slot_minutes
+                                                     for duration in durations):
+            raise ValueError("Durations must be positive multiples of the slot length.")
+        self.opening_hours = tuple(None if hours is None else tuple(hours) for hours in opening_hours)
+        self.slot_minutes = slot_minutes
+        self.durations = durations
+        self._tables = self._compile_tables()
+        self._menus = self._compile_menus()
+
+    @classmethod
+    def from_json(cls, path):
+        """Reads a configuration from a JSON file."""
+
+        with open(path, 'r', encoding='utf-8') as config_file:
+            return cls.from_dict(json.load(config_file))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Returns the configuration given by a dictionary in the format of the JSON file."""
+
+        return cls(data.get("opening_hours", ('00:00', '24:00')), data.get("slot_minutes", 1),
+                   data.get("durations", (30, 60, 90)))
+
+    def to_dict(self):
+        """Returns the configuration as a dictionary in the format of the JSON file."""
+
+        return {"opening_hours": [None if hours is None else list(hours) for hours in self.opening_hours],
+                "slot_minutes": self.slot_minutes, "durations": list(self.durations)}
+
+    def _compile_tables(self):
+        """Returns the slot tables of the weekdays."""
+
+        hours = [None if pair is None else (_minutes(pair[0]), _minutes(pair[1])) for pair in self.opening_hours]
+        tables = []
+        for weekday, pair in enumerate(hours):
+            if pair is None or pair[0] >= pair[1]:
+                tables.append(SlotTable(None, 0, 0, self.slot_minutes))
+                continue
+            opening, closing = pair
+            limit = closing
+            following = hours[(weekday + 1) % 7]
+            if closing == MINUTES_PER_DAY and following is not None and following[0] == 0:
+                limit = MINUTES_PER_DAY + following[1]
+            tables.append(SlotTable(opening, closing, limit, self.slot_minutes))
+        return tuple(tables)
+
+    def _compile_menus(self):
+        """Returns the prompts and answers of the duration menus, indexed by the number of free slots.
+
+        The durations are numbered from 1 and can also be chosen by their minutes. 'yes' chooses the
+        shortest duration. Answers not in the menu choose 60 minutes if they fit, or the shortest duration.
+        """
+
+        menus = []
+        for free_slots in range(self.longest_slots() + 1):
+            durations = [duration for duration in self.durations if duration // self.slot_minutes <= free_slots]
+            if not durations:
+                menus.append((None, {}, None))
+                continue
+            if len(durations) == 1:
+                prompt = (f'Would you like to book the court for {durations[0]} minutes?\n'
+                          '\t0. No\n'
+                          '\t1. Yes\n')
+            else:
+                prompt = ('How long would you like to book the court?\n'
+                          '\t0. Cancel booking\n' +
+                          ''.join(f'\t{number}. {duration} minutes\n'
+                                  for number, duration in enumerate(durations, start=1)))
+            answers = {'0': None, 'no': None, 'yes': durations[0]}
+            for number, duration in enumerate(durations, start=1):
+                answers[str(number)] = duration
+                answers[str(duration)] = duration
+            menus.append((prompt, answers, 60 if 60 in durations else durations[0]))
+        return tuple(menus)
+
+    def table(self, date):
+        """Returns the slot table of the weekday of the given date."""
+
+        return self._tables[date.weekday()]
+
+    def longest_slots(self):
+        """Returns the number of slots of the longest reservation."""
+
+        return self.durations[-1] // self.slot_minutes
+
+    def menu(self, free_slots):
+        """Returns a (prompt, answers, default) tuple for the durations fitting in the given number of slots.
+
+        Answers map the accepted inputs to minutes, or to None to cancel the booking. The prompt is None
+        if no duration fits.
+        """
+
+        return self._menus[min(free_slots, self.longest_slots())]
@@ -4,13 +4,227 @@ It includes the following classes:
 - Client: A class representing a client who can make reservations for tennis courts.
 - CustomEncoder: A custom JSON encoder that can serialize instances of the Client class.
 - Reservation: A class representing a reservation made by a client for a specific date and time.
+- ScheduleSnapshot: An immutable version of the schedule, mapping dates to reservations.
+- ReservationList: A list of reservations which publishes a new ScheduleSnapshot after every change.
+
+The functions format_json_chunk and format_csv_chunk format slices of a schedule
+and are used by the parallel and background exports. The background export writes the slices
+with write_json_fragments, after CSV_HEADER for CSV files, as they are formatted. The worker
+processes of the parallel export read the days of their slice from the schedule they inherit
+and return the finished text of the slice, see export_in_parallel.
+
+Exported files can be compressed with gzip, bz2 or lzma. The data is compressed while
+it is being written, see COMPRESSIONS for the supported options and file extensions.
 """
 
+from bisect import bisect_left, bisect_right
+import bz2
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
 import csv
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from functools import partial
+import gzip
+import io
+import itertools
 import json
 from json import JSONEncoder
+import lzma
+import multiprocessing
+import os
 import re
+import sys
+import threading
+from time import perf_counter
+
+from events import EventBus, ReservationCancelled, ReservationCreated, ReservationLoaded, ReservationUnloaded
+from opening_hours import ClubConfig, MINUTES_PER_DAY, minute_of_day
+from schedule_file import BinarySchedule, write_schedule
+
+# Number of days a reservation checks at most: its week, and the previous and the next day
+CHECKED_DAYS = 9
+# Number of consecutive days sharing a chunk of a schedule snapshot
+CHUNK_DAYS = 32
+# The header of exported CSV files, as written by csv.DictWriter
+CSV_HEADER = "name,start_time,end_time\r\n"
+COMPRESSIONS = {'gzip': (gzip.open, '.gz'), 'bz2': (bz2.open, '.bz2'), 'lzma': (lzma.open, '.xz')}
+
+
+def export_path(file_name, param, compression=None):
+    """Returns the path of an exported file with the extensions of its format and compression."""
+
+    extension = '' if compression is None else COMPRESSIONS[compression][1]
+    return f"{file_name}.{param}{extension}"
+
+
+def open_export_file(path, compression=None, newline=None):
+    """Opens a text file for writing, compressing the written data on the fly if compression is given."""
+
+    if compression is None:
+        return open(path, 'w', newline=newline, encoding='utf-8')
+    return COMPRESSIONS[compression][0](path, 'wt', newline=newline, encoding='utf-8')
+
+
+def open_binary_export_file(path, compression=None):
+    """Opens a file for writing bytes, compressing them on the fly if compression is given."""
+
+    if compression is None:
+        return open(path, 'wb')
+    return COMPRESSIONS[compression][0](path, 'wb')
+
+
+def report_export(path, started):
+    """Prints the size of an exported file and the time it took to write it."""
+
+    print(f"{os.path.getsize(path)} bytes were written in {perf_counter() - started:.3f} seconds.\n")
+
+
+def format_json_chunk(chunk, compact=False):
+    """Formats a chunk of (date, reservations) pairs into JSON fragments.
+
+    Each fragment is the indented JSON list of the day, shifted to the nesting level
+    it has inside the exported dictionary, so the fragments can be joined as they are.
+    Compact fragments are written without indentation and whitespace.
+    """
+
+    fragments = []
+    for date, reservations in chunk:
+        details = [{"name": name, "start_time": start_time.strftime("%H:%M"),
+                    "end_time": end_time.strftime("%H:%M")}
+                   for name, start_time, end_time in reservations]
+        if compact:
+            fragment = json.dumps(details, separators=(',', ':'))
+        else:
+            fragment = json.dumps(details, indent=2).replace("\n", "\n  ")
+        fragments.append((date.strftime("%d.%m"), fragment))
+    return fragments
+
+
+def write_json_fragments(export_file, date_strs, fragments, compact=False):
+    """Writes (date string, fragment) pairs as the JSON document written by serialize_to_json.
+
+    The fragments are written as soon as they are produced. As in serialize_to_json, a day and month
+    occurring again later in the range keep the position of their first occurrence and take the value
+    of their last one. Date strings gives the days and months of the range in order, so such fragments
+    wait only until their last occurrence, which keeps at most a year of fragments in memory.
+    """
+
+    # Keys keep the position of their first insertion, so the keys are in the order of first occurrences
+    last = {date_str: index for index, date_str in enumerate(date_strs)}
+    order = list(last)
+    if not order:
+        export_file.write("{}")
+        return
+    waiting = {}
+    position = 0
+    export_file.write("{" if compact else "{\n")
+    for index, (date_str, fragment) in enumerate(fragments):
+        if last[date_str] != index:
+            continue
+        waiting[date_str] = fragment
+        while position < len(order) and order[position] in waiting:
+            key = order[position]
+            if position:
+                export_file.write("," if compact else ",\n")
+            if compact:
+                export_file.write(f"{json.dumps(key)}:{waiting.pop(key)}")
+            else:
+                export_file.write(f"  {json.dumps(key)}: {waiting.pop(key)}")
+            position += 1
+    export_file.write("}" if compact else "\n}")
+
+
+def _map_in_order(executor, function, chunks, window):
+    """Yields the results of the function for every chunk, in order, computed by the executor.
+
+    At most window chunks are submitted ahead of the result being yielded, so results waiting
+    for a slow consumer do not pile up in memory.
+    """
+
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(function, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def format_csv_chunk(chunk):
+    """Formats a chunk of (date, reservations) pairs into CSV rows without a header."""
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONE)
+    for date, reservations in chunk:
+        for name, start_time, end_time in reservations:
+            writer.writerow([name,
+                             datetime.combine(date, start_time).strftime("%d.%m.%Y %H:%M"),
+                             datetime.combine(date, end_time).strftime("%d.%m.%Y %H:%M")])
+    return buffer.getvalue()
+
+
+# The snapshot and the days read from the store, with their sorted dates, which the worker
+# processes of export_in_parallel format. It is set by _init_export_worker when a worker starts.
+_export_source = None
+
+
+def _export_context():
+    """Returns the multiprocessing context of the parallel export.
+
+    Worker processes are forked on Linux, so they inherit the schedule instead of receiving it pickled,
+    unless other threads are running, such as the worker of an export queue or of an admission controller,
+    as a forked process would copy their locks in whatever state they are. Fork is unsafe on macOS,
+    so worker processes are spawned elsewhere and in that case.
+    """
+
+    if sys.platform.startswith('linux') and threading.active_count() == 1:
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context('spawn')
+
+
+def _init_export_worker(snapshot, stored):
+    """Sets the schedule formatted by a worker process of export_in_parallel."""
+
+    global _export_source
+    _export_source = (snapshot, stored, sorted(stored))
+
+
+def _export_days(days):
+    """Returns (date, reservations) pairs of the given days of the schedule of the worker, with client names."""
+
+    snapshot, stored, _ = _export_source
+    return [(day, stored[day] if day in stored else
+             [(str(reservation.client), reservation.start_time, reservation.end_time)
+              for reservation in snapshot.reservations_on(day)])
+            for day in days]
+
+
+def _encode_json(text):
+    """Encodes JSON text as a file opened in text mode writes it, with the line breaks of the platform."""
+
+    return text.replace("\n", os.linesep).encode('utf-8')
+
+
+def _export_json_days(days, compact=False):
+    """Returns the encoded entries of the given days of the schedule of the worker,
+    as they are written inside the exported JSON dictionary, separated by commas.
+    """
+
+    entries = [f"{json.dumps(key)}:{fragment}" if compact else f"  {json.dumps(key)}: {fragment}"
+               for key, fragment in format_json_chunk(_export_days(days), compact)]
+    return _encode_json(("," if compact else ",\n").join(entries))
+
+
+def _export_csv_range(bounds):
+    """Returns the encoded CSV rows of the days of the schedule of the worker between the (first, last) dates."""
+
+    snapshot, _, stored_dates = _export_source
+    date_start, date_end = bounds
+    days = set(snapshot.dates_between(date_start, date_end))
+    days.update(stored_dates[bisect_left(stored_dates, date_start):bisect_right(stored_dates, date_end)])
+    return format_csv_chunk(_export_days(sorted(days))).encode('utf-8')
 
 
 class CustomEncoder(JSONEncoder):
@@ -39,6 +253,8 @@ class Client:
         A list of reservations made by the client.
     _clients : list
         A list of all clients.
+    config : ClubConfig
+        The opening hours, slot grid and allowed lengths of reservations of the club.
 
     Methods
     -------
@@ -46,18 +262,26 @@ class Client:
         Returns a list of all clients.
     _reservations_per_week(self, date)
         Checks if the client has more than two reservations in a week.
-    _next_available_time(self, date, time, all_reservations)
+    _next_available_time(self, date, time, snapshot)
         Returns the next available time for the client to make a reservation.
-    _time_to_next_reservation(self, date, time, all_reservations)
-        Returns the time to the next reservation for the given date and time.
-    _check_if_vacant(self, date, time, all_reservations)
+    _free_slots(cls, date, time, snapshot)
+        Returns the number of free slots from the given date and time to the next reservation.
+    _check_if_vacant(cls, date, time, snapshot)
         Checks if the court is vacant at the given date and time.
     _check_if_not_past(self, date, time)
         Checks if the given date and time has already passed.
     _check_if_ample_time(self, date, time)
         Checks if there is at least 1 hour remained to the given date and time.
-    _create_new_reservation(self, date, time, all_reservations)
-        Creates a new reservation for the given date and time.
+    _checked_days(date)
+        Returns the first and the last day checked by a reservation on the given date.
+    _refusal(self, date, time, snapshot, minutes)
+        Returns the reason why the client cannot make a reservation at the given date and time, None if they can.
+    _court_refusal(cls, date, time, snapshot, minutes)
+        Returns the reason why the court cannot be booked at the given date and time, None if it can.
+    choose_reservation(self, date, time)
+        Asks the client for the time and the length of a new reservation.
+    book(self, date, time, minutes)
+        Makes a reservation of the given length at the given date and time, without asking the client.
     make_reservation(self, date, time)
         Enables the client to make a new reservation for the given date and time.
     cancel_reservation(self, date)
@@ -69,6 +293,7 @@ class Client:
     """
 
     _clients = []
+    config = ClubConfig()
 
     def __init__(self, name):
         """Initializes a new instance of the Client class."""
@@ -87,45 +312,48 @@ class Client:
         """Checks if the client has more than two reservations in a week."""
 
         week_start = date - timedelta(days=date.weekday())
-        week_end = week_start + timedelta(days=6)
+        # Compared by the days from the start of the week, as the end of the last week is beyond date.max
         reservations_per_week = [reservation for reservation in self.reservation
-                                 if week_start <= reservation.date <= week_end]
+                                 if 0 <= (reservation.date - week_start).days <= 6]
         if len(reservations_per_week) >= 2:
             return False
         return True
 
-    def _next_available_time(self, date, time, all_reservations):
-        """Returns the next available time for the client to make a reservation."""
+    def _next_available_time(self, date, time, snapshot):
+        """Returns the next available time for the client to make a reservation: the first slot
+        after the given time at which the court is vacant and the shortest reservation fits.
+        Returns False if there is none on the day.
+        """
 
-        for reservation in all_reservations:
-            if reservation.date == date and reservation.start_time <= time < reservation.end_time:
-                time = reservation.end_time
-                if self._time_to_next_reservation(date, time, all_reservations) >= timedelta(minutes=30):
-                    return time
+        table = Client.config.table(date)
+        index = table.next_slot(minute_of_day(time) + 1)
+        while index is not None:
+            time = table.time_of(index)
+            if (self._check_if_vacant(date, time, snapshot) and
+                    Client.config.menu(self._free_slots(date, time, snapshot))[0] is not None):
+                return time
+            index = table.next_slot(table.minute_of(index) + 1)
         return False
 
-    def _time_to_next_reservation(self, date, time, all_reservations):
-        """Returns the time to the next reservation for the given date and time."""
-
-        date_time_var = datetime.combine(date, time)
-        filter_reservations = [reservation for reservation in all_reservations
-                               if datetime.combine(reservation.date, reservation.start_time) > date_time_var and
-                               timedelta(minutes=0) < datetime.combine(reservation.date, reservation.start_time) -
-                               date_time_var < timedelta(minutes=90)]
-        if len(filter_reservations) > 0:
-            timediff = min(datetime.combine(reservation.date, reservation.start_time) - date_time_var
-                           for reservation in filter_reservations)
-        else:
-            timediff = timedelta(minutes=90)
-        return timediff
+    @classmethod
+    def _free_slots(cls, date, time, snapshot):
+        """Returns the number of free slots from the given date and time to the next reservation
+        or to the closing time. Reservations of the next day count if the club is open past midnight.
+        """
 
-    def _check_if_vacant(self, date, time, all_reservations):
-        """Checks if the court is vacant at the given date and time."""
+        table = Client.config.table(date)
+        start = minute_of_day(time)
+        next_start = snapshot.next_start(date, start)
+        bound = table.limit if next_start is None else min(table.limit, next_start)
+        return table.free_slots(table.slot_of(start), bound)
 
-        for reservation in all_reservations:
-            if reservation.date == date and reservation.start_time <= time < reservation.end_time:
-                return False
-        return True
+    @classmethod
+    def _check_if_vacant(cls, date, time, snapshot):
+        """Checks if the court is vacant at the given date and time,
+        including reservations of the previous day running past midnight.
+        """
+
+        return snapshot.is_vacant(date, minute_of_day(time))
 
     def _check_if_not_past(self, date, time):
         """Checks if the given date and time has already passed.
@@ -145,48 +373,123 @@ class Client:
             return False
         return True
 
-    def _create_new_reservation(self, date, time, all_reservations):
-        """Creates a new reservation for the given date and time."""
-
-        available_time = self._time_to_next_reservation(date, time, all_reservations)
-        if available_time >= timedelta(minutes=90):
-            choose_time = input('How long would you like to book the court?\n'
-                                '\t0. Cancel booking\n'
-                                '\t1. 30 minutes\n'
-                                '\t2. 60 minutes\n'
-                                '\t3. 90 minutes\n').strip()
-        elif available_time == timedelta(minutes=60):
-            choose_time = input('How long would you like to book the court?\n'
-                                '\t0. Cancel booking\n'
-                                '\t1. 30 minutes\n'
-                                '\t2. 60 minutes\n').strip()
-        else:
-            choose_time = input('Would you like to book the court for 30 minutes?\n'
-                                '\t0. No\n'
-                                '\t1. Yes\n').lower().strip()
-        end_time = (datetime.combine(date, time) + timedelta(minutes=60)).time()
-        match choose_time:
-            case '1' | '30' | 'yes':
-                end_time = (datetime.combine(date, time) + timedelta(minutes=30)).time()
-            case '2' | '60':
-                end_time = (datetime.combine(date, time) + timedelta(minutes=60)).time()
-            case '3' | '90':
-                end_time = (datetime.combine(date, time) + timedelta(minutes=90)).time()
-            case '0' | 'no':
-                print("The booking process was cancelled.\n")
-                return False
+    @staticmethod
+    def _checked_days(date):
+        """Returns the first and the last day checked by a reservation on the given date:
+        its week, and the previous and the next day, whose reservations may run past midnight.
+        The days are limited to the range from date.min to date.max.
+        """
+
+        ordinal = date.toordinal()
+        week_start = ordinal - date.weekday()
+        return (date.fromordinal(max(date.min.toordinal(), min(week_start, ordinal - 1))),
+                date.fromordinal(min(date.max.toordinal(), max(week_start + 6, ordinal + 1))))
+
+    def _refusal(self, date, time, snapshot, minutes=None):
+        """Returns the reason why the client cannot make a reservation at the given date and time, None if they can.
+        If a length in minutes is given, the court must also be free for that long.
+        """
+
+        if not self._reservations_per_week(date):
+            return "Unfortunately, you already have 2 reservations that week.\n"
+        if not self._check_if_not_past(date, time):
+            return "This time has already passed. Please choose another time.\n"
+        if not self._check_if_ample_time(date, time):
+            return ("Unfortunately, the reservation cannot be made "
+                    "as there is less than 1 hour remaining until the reservation time.\n")
+        return self._court_refusal(date, time, snapshot, minutes)
+
+    @classmethod
+    def _court_refusal(cls, date, time, snapshot, minutes=None):
+        """Returns the reason why the court cannot be booked at the given date and time, None if it can:
+        the club must be open, the time on the slot grid and, if a length is given, the court free for that long.
+        """
 
-        reservation = Reservation(self, date, time, end_time)
-        self.reservation.append(reservation)
+        table = cls.config.table(date)
+        minute = minute_of_day(time)
+        if not table.is_open(minute):
+            return "Unfortunately, the club is closed at this time.\n"
+        if table.slot_of(minute) is None:
+            return (f"Unfortunately, reservations can only start every {table.slot_minutes} minutes "
+                    f"from the opening time.\n")
+        if minutes is None:
+            return None
+        if minutes not in cls.config.durations:
+            return f"Unfortunately, reservations cannot last {minutes} minutes.\n"
+        if (not cls._check_if_vacant(date, time, snapshot) or
+                cls._free_slots(date, time, snapshot) < minutes // table.slot_minutes):
+            return "Unfortunately, this time has just been booked by someone else.\n"
+        return None
+
+    def choose_reservation(self, date, time):
+        """Asks the client for the details of a new reservation for the given date and time.
+
+        The reservation is checked first, and if the time is occupied the client is offered the next
+        available time. The client then chooses the length among those fitting before the next reservation.
+        Returns a (time, minutes) pair to pass to book, or None if the reservation cannot be made
+        or the client cancelled, after printing the reason.
+        """
+
+        Reservation.fault_in(*self._checked_days(date))
+        snapshot = Reservation.snapshot()
+        refusal = self._refusal(date, time, snapshot)
+        if refusal is not None:
+            print(refusal)
+            return None
+
+        if not self._check_if_vacant(date, time, snapshot):
+            print("Unfortunately, this time is already occupied.\n")
+            next_available_time = self._next_available_time(date, time, snapshot)
+            if not next_available_time:
+                print("There is no free time later on this day.\n")
+                return None
+            while True:
+                choice = input(f"Would you like to make a reservation for {next_available_time.strftime('%H:%M')} "
+                               f"instead? (yes/no)\n").lower()
+                if choice == 'yes':
+                    time = next_available_time
+                    break
+                if choice == 'no':
+                    print("The booking process was cancelled.\n")
+                    return None
+
+        prompt, answers, default = Client.config.menu(self._free_slots(date, time, snapshot))
+        if prompt is None:
+            print("Unfortunately, there is not enough time for a reservation before the next one.\n")
+            return None
+        minutes = answers.get(input(prompt).lower().strip(), default)
+        if minutes is None:
+            print("The booking process was cancelled.\n")
+            return None
+        return time, minutes
+
+    def book(self, date, time, minutes):
+        """Makes a reservation of the given length in minutes at the given date and time, without asking the client.
+
+        Everything is checked while the week and the days around the reservation are locked, as other threads,
+        or processes sharing the store, may have booked since the client chose the reservation.
+        Prints whether the reservation was made, or why not. Returns True if it was made.
+        If the reservation cannot be written to the store, the error is raised and no reservation is made.
+        """
+
+        with Reservation.editing(*self._checked_days(date)):
+            refusal = self._refusal(date, time, Reservation.snapshot(), minutes)
+            if refusal is not None:
+                print(refusal)
+                return False
+            table = Client.config.table(date)
+            end_time = table.time_of(table.slot_of(minute_of_day(time)) + minutes // table.slot_minutes)
+            Reservation.write_to_store(created=[(date, str(self), time, end_time)])
+            reservation = Reservation(self, date, time, end_time)
+            self.reservation.append(reservation)
         date_str = datetime.strftime(date, "%d.%m.%Y")
         time_str = time.strftime("%H:%M")
-        minutes_dt = (datetime.combine(date, end_time) - datetime.combine(date, time))
-        minutes = minutes_dt.total_seconds() / 60
-        print(f"A reservation for {date_str} at {time_str} for {minutes:.0f} minutes has been added.\n")
+        print(f"A reservation for {date_str} at {time_str} for {minutes} minutes has been added.\n")
         return True
 
     def make_reservation(self, date, time):
         """Enables the client to make a new reservation for the given date and time.
+        Runs choose_reservation and books the chosen reservation. Returns True if it was made.
 
         Side effects:
             - If the client already has 2 reservations for the specified week,
@@ -200,6 +503,9 @@ class Client:
               the method will return False and print a message indicating that the reservation
               cannot be made due to insufficient time.
 
+            - If the club is closed at the specified time, or no slot of the club's grid starts at it,
+              the method will return False and print a message indicating the reason.
+
             - If the specified time is already occupied, the method will prompt the client
               to make a reservation for the next available time instead. If the client agrees,
               the method will create a reservation for the next available time. If the client
@@ -210,36 +516,10 @@ class Client:
               the method will create a new reservation and return True.
         """
 
-        all_reservations = Reservation.list_of_reservations()
-        if not self._reservations_per_week(date):
-            print("Unfortunately, you already have 2 reservations that week.\n")
-            return False
-
-        if not self._check_if_not_past(date, time):
-            print("This time has already passed. Please choose another time.\n")
+        choice = self.choose_reservation(date, time)
+        if choice is None:
             return False
-
-        if not self._check_if_ample_time(date, time):
-            print("Unfortunately, the reservation cannot be made "
-                  "as there is less than 1 hour remaining until the reservation time.\n")
-            return False
-
-        if not self._check_if_vacant(date, time, all_reservations):
-            print("Unfortunately, this time is already occupied.\n")
-            next_available_time = self._next_available_time(date, time, all_reservations)
-            while True:
-                choice = input(f"Would you like to make a reservation for {next_available_time.strftime('%H:%M')} "
-                               f"instead? (yes/no)\n").lower()
-                if choice == 'yes':
-                    self._create_new_reservation(date, next_available_time, all_reservations)
-                    return True
-                if choice == 'no':
-                    print("The booking process was cancelled.\n")
-                    return False
-                continue
-
-        self._create_new_reservation(date, time, all_reservations)
-        return True
+        return self.book(date, *choice)
 
     def __str__(self):
         """Returns a string representation of the client."""
@@ -264,20 +544,425 @@ class Client:
               remaining until the reservation time, a message is printed to inform the user.
         """
 
-        for reservation in self.reservation:
-            if reservation.date == date:
-                if not self._check_if_ample_time(reservation.date, reservation.start_time):
-                    print("Unfortunately, the reservation cannot be cancelled"
-                          " as there is less than 1 hour remaining until the reservation time.\n")
-                    return False
-                self.reservation.remove(reservation)
-                Reservation.list_of_reservations().remove(reservation)
-                date_str = datetime.strftime(date, "%d.%m.%Y")
-                print(f"Your reservation for {date_str} has been cancelled.\n")
-                return True
+        with Reservation.editing(date, date):
+            for reservation in self.reservation:
+                if reservation.date == date:
+                    if not self._check_if_ample_time(reservation.date, reservation.start_time):
+                        print("Unfortunately, the reservation cannot be cancelled"
+                              " as there is less than 1 hour remaining until the reservation time.\n")
+                        return False
+                    Reservation.write_to_store(cancelled=[(reservation.date, str(self), reservation.start_time,
+                                                           reservation.end_time)])
+                    self.reservation.remove(reservation)
+                    Reservation.list_of_reservations().remove(reservation)
+                    date_str = datetime.strftime(date, "%d.%m.%Y")
+                    print(f"Your reservation for {date_str} has been cancelled.\n")
+                    return True
         print("You do not have a reservation for the specified date.\n")
 
 
+class _Day:
+    """The reservations of a day in a snapshot, with an index of the minutes they occupy.
+
+    Attributes:
+        reservations (tuple): The reservations of the day, sorted by start time.
+        starts (tuple): The sorted start minutes of the reservations, counted from midnight.
+        occupied (int): A bitmap of the minutes occupied by the reservations, bit N standing for
+            minute N from midnight of the day. Minutes of reservations running past midnight
+            are counted from 1440.
+    """
+
+    __slots__ = ('reservations', 'starts', 'occupied')
+
+    def __init__(self, reservations):
+        """Initializes a new instance of the _Day class and builds the index of the reservations."""
+
+        self.reservations = reservations
+        self.starts = tuple(minute_of_day(reservation.start_time) for reservation in reservations)
+        occupied = 0
+        for start, reservation in zip(self.starts, reservations):
+            length = (minute_of_day(reservation.end_time) - start) % MINUTES_PER_DAY
+            occupied |= ((1 << length) - 1) << start
+        self.occupied = occupied
+
+
+_NO_DAY = _Day(())
+
+
+class _ChunkedDays(Mapping):
+    """A read-only mapping of dates to tuples of reservations, stored in chunks of consecutive days."""
+
+    __slots__ = ('_chunks',)
+
+    def __init__(self, chunks):
+        """Initializes a new instance of the _ChunkedDays class over a dictionary of chunks."""
+
+        self._chunks = chunks
+
+    def __getitem__(self, date):
+        """Returns the reservations of the given date."""
+
+        chunk = self._chunks.get(date.toordinal() // CHUNK_DAYS)
+        if chunk is None:
+            raise KeyError(date)
+        return chunk[date].reservations
+
+    def __iter__(self):
+        """Iterates over the dates with reservations."""
+
+        for chunk in self._chunks.values():
+            yield from chunk
+
+    def __len__(self):
+        """Returns the number of dates with reservations."""
+
+        return sum(len(chunk) for chunk in self._chunks.values())
+
+
+class ScheduleSnapshot:
+    """An immutable version of the schedule, mapping dates to reservations.
+
+    The days are kept in chunks of CHUNK_DAYS consecutive days, so the next version shares
+    every chunk without changes with this one. Every day keeps the sorted start minutes of its
+    reservations and a bitmap of the minutes they occupy, so vacancy and free time are answered
+    by a bit test and a bisection instead of a pass over the reservations.
+
+    Attributes:
+        version (int): The number of changes published before this version.
+        days (Mapping): A read-only mapping of dates to tuples of reservations
+            sorted by start time. Dates without reservations are not present.
+
+    Methods:
+        reservations_on(self, date)
+            Returns a tuple of reservations made on the given date.
+        dates(self)
+            Returns a sorted tuple of dates with at least one reservation.
+        dates_between(self, date_start, date_end)
+            Returns a sorted tuple of dates in the given range with at least one reservation.
+        is_vacant(self, date, minute)
+            Checks if no reservation occupies the given minute of the given date.
+        next_start(self, date, minute)
+            Returns the first start of a reservation after the given minute of the date or of the next day.
+    """
+
+    __slots__ = ('version', 'days', '_chunks', '_keys', '_dates')
+
+    def __init__(self, version, chunks):
+        """Initializes a new instance of the ScheduleSnapshot class.
+
+        Chunks map the ordinal of a day divided by CHUNK_DAYS to a dictionary mapping the dates
+        of the chunk to their _Day.
+        """
+
+        self.version = version
+        self.days = _ChunkedDays(chunks)
+        self._chunks = chunks
+        self._keys = None
+        self._dates = None
+
+    def _day(self, date):
+        """Returns the _Day of the given date."""
+
+        chunk = self._chunks.get(date.toordinal() // CHUNK_DAYS)
+        return _NO_DAY if chunk is None else chunk.get(date, _NO_DAY)
+
+    def reservations_on(self, date):
+        """Returns a tuple of reservations made on the given date."""
+
+        return self._day(date).reservations
+
+    def is_vacant(self, date, minute):
+        """Checks if no reservation occupies the given minute of the given date,
+        including reservations of the previous day running past midnight.
+        There is no previous day before date.min.
+        """
+
+        if self._day(date).occupied >> minute & 1:
+            return False
+        return date == date.min or not self._day(date - timedelta(days=1)).occupied >> (MINUTES_PER_DAY + minute) & 1
+
+    def next_start(self, date, minute):
+        """Returns the first start of a reservation after the given minute of the given date,
+        or the first start on the next day counted from 1440, None if there is none.
+        """
+
+        starts = self._day(date).starts
+        index = bisect_right(starts, minute)
+        if index < len(starts):
+            return starts[index]
+        if date == date.max:
+            return None
+        starts = self._day(date + timedelta(days=1)).starts
+        return MINUTES_PER_DAY + starts[0] if starts else None
+
+    def dates(self):
+        """Returns a sorted tuple of dates with at least one reservation."""
+
+        # The snapshot never changes, so the sorted dates are computed once, on first use
+        if self._dates is None:
+            self._dates = self.dates_between(date.min, date.max)
+        return self._dates
+
+    def dates_between(self, date_start, date_end):
+        """Returns a sorted tuple of dates in the given range with at least one reservation.
+        Only the chunks overlapping the range are visited.
+        """
+
+        if self._keys is None:
+            self._keys = sorted(self._chunks)
+        keys = self._keys
+        dates = []
+        for key in keys[bisect_left(keys, date_start.toordinal() // CHUNK_DAYS):
+                        bisect_right(keys, date_end.toordinal() // CHUNK_DAYS)]:
+            dates.extend(day for day in sorted(self._chunks[key]) if date_start <= day <= date_end)
+        return tuple(dates)
+
+
+class ReservationList(list):
+    """A list of reservations which publishes a new ScheduleSnapshot after every change.
+
+    Writers are serialized by a lock. Every change copies the small mapping of chunks and the
+    chunks of the changed days only, replacing the tuples of the changed days, then publishes
+    the new snapshot with a single assignment. Readers take the current snapshot without locking and keep iterating
+    a consistent version, while new reservations are being made or cancelled.
+
+    Every added reservation is also published as a ReservationCreated event and every removed
+    one as a ReservationCancelled event on the events bus, see the events module. The events are
+    delivered after the lock is released, so subscribers never run while other writers wait,
+    and an error of a subscriber cannot leave the list changed without the change being published.
+
+    Attributes:
+        events (EventBus): The bus on which changes to the list are published.
+
+    Methods:
+        snapshot(self)
+            Returns the current version of the schedule.
+        append(self, reservation), extend(self, reservations), insert(self, index, reservation)
+            Add reservations to the list and publish a new snapshot.
+        remove(self, reservation), pop(self, index)
+            Remove reservations from the list and publish a new snapshot.
+        clear(self)
+            Removes all reservations from the list and publishes an empty snapshot, without events.
+        __setitem__(self, index, value), __delitem__(self, index), __iadd__(self, reservations),
+        __imul__(self, count)
+            Replace, remove, add or repeat reservations, by index or slice, and publish a new snapshot.
+        batch(self)
+            A context manager publishing a single snapshot for all changes made inside it.
+        locked(self)
+            A context manager in which other writers wait.
+        loading(self)
+            A context manager in which changes are published as loaded and unloaded reservations.
+    """
+
+    def __init__(self, reservations=()):
+        """Initializes a new instance of the ReservationList class."""
+
+        super().__init__()
+        self._lock = threading.RLock()
+        self._snapshot = ScheduleSnapshot(0, {})
+        self._pending = None
+        # Number of nested loading blocks of the thread holding the lock
+        self._loading = 0
+        self.events = EventBus()
+        self.extend(reservations)
+
+    def snapshot(self):
+        """Returns the current version of the schedule."""
+
+        return self._snapshot
+
+    def _next_snapshot(self, added, removed):
+        """Returns the next snapshot, with the given reservations removed and added."""
+
+        chunks = dict(self._snapshot._chunks)
+        copied = set()
+
+        def chunk_of(date):
+            """Returns the chunk of the given date in the next snapshot, copied on first use."""
+
+            key = date.toordinal() // CHUNK_DAYS
+            if key not in copied:
+                chunks[key] = dict(chunks.get(key, ()))
+                copied.add(key)
+            return chunks[key]
+
+        removed_by_day = {}
+        for reservation in removed:
+            removed_by_day.setdefault(reservation.date, set()).add(id(reservation))
+        changed = {}
+        for date, identities in removed_by_day.items():
+            changed[date] = tuple(item for item in self._snapshot.reservations_on(date) if id(item) not in identities)
+        added_by_day = {}
+        for reservation in added:
+            added_by_day.setdefault(reservation.date, []).append(reservation)
+        for date, reservations in added_by_day.items():
+            # The sort is stable, so reservations with equal start times keep the order in which they were made
+            changed[date] = tuple(sorted(changed.get(date, self._snapshot.reservations_on(date)) + tuple(reservations),
+                                         key=lambda reservation: reservation.start_time))
+        for date, reservations in changed.items():
+            days = chunk_of(date)
+            if reservations:
+                days[date] = _Day(reservations)
+            else:
+                days.pop(date, None)
+        for key in copied:
+            if not chunks[key]:
+                del chunks[key]
+        return ScheduleSnapshot(self._snapshot.version + 1, chunks)
+
+    def _publish(self, added=(), removed=()):
+        """Publishes a new snapshot and the events with the given reservations added and removed.
+        Inside a batch, the changes are kept until the batch ends.
+        """
+
+        if self._pending is None:
+            self._snapshot = self._next_snapshot(added, removed)
+        else:
+            pending_added, pending_removed = self._pending
+            for reservation in removed:
+                index = next((index for index, item in enumerate(pending_added) if item is reservation), None)
+                if index is None:
+                    pending_removed.append(reservation)
+                else:
+                    del pending_added[index]
+            pending_added.extend(added)
+        with self.events.batch():
+            self.events.publish(ReservationUnloaded if self._loading else ReservationCancelled, removed)
+            self.events.publish(ReservationLoaded if self._loading else ReservationCreated, added)
+
+    @contextmanager
+    def batch(self):
+        """A context manager publishing a single snapshot for all changes made inside it.
+
+        Other writers wait until the batch ends and readers see the previous snapshot until then.
+        The events of the changes are delivered in a single batch after the snapshot is published.
+        """
+
+        with self.events.held(), self._lock:
+            if self._pending is not None:
+                yield
+                return
+            self._pending = ([], [])
+            with self.events.batch():
+                try:
+                    yield
+                finally:
+                    added, removed = self._pending
+                    self._pending = None
+                    self._snapshot = self._next_snapshot(added, removed)
+
+    @contextmanager
+    def locked(self):
+        """A context manager in which other writers wait, so a check and the change depending on it
+        are made together. The events of the changes are delivered when it ends.
+        """
+
+        with self.events.held(), self._lock:
+            yield
+
+    @contextmanager
+    def loading(self):
+        """A context manager in which added reservations are published as ReservationLoaded events
+        and removed ones as ReservationUnloaded events, for stores moving reservations between
+        memory and the store. Other writers wait until it ends.
+        """
+
+        with self.events.held(), self._lock:
+            self._loading += 1
+            try:
+                yield
+            finally:
+                self._loading -= 1
+
+    def append(self, reservation):
+        """Adds a reservation to the list and publishes a new snapshot."""
+
+        with self.events.held(), self._lock:
+            super().append(reservation)
+            self._publish(added=(reservation,))
+
+    def extend(self, reservations):
+        """Adds reservations to the list and publishes a new snapshot."""
+
+        with self.events.held(), self._lock:
+            reservations = list(reservations)
+            super().extend(reservations)
+            self._publish(added=reservations)
+
+    def insert(self, index, reservation):
+        """Inserts a reservation into the list and publishes a new snapshot."""
+
+        with self.events.held(), self._lock:
+            super().insert(index, reservation)
+            self._publish(added=(reservation,))
+
+    def remove(self, reservation):
+        """Removes a reservation from the list and publishes a new snapshot."""
+
+        with self.events.held(), self._lock:
+            super().remove(reservation)
+            self._publish(removed=(reservation,))
+
+    def pop(self, index=-1):
+        """Removes a reservation at the given index and publishes a new snapshot."""
+
+        with self.events.held(), self._lock:
+            reservation = super().pop(index)
+            self._publish(removed=(reservation,))
+            return reservation
+
+    def __setitem__(self, index, value):
+        """Replaces the reservation at the given index, or the reservations of a slice, and publishes a new snapshot."""
+
+        with self.events.held(), self._lock:
+            if isinstance(index, slice):
+                removed = super().__getitem__(index)
+                value = added = list(value)
+            else:
+                removed, added = [super().__getitem__(index)], [value]
+            super().__setitem__(index, value)
+            self._publish(added=added, removed=removed)
+
+    def __delitem__(self, index):
+        """Removes the reservation at the given index, or the reservations of a slice, and publishes a new snapshot."""
+
+        with self.events.held(), self._lock:
+            removed = super().__getitem__(index)
+            super().__delitem__(index)
+            self._publish(removed=removed if isinstance(index, slice) else (removed,))
+
+    def __iadd__(self, reservations):
+        """Adds reservations to the list and publishes a new snapshot."""
+
+        self.extend(reservations)
+        return self
+
+    def __imul__(self, count):
+        """Repeats the reservations of the list count times and publishes a new snapshot."""
+
+        with self.events.held(), self._lock:
+            reservations = list(self)
+            super().__imul__(count)
+            if count > 0:
+                self._publish(added=reservations * (count - 1))
+            else:
+                self._publish(removed=reservations)
+        return self
+
+    def clear(self):
+        """Removes all reservations from the list and publishes an empty snapshot.
+
+        No events are published, as clearing resets the state of the program rather than
+        cancelling reservations, so subscribers such as client statistics do not count them as cancelled.
+        """
+
+        with self._lock:
+            super().clear()
+            self._snapshot = ScheduleSnapshot(self._snapshot.version + 1, {})
+            if self._pending is not None:
+                self._pending = ([], [])
+
+
 class Reservation:
     """Represents a reservation made by a client for a specific date and time.
 
@@ -287,7 +972,11 @@ class Reservation:
         start_time (datetime.time): The start time of the reservation.
         end_time (datetime.time): The end time of the reservation.
             If None is provided, end time is set to start time plus one hour.
-        _reservations (list): A list of all reservations made, used for class-level operations.
+        sequence (int): The number of reservations made before this one.
+        _reservations (ReservationList): A list of all reservations made, used for class-level operations.
+        events (EventBus): The bus on which reservations made and cancelled are published.
+        store (storage.LazyScheduleStore or shared_store.SharedScheduleStore): The store reservations
+            are loaded from on demand, None if all reservations are in memory.
 
     Methods:
         __init__(self, client, date, start_time, end_time)
@@ -298,19 +987,41 @@ class Reservation:
             Returns a string representation of the reservation's dictionary.
         list_of_reservations(cls)
             Returns a list of all reservations made.
+        snapshot(cls)
+            Returns the current immutable version of the schedule.
         _is_valid_file_name(file_name)
             Checks whether a given file name is valid (i.e. doesn't contain any forbidden symbols).
         _provide_file_name()
             Asks the user to provide a valid file name to save the schedule to.
-        _serialize_to_json(data)
-            Serializes the reservation data to a JSON file.
-        _write_to_csv(data)
-            Writes the reservation data to a CSV file.
-        schedule(cls, date_start, date_end, param)
+        serialize_to_json(data, compression, compact)
+            Serializes the reservation data to a JSON file, optionally compressed or without indentation.
+        write_to_csv(data, compression)
+            Writes the reservation data to a CSV file, optionally compressed.
+        write_to_binary(data)
+            Writes the reservation data to a binary schedule file.
+        load_binary(cls, path)
+            Makes the reservations stored in a binary schedule file.
+        load_records(cls, records)
+            Makes reservations from (date, client name, start time, end time) tuples.
+        fault_in(cls, date_start, date_end)
+            Loads the reservations of the given date range from the store, if there is one.
+        editing(cls, date_start, date_end)
+            A context manager in which the reservations of the given date range are changed.
+        write_to_store(cls, created, cancelled)
+            Writes reservations about to be made and cancelled to the store, if there is one.
+        export_in_parallel(date_start, date_end, param, workers, compression, compact, sparse)
+            Formats the schedule of the date range in worker processes and saves it to a JSON or CSV file.
+        period_schedule(cls, date_start, date_end, sparse, snapshot, stored)
+            Returns a dictionary with reservation details for every day, or every day with reservations,
+            in the given date range.
+        schedule(cls, date_start, date_end, param, workers, compression, compact, sparse)
             Prints or saves the schedule for the given date range, in the specified format.
     """
 
-    _reservations = []
+    _reservations = ReservationList()
+    events = _reservations.events
+    _sequence = itertools.count()
+    store = None
 
     def __init__(self, client, date, start_time, end_time=None):
         """Initializes a new instance of the Reservation class."""
@@ -322,6 +1033,7 @@ class Reservation:
             self.end_time = (datetime.combine(date, start_time) + timedelta(minutes=60)).time()
         else:
             self.end_time = end_time
+        self.sequence = next(Reservation._sequence)
         Reservation._reservations.append(self)
 
     def __str__(self):
@@ -340,6 +1052,12 @@ class Reservation:
 
         return Reservation._reservations
 
+    @classmethod
+    def snapshot(cls):
+        """Returns the current immutable version of the schedule."""
+
+        return Reservation._reservations.snapshot()
+
     @staticmethod
     def is_valid_file_name(file_name):
         """Checks whether a given file name is valid (i.e. doesn't contain any forbidden symbols)."""
@@ -361,10 +1079,11 @@ class Reservation:
             continue
 
     @staticmethod
-    def serialize_to_json(data):
-        """Serializes the reservation data to a JSON file."""
+    def serialize_to_json(data, compression=None, compact=False):
+        """Serializes the reservation data to a JSON file, optionally compressed or without indentation."""
 
         file_name = Reservation.provide_file_name()
+        started = perf_counter()
         result = {}
         for date, reservations in data.items():
             date_str = date.strftime("%d.%m")
@@ -377,16 +1096,23 @@ class Reservation:
                     result[date_str].append(details)
 
         # Dumps dictionary into json file
-        with open(f"{file_name}.json", 'w', encoding='utf-8') as json_file:
-            json.dump(result, json_file, indent=2, cls=CustomEncoder)
-        print(f"The schedule has been saved in {file_name}.json file.\n")
+        path = export_path(file_name, 'json', compression)
+        with open_export_file(path, compression) as json_file:
+            if compact:
+                json.dump(result, json_file, separators=(',', ':'), cls=CustomEncoder)
+            else:
+                json.dump(result, json_file, indent=2, cls=CustomEncoder)
+        print(f"The schedule has been saved in {path} file.\n")
+        report_export(path, started)
 
     @staticmethod
-    def write_to_csv(data):
-        """Writes the reservation data to a CSV file."""
+    def write_to_csv(data, compression=None):
+        """Writes the reservation data to a CSV file, optionally compressed."""
 
         file_name = Reservation.provide_file_name()
-        with open(f"{file_name}.csv", 'w', newline='', encoding='utf-8') as csv_file:
+        started = perf_counter()
+        path = export_path(file_name, 'csv', compression)
+        with open_export_file(path, compression, newline='') as csv_file:
             writer = csv.DictWriter(
                 csv_file,
                 fieldnames=['name', 'start_time', 'end_time'],
@@ -396,21 +1122,198 @@ class Reservation:
             writer.writeheader()
             for date, reservations in data.items():
                 for record in reservations:
-                    print(record[1], record[2])
                     writer.writerow({
                         'name': record[0],
                         'start_time': datetime.combine(date, record[1]).strftime("%d.%m.%Y %H:%M"),
                         'end_time': datetime.combine(date, record[2]).strftime("%d.%m.%Y %H:%M")
                     })
-        print(f"The schedule has been saved in {file_name}.csv file.\n")
+        print(f"The schedule has been saved in {path} file.\n")
+        report_export(path, started)
+
+    @staticmethod
+    def write_to_binary(data):
+        """Writes the reservation data to a binary schedule file, see the schedule_file module."""
+
+        file_name = Reservation.provide_file_name()
+        started = perf_counter()
+        path = f"{file_name}.bin"
+        write_schedule(path, data)
+        print(f"The schedule has been saved in {path} file.\n")
+        report_export(path, started)
+
+    @classmethod
+    def load_binary(cls, path):
+        """Makes the reservations stored in a binary schedule file. Returns the number of reservations made.
+
+        Reservations are assigned to the existing clients with the same name, other clients are created.
+        """
+
+        with BinarySchedule(path) as binary_schedule:
+            return len(cls.load_records(binary_schedule.records_between(date.min, date.max)))
+
+    @classmethod
+    def load_records(cls, records):
+        """Makes reservations from (date, client name, start time, end time) tuples. Returns the reservations made.
+
+        Reservations are assigned to the existing clients with the same name, other clients are created.
+        """
+
+        # The first client with a name is used, as in Session.greeting
+        clients = {}
+        for client in Client.list_of_client():
+            clients.setdefault(client.name, client)
+        reservations = []
+        # Publishes a single snapshot of the schedule for all loaded reservations
+        with cls._reservations.batch():
+            for day, name, start_time, end_time in records:
+                client = clients.get(name)
+                if client is None:
+                    client = clients[name] = Client(name)
+                reservation = cls(client, day, start_time, end_time)
+                client.reservation.append(reservation)
+                reservations.append(reservation)
+        return reservations
+
+    @classmethod
+    def fault_in(cls, date_start, date_end):
+        """Loads the reservations of the given date range from the store, if there is one."""
+
+        if cls.store is not None:
+            cls.store.fault_in(date_start, date_end)
+
+    @classmethod
+    @contextmanager
+    def editing(cls, date_start, date_end):
+        """A context manager in which the reservations of the given date range are changed.
+
+        The days are loaded from the store and, with a store shared by several processes, locked against
+        the other processes and brought up to date. Other threads do not change the reservations meanwhile,
+        so checks made inside still hold when the change is made.
+        """
+
+        with cls.store.editing(date_start, date_end) if cls.store is not None else nullcontext(), \
+                cls._reservations.locked():
+            yield
 
     @classmethod
-    def schedule(cls, date_start, date_end, param):
-        """Prints or saves the schedule for the given date range, in the specified format."""
+    def write_to_store(cls, created=(), cancelled=()):
+        """Writes reservations about to be made and cancelled to the store, if there is one.
+        Both are lists of (date, client name, start time, end time) tuples.
+
+        It is called inside editing, before the change is made in memory, so a store shared by several
+        processes has the change before the days are unlocked, and an error of the store leaves memory unchanged.
+        """
+
+        if cls.store is not None:
+            cls.store.write(created, cancelled)
+
+    @staticmethod
+    def export_in_parallel(date_start, date_end, param, workers=None, compression=None, compact=False, sparse=False):
+        """Formats the schedule of the date range in worker processes and saves it to a JSON or CSV file.
+
+        The workers receive only the dates of their slice of the range. They read the reservations from
+        the snapshot of the schedule and the days read from the store, which they inherit when they start,
+        and return the finished text of the slice, which is written in date order as it arrives.
+        The file is identical to the one written by serialize_to_json or write_to_csv for the same range.
+        """
+
+        file_name = Reservation.provide_file_name()
+        started = perf_counter()
+        workers = workers or os.cpu_count() or 1
+        # This comes first, as a shared store reloads the days changed by other processes
+        stored = Reservation.store.stored_between(date_start, date_end) if Reservation.store is not None else {}
+        snapshot = Reservation.snapshot()
+        if param == 'json':
+            if sparse:
+                days = sorted(set(snapshot.dates_between(date_start, date_end)).union(stored))
+            else:
+                days = [date_start + timedelta(days=offset) for offset in range((date_end - date_start).days + 1)]
+            # As in serialize_to_json, a day and month occurring again later keep the position
+            # of their first occurrence and take the value of their last one
+            last = {}
+            for day in days:
+                last[(day.month, day.day)] = day
+            days = list(last.values())
+            chunk_size = max(1, -(-len(days) // (workers * 4)))
+            tasks = [days[index:index + chunk_size] for index in range(0, len(days), chunk_size)]
+            function = partial(_export_json_days, compact=compact)
+        else:
+            # Days without reservations have no rows, so the range is split into equal spans of days
+            length = (date_end - date_start).days + 1
+            chunk_days = max(1, -(-length // (workers * 4)))
+            tasks = [(date_start + timedelta(days=offset),
+                      min(date_end, date_start + timedelta(days=offset + chunk_days - 1)))
+                     for offset in range(0, length, chunk_days)]
+            function = _export_csv_range
+
+        path = export_path(file_name, param, compression)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_export_context(), initializer=_init_export_worker,
+                                 initargs=(snapshot, stored)) as executor, \
+                open_binary_export_file(path, compression) as export_file:
+            if param == 'json' and not tasks:
+                export_file.write(b"{}")
+            elif param == 'json':
+                export_file.write(_encode_json("{" if compact else "{\n"))
+                for index, entries in enumerate(_map_in_order(executor, function, tasks, workers * 2)):
+                    if index:
+                        export_file.write(_encode_json("," if compact else ",\n"))
+                    export_file.write(entries)
+                export_file.write(_encode_json("}" if compact else "\n}"))
+            else:
+                export_file.write(CSV_HEADER.encode('utf-8'))
+                for rows in _map_in_order(executor, function, tasks, workers * 2):
+                    export_file.write(rows)
+        print(f"The schedule has been saved in {path} file.\n")
+        report_export(path, started)
+
+    @classmethod
+    def period_schedule(cls, date_start, date_end, sparse=False, snapshot=None, stored=None):
+        """Returns a dictionary with reservation details for every day in the given date range.
+
+        If sparse, days without reservations are left out, and only the days with reservations
+        are visited, so the time and memory used do not grow with the length of the range.
+        A snapshot taken earlier can be given together with the days the store read for it,
+        so the schedule of that version is built later, for example on another thread.
+        """
+
+        # Days which are not loaded from the store are read from it directly, with client names.
+        # This comes first, as a shared store reloads the days changed by other processes.
+        if stored is None:
+            stored = cls.store.stored_between(date_start, date_end) if cls.store is not None else {}
+        # Reads a single version of the schedule, in which reservations of each day
+        # are already sorted by the time the reservation starts
+        if snapshot is None:
+            snapshot = cls.snapshot()
+        period_schedule = {}
+        if sparse:
+            for current_date in sorted(set(snapshot.dates_between(date_start, date_end)).union(stored)):
+                period_schedule[current_date] = stored.get(current_date) or [
+                    (reservation.client, reservation.start_time, reservation.end_time)
+                    for reservation in snapshot.reservations_on(current_date)]
+            return period_schedule
+        for day in range((date_end - date_start).days + 1):
+            current_date = date_start + timedelta(days=day)
+            if current_date in stored:
+                period_schedule[current_date] = stored[current_date]
+                continue
+            period_schedule[current_date] = [(reservation.client, reservation.start_time, reservation.end_time)
+                                             for reservation in snapshot.reservations_on(current_date)]
+        return period_schedule
+
+    @classmethod
+    def schedule(cls, date_start, date_end, param, workers=None, compression=None, compact=False, sparse=False):
+        """Prints or saves the schedule for the given date range, in the specified format.
+
+        The param is one of 'print', 'json', 'csv' or 'bin'. If the number of workers is given,
+        JSON and CSV files are formatted in parallel processes. JSON and CSV files are compressed
+        with one of COMPRESSIONS if given, compact applies to JSON only. If sparse, only the days with
+        reservations are visited: runs of days without reservations are printed as a single line,
+        and are left out of JSON files.
+        """
 
         def _get_day_name(target_date):
             """Converts the datetime object into current date related aliases."""
-            today = date.today()
+            today = datetime.now().date()
             tomorrow = today + timedelta(days=1)
             after_tomorrow = today + timedelta(days=2)
             yesterday = today - timedelta(days=1)
@@ -428,37 +1331,44 @@ class Reservation:
 
             return target_date.strftime("%A")
 
-        all_reservations = Reservation.list_of_reservations()
-        # Creates the dictionary with all days in the given range
-        period_schedule = {}
-        for day in range((date_end - date_start).days + 1):
-            current_date = date_start + timedelta(days=day)
-            period_schedule[current_date] = []
-
-        # Adds a reservation object to the dictionary, where each key corresponds
-        # to a date on which the reservation is made.
-        for reservation in all_reservations:
-            if date_start <= reservation.date <= date_end:
-                period_schedule.get(reservation.date).append((reservation.client,
-                                                              reservation.start_time, reservation.end_time))
-
-        # Sorts all the reservations for each day in a period by the time the reservation starts
-        for date, reservation in period_schedule.items():
-            period_schedule[date] = sorted(reservation, key=lambda details: details[1])
+        def _print_day(target_date, reservations):
+            """Prints the reservations of a day."""
+            print(f"\n{_get_day_name(target_date)}, {datetime.strftime(target_date, '%d.%m.%Y')}")
+            if len(reservations) > 0:
+                for reservation in reservations:
+                    print(f"* {reservation[0]}, from "
+                          f"{reservation[1].strftime('%H:%M')} "
+                          f"to {reservation[2].strftime('%H:%M')}")
+            else:
+                print("No Reservations")
+
+        def _print_empty_days(first_date, last_date):
+            """Prints a run of days without reservations as a single line."""
+            if first_date == last_date:
+                _print_day(first_date, [])
+            elif first_date < last_date:
+                print(f"\nNo Reservations from {datetime.strftime(first_date, '%d.%m.%Y')} "
+                      f"to {datetime.strftime(last_date, '%d.%m.%Y')}")
+
+        if workers is not None and param in ('json', 'csv'):
+            # The worker processes read the schedule themselves, so it is not built here
+            Reservation.export_in_parallel(date_start, date_end, param, workers, compression, compact, sparse)
+            return
+
+        period_schedule = cls.period_schedule(date_start, date_end, sparse)
 
         if param == 'print':
+            next_date = date_start
             for date, reservations in period_schedule.items():
-                print(f"\n{_get_day_name(date)}, {datetime.strftime(date, '%d.%m.%Y')}")
-                if len(reservations) > 0:
-                    for reservation in reservations:
-                        print(f"* {reservation[0]}, from "
-                              f"{reservation[1].strftime('%H:%M')} "
-                              f"to {reservation[2].strftime('%H:%M')}")
-                else:
-                    print("No Reservations")
+                _print_empty_days(next_date, date - timedelta(days=1))
+                _print_day(date, reservations)
+                next_date = date + timedelta(days=1)
+            _print_empty_days(next_date, date_end)
             print()
+        elif param == 'bin':
+            Reservation.write_to_binary(period_schedule)
         elif param == 'json':
-            Reservation.serialize_to_json(period_schedule)
+            Reservation.serialize_to_json(period_schedule, compression, compact)
 
         else:
-            Reservation.write_to_csv(period_schedule)
+            Reservation.write_to_csv(period_schedule, compression)
@@ -0,0 +1,169 @@
+"""This module provides a compact binary file format for the club's schedule.
+
+The file is made of fixed-width little-endian sections, so it can be memory-mapped
+and queried by date range without reading the whole file:
+- Header: magic bytes, format version, and the numbers of days, records and clients.
+- Day index: the day ordinal and the index of its first record, for every day with reservations,
+  sorted by day.
+- Records: day ordinal, start minute, end minute and client ID of every reservation,
+  sorted by day and start time.
+- Client-name table: the offsets of the client names, followed by the UTF-8 encoded names.
+
+It includes the following function and class:
+- write_schedule: Writes the schedule to a binary file.
+- BinarySchedule: A class reading a binary schedule file through mmap.
+"""
+
+from datetime import date, time, timedelta
+import mmap
+import struct
+
+from opening_hours import minute_of_day
+
+MAGIC = b'CRTS'
+VERSION = 1
+HEADER = struct.Struct('<4sHIII')
+DAY = struct.Struct('<iI')
+RECORD = struct.Struct('<iHHI')
+NAME_OFFSET = struct.Struct('<I')
+
+
+def write_schedule(path, data):
+    """Writes the schedule to a binary file.
+
+    Data is a dictionary mapping dates to lists of (client, start time, end time) tuples,
+    as returned by Reservation.period_schedule. Days without reservations are not written.
+    """
+
+    client_ids = {}
+    days = []
+    records = []
+    for day in sorted(data):
+        reservations = sorted(data[day], key=lambda details: details[1])
+        if len(reservations) == 0:
+            continue
+        ordinal = day.toordinal()
+        days.append(DAY.pack(ordinal, len(records)))
+        for client, start_time, end_time in reservations:
+            client_id = client_ids.setdefault(str(client), len(client_ids))
+            records.append(RECORD.pack(ordinal, minute_of_day(start_time), minute_of_day(end_time), client_id))
+
+    names = [name.encode('utf-8') for name in client_ids]
+    offsets = [0]
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+
+    with open(path, 'wb') as binary_file:
+        binary_file.write(HEADER.pack(MAGIC, VERSION, len(days), len(records), len(names)))
+        binary_file.write(b''.join(days))
+        binary_file.write(b''.join(records))
+        binary_file.write(b''.join(NAME_OFFSET.pack(offset) for offset in offsets))
+        binary_file.write(b''.join(names))
+
+
+class BinarySchedule:
+    """Reads a binary schedule file through mmap.
+
+    Date-range queries find the first and the last day of the range by a binary search
+    in the day index and decode only the records between them.
+
+    Methods
+    -------
+    dates(self)
+        Returns a list of dates with at least one reservation.
+    records_between(self, date_start, date_end)
+        Yields (date, client name, start time, end time) tuples of reservations in the date range.
+    period_schedule(self, date_start, date_end)
+        Returns a dictionary with reservation details for every day in the given date range.
+    name(self, client_id)
+        Returns the name of the client with the given ID.
+    close(self)
+        Closes the memory map and the file.
+    """
+
+    def __init__(self, path):
+        """Initializes a new instance of the BinarySchedule class and maps the file into memory."""
+
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._day_count, self._record_count, self._name_count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a schedule file of version {VERSION}.")
+        self._days_offset = HEADER.size
+        self._records_offset = self._days_offset + self._day_count * DAY.size
+        self._names_offset = self._records_offset + self._record_count * RECORD.size
+        self._blob_offset = self._names_offset + (self._name_count + 1) * NAME_OFFSET.size
+        self._names = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the memory map and the file."""
+
+        self._map.close()
+        self._file.close()
+
+    def _day(self, index):
+        """Returns the ordinal and the first record index of the day at the given index."""
+
+        return DAY.unpack_from(self._map, self._days_offset + index * DAY.size)
+
+    def _first_day_from(self, ordinal):
+        """Returns the index of the first day in the index with an ordinal not less than the given one."""
+
+        low, high = 0, self._day_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._day(middle)[0] < ordinal:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _first_record(self, day_index):
+        """Returns the index of the first record of the day at the given index."""
+
+        if day_index >= self._day_count:
+            return self._record_count
+        return self._day(day_index)[1]
+
+    def name(self, client_id):
+        """Returns the name of the client with the given ID."""
+
+        if client_id not in self._names:
+            start, end = struct.unpack_from('<II', self._map, self._names_offset + client_id * NAME_OFFSET.size)
+            self._names[client_id] = self._map[self._blob_offset + start:self._blob_offset + end].decode('utf-8')
+        return self._names[client_id]
+
+    def dates(self):
+        """Returns a list of dates with at least one reservation."""
+
+        return [date.fromordinal(self._day(index)[0]) for index in range(self._day_count)]
+
+    def records_between(self, date_start, date_end):
+        """Yields (date, client name, start time, end time) tuples of reservations in the date range."""
+
+        first = self._first_record(self._first_day_from(date_start.toordinal()))
+        last = self._first_record(self._first_day_from(date_end.toordinal() + 1))
+        start = self._records_offset + first * RECORD.size
+        end = self._records_offset + last * RECORD.size
+        for ordinal, start_minute, end_minute, client_id in RECORD.iter_unpack(self._map[start:end]):
+            yield (date.fromordinal(ordinal), self.name(client_id),
+                   time(start_minute // 60, start_minute % 60), time(end_minute // 60, end_minute % 60))
+
+    def period_schedule(self, date_start, date_end):
+        """Returns a dictionary with reservation details for every day in the given date range,
+        in the format of Reservation.period_schedule, with client names instead of clients.
+        """
+
+        period_schedule = {}
+        for day in range((date_end - date_start).days + 1):
+            period_schedule[date_start + timedelta(days=day)] = []
+        for day, name, start_time, end_time in self.records_between(date_start, date_end):
+            period_schedule[day].append((name, start_time, end_time))
+        return period_schedule
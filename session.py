@@ -4,13 +4,23 @@ The only class in this module is Session, which represents the user interface.
 The Session class provides methods to greet the user, display a main menu, make a reservation,
 print the club's schedule, and save the schedule to a file.
 
-This module requires the datetime module for date and time handling,
-and the reservation module for the Client and Reservation classes.
+This module requires the date_parser module for parsing the dates and times entered by the user,
+the reservation module for the Client and Reservation classes,
+and the jobs module for saving the schedule in the background.
 """
 
-from datetime import datetime
+from functools import partial
+import os
+
+from date_parser import normalize_separators, parse_date, parse_date_time
+from jobs import ExportQueue
 from reservation import Client, Reservation
 
+# Longer ranges are printed without the days that have no reservations
+SPARSE_PRINT_DAYS = 31
+# Longer ranges are saved to JSON and CSV files by worker processes, one per CPU
+PARALLEL_EXPORT_DAYS = 366
+
 
 class Session:
     """Represents a tennis club user interface.
@@ -27,6 +37,8 @@ class Session:
         Displays a main menu of options to the user. Runs the selected option.
     _session_make_reservation(self, client)
         Prompts the user for a date and time to make the reservation.
+    _admitted_book(self, client, date, time, minutes)
+        Books the chosen reservation through the admission controller, if there is one.
     _print_schedule(self)
         Prompts the user for dates to print the club's schedule.
     _date_valid(self, date)
@@ -35,27 +47,55 @@ class Session:
         Prompts the user for two dates and returns them as datetime objects.
     _save_to_file(self)
         Prompts the user for dates and a file format, then saves the club's schedule to a file.
+    _choose_compression(self)
+        Prompts the user for the compression of the saved file.
+    _manage_export_jobs(self)
+        Displays the export jobs running in the background and allows to cancel them.
+    _finish_export_jobs(self)
+        Waits for the export jobs which have not finished yet and reports their results.
     """
 
-    # def __init__(self):
-    #     """Initializes a new instance of the Reservation class."""
-    #
-    #     self.main()
+    def __init__(self, admission=None):
+        """Initializes a new instance of the Session class.
+
+        Reservations are made through the given admission.AdmissionController, if any.
+        """
+
+        self.export_queue = ExportQueue()
+        self.admission = admission
 
     def main(self):
-        """Runs the main session loop until session in completed by user."""
+        """Runs the main session loop until session in completed by user.
 
-        while True:
-            choice = input("Press 1 to start the reservation process.\nPress 2 to exit.\n")
-            match choice:
-                case '1':
-                    guest = self.greeting()
-                    self.menu(guest)
-                case '2':
-                    print("Goodbye. See you again soon.")
-                    break
-                case _:
-                    continue
+        Export jobs still running when the user exits are waited for. If the session is interrupted,
+        they are cancelled, so that no partially written file is left behind.
+        """
+
+        try:
+            while True:
+                choice = input("Press 1 to start the reservation process.\nPress 2 to exit.\n")
+                match choice:
+                    case '1':
+                        guest = self.greeting()
+                        self.menu(guest)
+                    case '2':
+                        self._finish_export_jobs()
+                        print("Goodbye. See you again soon.")
+                        break
+                    case _:
+                        continue
+        except BaseException:
+            self.export_queue.close(cancel=True)
+            raise
+
+    def _finish_export_jobs(self):
+        """Waits for the export jobs which have not finished yet and reports their results."""
+
+        if any(job.status in ('queued', 'running') for job in self.export_queue.jobs()):
+            print("Waiting for the export jobs to finish.")
+        self.export_queue.close()
+        for job in self.export_queue.finished_jobs():
+            print(job.notice())
 
     def _valid_name(self, client_name):
         """Check if the name, provided by user, is valid."""
@@ -93,12 +133,15 @@ class Session:
         """Displays a main menu of options to the user. Runs the selected option."""
 
         while True:
+            for job in self.export_queue.finished_jobs():
+                print(job.notice())
             choice = input("What do you want to do?\n\t"
                            "1. Make reservation\n\t"
                            "2. Cancel reservation\n\t"
                            "3. Print schedule\n\t"
                            "4. Save schedule to a file\n\t"
-                           "5. Exit\n").strip()
+                           "5. Show export jobs\n\t"
+                           "6. Exit\n").strip()
 
             match choice:
                 case '1':
@@ -106,10 +149,11 @@ class Session:
                         continue
 
                 case '2':
-                    date_input = input("What is the date of the reservation you want to cancel? "
-                                       "{DD.MM.YYYY}\n").replace('/', '.').replace('-', '.').strip()
-                    if self._date_valid(date_input):
-                        client.cancel_reservation(self._date_valid(date_input))
+                    date_input = normalize_separators(input("What is the date of the reservation you want to cancel? "
+                                                            "{DD.MM.YYYY}\n"))
+                    date_dt = self._date_valid(date_input)
+                    if date_dt:
+                        client.cancel_reservation(date_dt)
                     else:
                         continue
 
@@ -122,6 +166,9 @@ class Session:
                         continue
 
                 case '5':
+                    self._manage_export_jobs()
+
+                case '6':
                     print("Thank you for choosing our tennis club.\n")
                     break
 
@@ -130,83 +177,146 @@ class Session:
                     continue
 
     def _session_make_reservation(self, client):
-        """Prompts the user for a date and time to make the reservation."""
-
-        date_input = input(
-            "When would you like to book? {DD.MM.YYYY HH:MM}\n").replace('/', '.').replace('-', '.').strip()
-        try:
-            reservation_datetime = datetime.strptime(date_input, "%d.%m.%y %H:%M")
-        except ValueError:
-            try:
-                reservation_datetime = datetime.strptime(date_input, "%d.%m.%Y %H:%M")
-            except ValueError:
-                print("Please check the format of your date and time. "
-                      "Reservations must be made in DD.MM.YYYY HH:MM format.")
-                return False
+        """Prompts the user for a date and time to make the reservation.
+        The reservation chosen by the client is booked through the admission controller, if there is one.
+        """
+
+        date_input = normalize_separators(input("When would you like to book? {DD.MM.YYYY HH:MM}\n"))
+        reservation_datetime = parse_date_time(date_input)
+        if reservation_datetime is None:
+            print("Please check the format of your date and time. "
+                  "Reservations must be made in DD.MM.YYYY HH:MM format.")
+            return False
         date = reservation_datetime.date()
-        time = reservation_datetime.time()
-        if not client.make_reservation(date, time):
+        choice = client.choose_reservation(date, reservation_datetime.time())
+        if choice is None:
             return False
-        return True
+        return self._admitted_book(client, date, *choice)
+
+    def _admitted_book(self, client, date, time, minutes):
+        """Books the chosen reservation through the admission controller, if there is one.
+        Only the booking is admitted, the questions to the user are asked before it.
+        Tells the user to try again later if the attempt is not admitted.
+        """
+
+        if self.admission is None:
+            return client.book(date, time, minutes)
+        request = self.admission.submit(client.name, partial(client.book, date, time, minutes))
+        if request.status == 'rejected':
+            print(request.notice())
+            return False
+        # Runs the queued attempts, fairly across clients, unless a worker thread has already taken this one
+        self.admission.process()
+        request.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
 
     def _print_schedule(self):
-        """Prompts the user for dates to print the club's schedule."""
+        """Prompts the user for dates to print the club's schedule.
+        Runs of days without reservations are printed as a single line if the range is long.
+        """
 
         dates = self._choose_dates()
         date_from_dt = dates[0]
         date_to_dt = dates[1]
-        Reservation.schedule(date_from_dt, date_to_dt, 'print')
+        Reservation.schedule(date_from_dt, date_to_dt, 'print',
+                             sparse=(date_to_dt - date_from_dt).days >= SPARSE_PRINT_DAYS)
         return True
 
     def _date_valid(self, date):
         """Validates a date entered by the user and returns a datetime object if valid."""
 
-        try:
-            date_dt = datetime.strptime(date, "%d.%m.%y").date()
-            return date_dt
-        except ValueError:
-            try:
-                date_dt = datetime.strptime(date, "%d.%m.%Y").date()
-                return date_dt
-            except ValueError:
-                print("Please check the format of your date and time. "
-                      "Reservations must be made in DD.MM.YYYY format.")
-                return False
+        date_dt = parse_date(date)
+        if date_dt is None:
+            print("Please check the format of your date and time. "
+                  "Reservations must be made in DD.MM.YYYY format.")
+            return False
+        return date_dt
 
     def _choose_dates(self):
         """Prompts the user for two dates and returns them as datetime objects."""
 
         while True:
-            date_from = input("From what date would you like to save the schedule? "
-                              "{DD.MM.YYYY}\n").replace('/', '.').replace('-', '.').strip()
-            if self._date_valid(date_from):
-                date_from_dt = self._date_valid(date_from)
+            date_from_dt = self._date_valid(normalize_separators(input("From what date would you like to save "
+                                                                       "the schedule? {DD.MM.YYYY}\n")))
+            if date_from_dt:
                 break
-            continue
         while True:
-            date_to = input("Until what date would you like to save the schedule? "
-                            "{DD.MM.YYYY}\n").replace('/', '.').replace('-', '.').strip()
-            if self._date_valid(date_to):
-                date_to_dt = self._date_valid(date_to)
+            date_to_dt = self._date_valid(normalize_separators(input("Until what date would you like to save "
+                                                                     "the schedule? {DD.MM.YYYY}\n")))
+            if date_to_dt:
                 break
-            continue
         return date_from_dt, date_to_dt
 
     def _save_to_file(self):
-        """Prompts the user for dates and a file format, then saves the club's schedule to a file."""
+        """Prompts the user for dates and a file format, then saves the club's schedule to a file.
+        JSON and CSV files of long ranges are formatted by worker processes.
+        """
 
         dates = self._choose_dates()
         date_from_dt = dates[0]
         date_to_dt = dates[1]
+        workers = os.cpu_count() if (date_to_dt - date_from_dt).days >= PARALLEL_EXPORT_DAYS else None
         while True:
             file_format = input("\tPress 1 to save in JSON format\n\tPress 2 to save in CSV format\n"
-                                "\tPress 3 to cancel saving\n")
+                                "\tPress 3 to cancel saving\n"
+                                "\tPress 4 to save in JSON format in the background\n"
+                                "\tPress 5 to save in CSV format in the background\n"
+                                "\tPress 6 to save in binary format\n")
             if file_format == '1':
-                Reservation.schedule(date_from_dt, date_to_dt, 'json')
+                Reservation.schedule(date_from_dt, date_to_dt, 'json', workers, compression=self._choose_compression())
                 break
             if file_format == '2':
-                Reservation.schedule(date_from_dt, date_to_dt, 'csv')
+                Reservation.schedule(date_from_dt, date_to_dt, 'csv', workers, compression=self._choose_compression())
                 break
             if file_format == '3':
                 break
+            if file_format in ('4', '5'):
+                param = 'json' if file_format == '4' else 'csv'
+                compression = self._choose_compression()
+                job = self.export_queue.submit(date_from_dt, date_to_dt, param, Reservation.provide_file_name(),
+                                               compression)
+                print(f"The schedule is being saved in the background as export job {job.job_id}.\n")
+                break
+            if file_format == '6':
+                Reservation.schedule(date_from_dt, date_to_dt, 'bin')
+                break
             continue
+
+    def _choose_compression(self):
+        """Prompts the user for the compression of the saved file. Returns None for an uncompressed file."""
+
+        while True:
+            choice = input("How would you like to compress the file?\n\t"
+                           "0. Do not compress\n\t"
+                           "1. gzip\n\t"
+                           "2. bz2\n\t"
+                           "3. xz\n").strip()
+            match choice:
+                case '0':
+                    return None
+                case '1':
+                    return 'gzip'
+                case '2':
+                    return 'bz2'
+                case '3':
+                    return 'lzma'
+                case _:
+                    continue
+
+    def _manage_export_jobs(self):
+        """Displays the export jobs running in the background and allows to cancel them."""
+
+        jobs = self.export_queue.jobs()
+        if len(jobs) == 0:
+            print("There are no export jobs.\n")
+            return
+        for job in jobs:
+            print(f"* Job {job.job_id}, {job.path}: {job.status}, {job.progress()} written")
+        job_id = input("Enter the ID of a job to cancel it or press Enter to return to the menu.\n").strip()
+        if job_id.isdigit():
+            if self.export_queue.cancel(int(job_id)):
+                print(f"Export job {job_id} is being cancelled.\n")
+            else:
+                print("There is no running export job with this ID.\n")
@@ -0,0 +1,379 @@
+"""This module runs several clubs in a pool of worker processes.
+
+The clients and reservations of a club are class-level lists of Client and Reservation,
+so a single process serves one club at a time and is bound by the GIL. Here every club
+is assigned to one of the worker processes by a stable hash of its name, and each worker
+keeps the lists of its clubs, installing them on the classes while it serves a request.
+A Router in the main process sends book, cancel and schedule requests to the worker of the club.
+Queries about all clubs, such as finding the clubs with a free court at a given time, are sent
+to every worker at once, run in parallel, and their results are merged.
+
+Bookings run Client.book, which makes the reservation without asking the client, and free courts
+are found with the checks of Client._court_refusal, so workers follow the same rules as a session.
+
+It includes the following classes and functions:
+- ClubState: The clients, reservations and configuration of a single club.
+- Router: A class dispatching requests to the worker processes by club.
+- available_cpus: Returns the number of CPUs this process may run on.
+- benchmark: Reports the throughput and the CPU time of bookings with a growing number of worker processes.
+
+Run this module to see the benchmark: `python sharding.py`.
+"""
+
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, time, timedelta
+from io import StringIO
+import multiprocessing
+import os
+import threading
+from time import perf_counter, process_time
+import zlib
+
+from opening_hours import ClubConfig
+from reservation import Client, Reservation, ReservationList
+
+
+def shard_of(club, workers):
+    """Returns the index of the worker process serving the club.
+    The hash is stable across processes and runs, unlike the built-in hash of strings.
+    """
+
+    return zlib.crc32(club.encode('utf-8')) % workers
+
+
+class ClubState:
+    """The clients, reservations and configuration of a single club.
+
+    Attributes:
+        clients (list): The clients of the club.
+        reservations (ReservationList): The reservations of the club.
+        config (ClubConfig): The opening hours, slot grid and reservation lengths of the club.
+
+    Methods:
+        active(self)
+            A context manager in which Client and Reservation work with the lists of the club.
+        book(self, name, date, start_time, minutes)
+            Makes a reservation for the client with the given name. Returns True if it was made.
+        cancel(self, name, date)
+            Cancels the reservation of the client on the given date. Returns True if it was cancelled.
+        schedule(self, date_start, date_end)
+            Returns the days with reservations in the date range.
+        is_free(self, date, start_time, minutes)
+            Checks if a reservation of the given length can be made at the given date and time.
+    """
+
+    __slots__ = ('clients', 'reservations', 'config')
+
+    def __init__(self, config=None):
+        """Initializes a new instance of the ClubState class."""
+
+        self.clients = []
+        self.reservations = ReservationList()
+        self.config = config or ClubConfig()
+
+    @contextmanager
+    def active(self):
+        """A context manager in which Client and Reservation work with the lists of the club.
+
+        The reservations of a club are kept in memory only, so no store is used while it runs,
+        even if the process was forked from one using a store.
+        """
+
+        previous = (Client._clients, Client.config, Reservation._reservations, Reservation.events,
+                    Reservation.store)
+        Client._clients, Client.config = self.clients, self.config
+        Reservation._reservations, Reservation.events = self.reservations, self.reservations.events
+        Reservation.store = None
+        try:
+            yield
+        finally:
+            (Client._clients, Client.config, Reservation._reservations, Reservation.events,
+             Reservation.store) = previous
+
+    def _client(self, name, create=True):
+        """Returns the first client with the given name, creating it if there is none.
+        Returns None instead if the client should not be created.
+        """
+
+        for client in self.clients:
+            if client.name == name:
+                return client
+        return Client(name) if create else None
+
+    def book(self, name, date, start_time, minutes):
+        """Makes a reservation for the client with the given name. Returns True if it was made."""
+
+        with self.active():
+            with redirect_stdout(StringIO()):
+                return self._client(name).book(date, start_time, minutes)
+
+    def cancel(self, name, date):
+        """Cancels the reservation of the client on the given date. Returns True if it was cancelled."""
+
+        with self.active():
+            client = self._client(name, create=False)
+            if client is None:
+                # As Client.cancel_reservation does for a client without a reservation on the date
+                return False
+            with redirect_stdout(StringIO()):
+                return bool(client.cancel_reservation(date))
+
+    def schedule(self, date_start, date_end):
+        """Returns a dictionary mapping the days with reservations in the date range
+        to lists of (client name, start time, end time) tuples.
+        """
+
+        with self.active():
+            return {day: [(str(client), start, end) for client, start, end in reservations]
+                    for day, reservations in Reservation.period_schedule(date_start, date_end, sparse=True).items()}
+
+    def is_free(self, date, start_time, minutes):
+        """Checks if a reservation of the given length can be made at the given date and time:
+        the club is open, the time is on the slot grid, and no reservation overlaps it.
+        """
+
+        with self.active():
+            return Client._court_refusal(date, start_time, Reservation.snapshot(), minutes) is None
+
+
+def _serve(connection, configs):
+    """Serves the requests of the router in a worker process until the connection is closed.
+
+    Requests are (operation, arguments) tuples, and the 'batch' operation runs a list of requests.
+    The 'cpu_time' operation returns the CPU time used by the worker so far. None stops the worker.
+    Responses are ('ok', result) or ('error', exception) tuples.
+    """
+
+    clubs = {}
+
+    def club_state(club):
+        state = clubs.get(club)
+        if state is None:
+            state = clubs[club] = ClubState(configs.get(club))
+        return state
+
+    def run(operation, arguments):
+        if operation == 'batch':
+            return [run(*request) for request in arguments]
+        if operation == 'cpu_time':
+            return process_time()
+        if operation == 'free':
+            date, start_time, minutes, candidates = arguments
+            return [club for club in candidates if club_state(club).is_free(date, start_time, minutes)]
+        club, *rest = arguments
+        return getattr(club_state(club), operation)(*rest)
+
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        operation, arguments = request
+        try:
+            connection.send(('ok', run(operation, arguments)))
+        except Exception as error:
+            connection.send(('error', error))
+
+
+class Router:
+    """Dispatches requests to the worker processes by club.
+
+    Every worker serves the clubs assigned to it by shard_of. Requests to different workers
+    run in parallel, also when they are sent from several threads.
+
+    Attributes:
+        clubs (tuple): The names of the clubs.
+        workers (int): The number of worker processes.
+
+    Methods:
+        book(self, club, name, date, start_time, minutes)
+            Makes a reservation at the club. Returns True if it was made.
+        cancel(self, club, name, date)
+            Cancels the reservation of the client at the club on the given date.
+        schedule(self, club, date_start, date_end)
+            Returns the days with reservations at the club in the date range.
+        book_many(self, bookings)
+            Makes many reservations, in parallel across workers. Returns a list of outcomes.
+        find_free(self, date, start_time, minutes)
+            Returns the clubs where a reservation can be made at the given date and time.
+        cpu_times(self)
+            Returns the CPU time used so far by every worker process.
+        close(self)
+            Stops the worker processes.
+    """
+
+    def __init__(self, clubs, workers=None):
+        """Initializes a new instance of the Router class and starts the worker processes.
+
+        Clubs are a list of club names, or a dictionary mapping club names to their ClubConfig.
+        """
+
+        configs = dict(clubs) if isinstance(clubs, dict) else {club: None for club in clubs}
+        self.clubs = tuple(configs)
+        self.workers = workers or min(len(self.clubs), os.cpu_count() or 1) or 1
+        self._connections = []
+        self._locks = []
+        self._processes = []
+        for index in range(self.workers):
+            parent, child = multiprocessing.Pipe()
+            shard_configs = {club: config for club, config in configs.items() if shard_of(club, self.workers) == index}
+            process = multiprocessing.Process(target=_serve, args=(child, shard_configs), daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._locks.append(threading.Lock())
+            self._processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _shard(self, club):
+        """Returns the index of the worker serving the club. Raises KeyError for an unknown club."""
+
+        if club not in self.clubs:
+            raise KeyError(f"There is no club {club}.")
+        return shard_of(club, self.workers)
+
+    @staticmethod
+    def _result(response):
+        """Returns the result of a response, or raises the exception it carries."""
+
+        status, result = response
+        if status == 'error':
+            raise result
+        return result
+
+    def _fan_out(self, requests):
+        """Sends a request to each of the given workers at once and returns their results by worker.
+        Requests are a dictionary mapping worker indexes to (operation, arguments) tuples.
+        """
+
+        shards = sorted(requests)
+        for shard in shards:
+            self._locks[shard].acquire()
+        try:
+            for shard in shards:
+                self._connections[shard].send(requests[shard])
+            responses = {shard: self._connections[shard].recv() for shard in shards}
+        finally:
+            for shard in shards:
+                self._locks[shard].release()
+        return {shard: self._result(response) for shard, response in responses.items()}
+
+    def _call(self, club, operation, *arguments):
+        """Runs an operation on the worker serving the club and returns its result."""
+
+        shard = self._shard(club)
+        return self._fan_out({shard: (operation, (club, *arguments))})[shard]
+
+    def book(self, club, name, date, start_time, minutes):
+        """Makes a reservation at the club. Returns True if it was made."""
+
+        return self._call(club, 'book', name, date, start_time, minutes)
+
+    def cancel(self, club, name, date):
+        """Cancels the reservation of the client at the club on the given date. Returns True if it was cancelled."""
+
+        return self._call(club, 'cancel', name, date)
+
+    def schedule(self, club, date_start, date_end):
+        """Returns a dictionary mapping the days with reservations at the club in the date range
+        to lists of (client name, start time, end time) tuples.
+        """
+
+        return self._call(club, 'schedule', date_start, date_end)
+
+    def book_many(self, bookings):
+        """Makes many reservations, in parallel across workers. Returns a list of outcomes in the order of the bookings.
+
+        Bookings are (club, name, date, start time, minutes) tuples. The bookings of each worker
+        are sent in a single batch and made in the given order.
+        """
+
+        batches = {}
+        for position, (club, *details) in enumerate(bookings):
+            batches.setdefault(self._shard(club), []).append((position, ('book', (club, *details))))
+        results = self._fan_out({shard: ('batch', [request for _, request in batch])
+                                 for shard, batch in batches.items()})
+        outcomes = [None] * len(bookings)
+        for shard, batch in batches.items():
+            for (position, _), outcome in zip(batch, results[shard]):
+                outcomes[position] = outcome
+        return outcomes
+
+    def find_free(self, date, start_time, minutes):
+        """Returns the clubs where a reservation of the given length can be made at the given date and time,
+        in the order of the clubs. All workers are asked at once.
+        """
+
+        candidates = {}
+        for club in self.clubs:
+            candidates.setdefault(shard_of(club, self.workers), []).append(club)
+        results = self._fan_out({shard: ('free', (date, start_time, minutes, clubs))
+                                 for shard, clubs in candidates.items()})
+        free = {club for clubs in results.values() for club in clubs}
+        return [club for club in self.clubs if club in free]
+
+    def cpu_times(self):
+        """Returns a list of the CPU time used so far by every worker process, in seconds."""
+
+        results = self._fan_out({shard: ('cpu_time', None) for shard in range(self.workers)})
+        return [results[shard] for shard in range(self.workers)]
+
+    def close(self):
+        """Stops the worker processes."""
+
+        # Workers started later hold copies of the connections of the earlier ones,
+        # so closing a connection does not stop its worker
+        for connection in self._connections:
+            connection.send(None)
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+
+def available_cpus():
+    """Returns the number of CPUs this process may run on, which may be fewer than the CPUs of the host."""
+
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def benchmark(clubs=16, bookings_per_club=500, worker_counts=None):
+    """Reports the throughput of bookings spread over the clubs, with a growing number of worker processes.
+
+    Besides the elapsed time, the CPU time of every worker is reported. Their sum divided by the elapsed
+    time is the number of CPUs the workers kept busy at once, which shows whether the throughput can
+    scale at all: with fewer available CPUs than workers, the workers only take turns.
+    """
+
+    names = [f"Club {index}" for index in range(clubs)]
+    first_day = datetime.now().date() + timedelta(days=7)
+    bookings = [(club, f"Member{index % 200} Surname", first_day + timedelta(days=index // 16),
+                 time(6 + index % 16, 0), 60)
+                for club in names for index in range(bookings_per_club)]
+    cpus = available_cpus()
+    print(f"{cpus} of {os.cpu_count()} CPUs are available to this process.")
+    for workers in worker_counts or sorted({1, 2, cpus}):
+        with Router(names, workers) as router:
+            cpu_started = router.cpu_times()
+            started = perf_counter()
+            booked = sum(router.book_many(bookings))
+            elapsed = perf_counter() - started
+            cpu_times = [end - start for start, end in zip(cpu_started, router.cpu_times())]
+        print(f"{workers:>3} workers: {booked} of {len(bookings)} bookings in {elapsed:.2f} seconds, "
+              f"{len(bookings) / elapsed:.0f} bookings per second, "
+              f"CPU seconds per worker: {', '.join(f'{cpu_time:.2f}' for cpu_time in cpu_times)}, "
+              f"{sum(cpu_times) / elapsed:.2f} CPUs busy")
+
+
+if __name__ == '__main__':
+    benchmark()
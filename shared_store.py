@@ -0,0 +1,304 @@
+"""This module provides a store shared by several processes of the program on one host.
+
+The front desk, a kiosk and the online booking can each run main.py with the same --shared
+database and see each other's bookings. Reservations are kept in an SQLite database and
+every process keeps the days it works with in memory, as with LazyScheduleStore.
+
+Writes go to the database as soon as a reservation is made or cancelled. Before making or
+cancelling a reservation, a process takes an advisory fcntl lock on a byte of a lock file
+for every day it checks, so processes booking different days do not wait for each other.
+The write is committed before the change is made in memory and before the locks are released,
+so no other process can book the same time meanwhile, and a failed write books nothing.
+
+Every write stamps the changed days with a new value of a generation counter, and stores the
+counter in the memory-mapped header of the lock file. A process compares the header with the last
+generation it has seen, which is a single memory read when no other process has written. Only if
+it has changed, the days stamped since are read from the database and reloaded if they are in memory.
+
+It includes the following class:
+- SharedScheduleStore: A class sharing reservations between processes through an SQLite database.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, time, timedelta
+import fcntl
+import itertools
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+
+from opening_hours import minute_of_day
+from reservation import Reservation
+
+GENERATION = struct.Struct('<Q')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reservations (day INTEGER NOT NULL, client TEXT NOT NULL,
+                                         start_minute INTEGER NOT NULL, end_minute INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS reservations_by_day ON reservations (day, start_minute);
+CREATE TABLE IF NOT EXISTS days (day INTEGER PRIMARY KEY, generation INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS days_by_generation ON days (generation);
+"""
+
+
+def _time(minute):
+    """Returns the time at the given number of minutes from midnight."""
+
+    return time(minute // 60, minute % 60)
+
+
+class SharedScheduleStore:
+    """Shares reservations between processes through an SQLite database.
+
+    Reservations made and cancelled in this process are written to the database by Reservation.write_to_store.
+
+    Attributes
+    ----------
+    path : str
+        The path of the SQLite database. The lock file is the same path with the .lock extension.
+    horizon_days : int
+        The number of days, starting today, which are loaded at startup.
+
+    Methods
+    -------
+    load_horizon(self, today)
+        Loads the days of the booking horizon. Returns the number of reservations loaded.
+    is_loaded(self, day)
+        Checks if the given day is in memory.
+    days_in_memory(self)
+        Returns a set of the days in memory.
+    fault_in(self, date_start, date_end)
+        Loads the days of the given date range which are not in memory yet, and reloads days changed by other processes.
+    editing(self, date_start, date_end)
+        A context manager which locks the days of the given date range against other processes.
+    write(self, created, cancelled)
+        Writes reservations made and cancelled in this process to the database.
+    sync(self)
+        Reloads the days in memory which were changed by other processes. Returns the set of reloaded days.
+    generation(self)
+        Returns the generation counter of the database.
+    stored_between(self, date_start, date_end, in_memory)
+        Returns reservation details of the days in the date range that are not in memory.
+    loaded_days(self)
+        Returns the number of days in memory.
+    save(self)
+        Does nothing, as reservations are written when they are made or cancelled.
+    close(self)
+        Closes the database.
+    """
+
+    def __init__(self, path, horizon_days=60):
+        """Initializes a new instance of the SharedScheduleStore class."""
+
+        self.path = path
+        self.horizon_days = horizon_days
+        self._database = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._database.executescript(SCHEMA)
+        self._lock_file = open(f"{path}.lock", 'a+b')
+        fcntl.lockf(self._lock_file, fcntl.LOCK_EX, GENERATION.size, 0)
+        try:
+            if os.fstat(self._lock_file.fileno()).st_size < GENERATION.size:
+                self._lock_file.truncate(GENERATION.size)
+        finally:
+            fcntl.lockf(self._lock_file, fcntl.LOCK_UN, GENERATION.size, 0)
+        self._header = mmap.mmap(self._lock_file.fileno(), GENERATION.size)
+        # Serializes the threads of this process, as fcntl locks only exclude other processes
+        self._thread_lock = threading.RLock()
+        self._held_days = Counter()
+        self._loaded = set()
+        self._seen = self._database.execute("SELECT COALESCE(MAX(generation), 0) FROM days").fetchone()[0]
+        self._publish_generation(self._seen)
+
+    def generation(self):
+        """Returns the generation counter of the database, as stored in the header of the lock file."""
+
+        return GENERATION.unpack_from(self._header, 0)[0]
+
+    def _lock_days(self, days):
+        """Takes the locks of the given days, in increasing order so processes do not deadlock.
+        Locks already held by this process are counted, and released when the count drops to zero.
+        """
+
+        for day in sorted(set(days)):
+            if self._held_days[day] == 0:
+                fcntl.lockf(self._lock_file, fcntl.LOCK_EX, 1, GENERATION.size + day.toordinal())
+            self._held_days[day] += 1
+
+    def _unlock_days(self, days):
+        """Releases the locks of the given days taken by _lock_days."""
+
+        for day in sorted(set(days)):
+            self._held_days[day] -= 1
+            if self._held_days[day] == 0:
+                del self._held_days[day]
+                fcntl.lockf(self._lock_file, fcntl.LOCK_UN, 1, GENERATION.size + day.toordinal())
+
+    def _publish_generation(self, generation):
+        """Stores the generation in the header of the lock file, unless a later one is stored already."""
+
+        fcntl.lockf(self._lock_file, fcntl.LOCK_EX, GENERATION.size, 0)
+        try:
+            if self.generation() < generation:
+                GENERATION.pack_into(self._header, 0, generation)
+        finally:
+            fcntl.lockf(self._lock_file, fcntl.LOCK_UN, GENERATION.size, 0)
+
+    def _records_between(self, date_start, date_end):
+        """Yields (date, client name, start time, end time) tuples of the database in the date range."""
+
+        rows = self._database.execute("SELECT day, client, start_minute, end_minute FROM reservations "
+                                      "WHERE day BETWEEN ? AND ? ORDER BY day, start_minute",
+                                      (date_start.toordinal(), date_end.toordinal())).fetchall()
+        for ordinal, name, start_minute, end_minute in rows:
+            yield date.fromordinal(ordinal), name, _time(start_minute), _time(end_minute)
+
+    def _load(self, days):
+        """Replaces the reservations of the given days in memory with the ones in the database."""
+
+        snapshot = Reservation.snapshot()
+        with Reservation.list_of_reservations().loading(), Reservation.list_of_reservations().batch():
+            for day in days:
+                for reservation in snapshot.reservations_on(day):
+                    reservation.client.reservation.remove(reservation)
+                    Reservation.list_of_reservations().remove(reservation)
+                Reservation.load_records(self._records_between(day, day))
+                self._loaded.add(day)
+
+    def load_horizon(self, today):
+        """Loads the days of the booking horizon. Returns the number of reservations loaded."""
+
+        with self._thread_lock:
+            days = [today + timedelta(days=offset) for offset in range(self.horizon_days)]
+            self._load(days)
+            return sum(len(Reservation.snapshot().reservations_on(day)) for day in days)
+
+    def is_loaded(self, day):
+        """Checks if the given day is in memory."""
+
+        return day in self._loaded
+
+    def days_in_memory(self):
+        """Returns a frozenset of the days in memory, to read the other days of a snapshot later with stored_between."""
+
+        with self._thread_lock:
+            return frozenset(self._loaded)
+
+    def sync(self):
+        """Reloads the days in memory which were changed by other processes since the last sync.
+        Returns the set of reloaded days.
+        """
+
+        with self._thread_lock:
+            if self.generation() <= self._seen:
+                return set()
+            rows = self._database.execute("SELECT day, generation FROM days WHERE generation > ?",
+                                          (self._seen,)).fetchall()
+            changed = {date.fromordinal(ordinal) for ordinal, _ in rows}
+            self._seen = max([self._seen] + [generation for _, generation in rows])
+            reloaded = changed & self._loaded
+            self._load(sorted(reloaded))
+            return reloaded
+
+    def fault_in(self, date_start, date_end):
+        """Loads the days of the given date range which are not in memory yet,
+        and reloads the days in memory which were changed by other processes.
+        Returns the set of days loaded or reloaded.
+        """
+
+        with self._thread_lock:
+            reloaded = self.sync()
+            days = [date_start + timedelta(days=offset) for offset in range((date_end - date_start).days + 1)]
+            missing = [day for day in days if day not in self._loaded]
+            self._load(missing)
+            return reloaded | set(missing)
+
+    @contextmanager
+    def editing(self, date_start, date_end):
+        """A context manager which locks the days of the given date range against other processes
+        and brings them up to date.
+        """
+
+        days = [date_start + timedelta(days=offset) for offset in range((date_end - date_start).days + 1)]
+        with self._thread_lock:
+            self._lock_days(days)
+            try:
+                self.fault_in(date_start, date_end)
+                yield
+            finally:
+                self._unlock_days(days)
+
+    def write(self, created=(), cancelled=()):
+        """Writes reservations made and cancelled in this process to the database and stamps their days
+        with a new generation. Both are lists of (date, client name, start time, end time) tuples.
+
+        It is called inside editing, before the change is made in memory, so the write is committed
+        before the locks of the days are released, and a failed write raises and leaves memory unchanged.
+        """
+
+        days = {row[0] for row in itertools.chain(created, cancelled)}
+        if not days:
+            return
+        with self._thread_lock:
+            self._lock_days(days)
+            try:
+                self._database.execute("BEGIN IMMEDIATE")
+                try:
+                    for day, name, start_time, end_time in created:
+                        self._database.execute("INSERT INTO reservations VALUES (?, ?, ?, ?)",
+                                               (day.toordinal(), name, minute_of_day(start_time),
+                                                minute_of_day(end_time)))
+                    for day, name, start_time, end_time in cancelled:
+                        self._database.execute("DELETE FROM reservations WHERE rowid = (SELECT rowid FROM "
+                                               "reservations WHERE day = ? AND client = ? AND start_minute = ? "
+                                               "AND end_minute = ? LIMIT 1)",
+                                               (day.toordinal(), name, minute_of_day(start_time),
+                                                minute_of_day(end_time)))
+                    generation = self._database.execute("SELECT COALESCE(MAX(generation), 0) + 1 "
+                                                        "FROM days").fetchone()[0]
+                    # Nobody else has written since the last sync, so this process is up to date after the write
+                    up_to_date = generation - 1 == self._seen
+                    self._database.executemany("INSERT OR REPLACE INTO days VALUES (?, ?)",
+                                               [(day.toordinal(), generation) for day in days])
+                    self._database.execute("COMMIT")
+                except BaseException:
+                    self._database.execute("ROLLBACK")
+                    raise
+                self._publish_generation(generation)
+                if up_to_date:
+                    self._seen = generation
+            finally:
+                self._unlock_days(days)
+
+    def stored_between(self, date_start, date_end, in_memory=None):
+        """Returns a dictionary mapping days in the date range that are not in memory
+        to lists of (client name, start time, end time) tuples read from the database.
+        The days in memory are brought up to date first. If a set of days returned by
+        days_in_memory is given, the days not in it are read instead.
+        """
+
+        stored = {}
+        with self._thread_lock:
+            self.sync()
+            is_loaded = self.is_loaded if in_memory is None else in_memory.__contains__
+            for day, name, start_time, end_time in self._records_between(date_start, date_end):
+                if not is_loaded(day):
+                    stored.setdefault(day, []).append((name, start_time, end_time))
+        return stored
+
+    def loaded_days(self):
+        """Returns the number of days in memory."""
+
+        return len(self._loaded)
+
+    def save(self):
+        """Does nothing, as reservations are written to the database when they are made or cancelled."""
+
+    def close(self):
+        """Closes the database."""
+
+        self._header.close()
+        self._lock_file.close()
+        self._database.close()
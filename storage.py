@@ -0,0 +1,261 @@
+"""This module provides lazy, date-windowed loading of reservations from a binary schedule file.
+
+Only the booking horizon (today and the following days) is loaded into memory at startup.
+Other days are loaded on demand, when a reservation is made or cancelled on them, and kept
+in a bounded least recently used cache of loaded days. Printing and saving the schedule read
+days which are not loaded directly from the memory-mapped file, without loading them.
+Loading and unloading days publishes ReservationLoaded and ReservationUnloaded events on
+Reservation.events, rather than reservations made and cancelled.
+
+It includes the following class and function:
+- LazyScheduleStore: A class loading days of a binary schedule file into memory on demand.
+- benchmark: Reports startup time and traced memory for schedule files of growing size.
+
+Run this module to see the benchmark: `python storage.py`.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+import itertools
+import os
+import random
+import tempfile
+from time import perf_counter
+import tracemalloc
+
+from reservation import Client, Reservation
+from schedule_file import BinarySchedule, write_schedule
+
+
+class LazyScheduleStore:
+    """Loads days of a binary schedule file into memory on demand.
+
+    Attributes
+    ----------
+    path : str
+        The path of the binary schedule file.
+    horizon_days : int
+        The number of days, starting today, which are loaded at startup and never unloaded.
+    max_loaded_days : int
+        The number of other days which are kept in memory. The days of a range being loaded
+        or edited are kept as well, even over the limit.
+
+    Methods
+    -------
+    load_horizon(self, today)
+        Loads the days of the booking horizon. Returns the number of reservations loaded.
+    is_loaded(self, day)
+        Checks if the given day is in memory.
+    days_in_memory(self)
+        Returns a set of the days in memory.
+    fault_in(self, date_start, date_end)
+        Loads the days of the given date range which are not in memory yet.
+    editing(self, date_start, date_end)
+        A context manager which loads the days of the given date range before they are changed.
+    write(self, created, cancelled)
+        Does nothing, as changes are written to the file when it is saved.
+    stored_between(self, date_start, date_end, in_memory)
+        Returns reservation details of the days in the date range that are not in memory.
+    loaded_days(self)
+        Returns the number of days loaded in the cache.
+    save(self)
+        Writes all reservations, loaded or not, to the file.
+    close(self)
+        Closes the file.
+    """
+
+    def __init__(self, path, horizon_days=60, max_loaded_days=32):
+        """Initializes a new instance of the LazyScheduleStore class."""
+
+        self.path = path
+        self.horizon_days = horizon_days
+        self.max_loaded_days = max_loaded_days
+        self._file = BinarySchedule(path) if os.path.exists(path) else None
+        self._horizon = (date.max, date.min)
+        # Maps loaded days to the tuple of reservations in the snapshot right after loading,
+        # which tells whether the day has been changed since.
+        self._loaded = OrderedDict()
+        self._changed = set()
+        # Date ranges being loaded or edited, whose days must not be unloaded
+        self._pinned = []
+
+    def load_horizon(self, today):
+        """Loads the days of the booking horizon. Returns the number of reservations loaded."""
+
+        horizon_end = today + timedelta(days=self.horizon_days - 1)
+        self._horizon = (today, horizon_end)
+        if self._file is None:
+            return 0
+        with Reservation.list_of_reservations().loading():
+            return len(Reservation.load_records(self._file.records_between(today, horizon_end)))
+
+    def is_loaded(self, day):
+        """Checks if the given day is in memory."""
+
+        return self._horizon[0] <= day <= self._horizon[1] or day in self._loaded or day in self._changed
+
+    def days_in_memory(self):
+        """Returns a frozenset of the days in memory, to read the other days of a snapshot later with stored_between."""
+
+        horizon = (self._horizon[0] + timedelta(days=offset)
+                   for offset in range((self._horizon[1] - self._horizon[0]).days + 1))
+        return frozenset(itertools.chain(horizon, self._loaded, self._changed))
+
+    def fault_in(self, date_start, date_end):
+        """Loads the days of the given date range which are not in memory yet.
+        Other days are unloaded if there are more loaded days than allowed, but not the days of the range.
+        """
+
+        with self._pinning(date_start, date_end):
+            for offset in range((date_end - date_start).days + 1):
+                day = date_start + timedelta(days=offset)
+                if day in self._loaded:
+                    self._loaded.move_to_end(day)
+                    continue
+                if self.is_loaded(day):
+                    continue
+                if self._file is not None:
+                    with Reservation.list_of_reservations().loading():
+                        Reservation.load_records(self._file.records_between(day, day))
+                self._loaded[day] = Reservation.snapshot().reservations_on(day)
+            self._evict()
+
+    @contextmanager
+    def editing(self, date_start, date_end):
+        """A context manager which loads the days of the given date range before they are changed
+        and keeps them in memory until the body is done. The days over the limit are unloaded then.
+        """
+
+        try:
+            with self._pinning(date_start, date_end):
+                self.fault_in(date_start, date_end)
+                yield
+        finally:
+            self._evict()
+
+    @contextmanager
+    def _pinning(self, date_start, date_end):
+        """A context manager in which the days of the given date range are not unloaded."""
+
+        pinned = (date_start, date_end)
+        self._pinned.append(pinned)
+        try:
+            yield
+        finally:
+            self._pinned.remove(pinned)
+
+    def _is_pinned(self, day):
+        """Checks if the given day is in a date range being loaded or edited."""
+
+        return any(date_start <= day <= date_end for date_start, date_end in self._pinned)
+
+    def _evict(self):
+        """Unloads the least recently used days over the limit of loaded days.
+
+        Days that have been changed since they were loaded are not unloaded,
+        as the file does not contain the changes until it is saved. Days being loaded or edited
+        are skipped, so more days than allowed may stay loaded until they are done.
+        """
+
+        while len(self._loaded) > self.max_loaded_days:
+            day = next((day for day in self._loaded if not self._is_pinned(day)), None)
+            if day is None:
+                return
+            reservations = self._loaded.pop(day)
+            if Reservation.snapshot().reservations_on(day) is not reservations:
+                self._changed.add(day)
+                continue
+            with Reservation.list_of_reservations().loading(), Reservation.list_of_reservations().batch():
+                for reservation in reservations:
+                    reservation.client.reservation.remove(reservation)
+                    Reservation.list_of_reservations().remove(reservation)
+
+    def write(self, created=(), cancelled=()):
+        """Does nothing, as reservations made and cancelled are written to the file when it is saved."""
+
+    def stored_between(self, date_start, date_end, in_memory=None):
+        """Returns a dictionary mapping days in the date range that are not in memory
+        to lists of (client name, start time, end time) tuples read from the file.
+        If a set of days returned by days_in_memory is given, the days not in it are read instead.
+        """
+
+        stored = {}
+        if self._file is None:
+            return stored
+        is_loaded = self.is_loaded if in_memory is None else in_memory.__contains__
+        for day, name, start_time, end_time in self._file.records_between(date_start, date_end):
+            if not is_loaded(day):
+                stored.setdefault(day, []).append((name, start_time, end_time))
+        return stored
+
+    def loaded_days(self):
+        """Returns the number of days loaded in the cache."""
+
+        return len(self._loaded)
+
+    def save(self):
+        """Writes all reservations, loaded or not, to the file."""
+
+        data = self.stored_between(date.min, date.max)
+        snapshot = Reservation.snapshot()
+        for day in snapshot.dates():
+            data[day] = [(reservation.client, reservation.start_time, reservation.end_time)
+                         for reservation in snapshot.reservations_on(day)]
+        part_path = f"{self.path}.part"
+        write_schedule(part_path, data)
+        self.close()
+        os.replace(part_path, self.path)
+        self._file = BinarySchedule(self.path)
+        # The file now contains the changes, so changed days can be unloaded again
+        for day in self._changed:
+            self._loaded[day] = snapshot.reservations_on(day)
+        self._changed.clear()
+        self._evict()
+
+    def close(self):
+        """Closes the file."""
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _synthetic_history(path, days, per_day=4):
+    """Writes a schedule file with the given number of past and future days of reservations."""
+
+    today = date.today()
+    names = [f"Member{index} Surname" for index in range(200)]
+    data = {}
+    for offset in range(-days, 60):
+        data[today + timedelta(days=offset)] = [(random.choice(names), time(8 + 2 * slot, 0), time(9 + 2 * slot, 0))
+                                                for slot in range(per_day)]
+    write_schedule(path, data)
+
+
+def benchmark(history_days=(365, 3650, 36500)):
+    """Reports startup time and the memory traced by tracemalloc, the memory allocated by Python
+    rather than the resident memory of the process, for schedule files with growing history.
+    """
+
+    for days in history_days:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'history.bin')
+            _synthetic_history(path, days)
+            Reservation.list_of_reservations().clear()
+            Client.list_of_client().clear()
+
+            tracemalloc.start()
+            started = perf_counter()
+            store = LazyScheduleStore(path)
+            loaded = store.load_horizon(datetime.now().date())
+            elapsed = perf_counter() - started
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            store.close()
+            print(f"{days:>6} days of history, {os.path.getsize(path):>9} bytes: loaded {loaded} reservations "
+                  f"in {elapsed * 1000:.2f} ms, {memory / 1024:.0f} KiB of traced memory")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -1,16 +1,43 @@
 """This module provides unittest classes for testing of Session, Client and Reservation classes."""
 
+import bz2
 import csv
+import gzip
 import json
+import lzma
+import multiprocessing
 import os
+import sqlite3
+import tempfile
 import sys
+import threading
 import unittest
-from datetime import datetime, timedelta, time
+from datetime import date, datetime, timedelta, time
 from io import StringIO
 from unittest.mock import patch, MagicMock
 
-from reservation import Reservation, Client
+from admission import AdmissionController, TokenBucket
+from client_stats import ClientStatistics
+from date_parser import normalize_separators, parse_date, parse_date_time
+from day_aggregates import DaySummary, FenwickTree, ScheduleAggregates
+import differential
+from isolation import isolated_state
+from events import EventBus, EventLog, EventTailReader, ReservationCancelled, ReservationCreated
+from jobs import ExportJob, ExportQueue
+import memory_profile
+from opening_hours import ClubConfig
+from reservation import Reservation, Client, ReservationList, ScheduleSnapshot, _export_context
+from schedule_file import BinarySchedule, write_schedule
 from session import Session
+from sharding import ClubState, Router, shard_of
+from storage import LazyScheduleStore
+import transcript
+
+try:
+    from shared_store import GENERATION, SharedScheduleStore
+except ImportError:
+    # The shared store locks days with fcntl, which is not available on Windows
+    SharedScheduleStore = None
 
 
 class TestClient(unittest.TestCase):
@@ -42,6 +69,18 @@ class TestClient(unittest.TestCase):
             result = self.client.make_reservation(self.next_week_start, time(23, 30))
             self.assertTrue(result)  # Should succeed since there is an available slot
 
+    def test_make_reservation_at_the_ends_of_the_calendar(self):
+        """Test if a reservation on the first day of the calendar is refused as passed
+        and a reservation on the last day is made.
+        """
+
+        with differential.isolated_state(now=datetime.now()), patch('builtins.input', return_value='1'), \
+                patch('sys.stdout', new_callable=StringIO) as output:
+            client = Client("Calendar Edge")
+            self.assertFalse(client.make_reservation(date.min, time(10, 0)))
+            self.assertTrue(client.make_reservation(date.max, time(10, 0)))
+        self.assertIn("This time has already passed.", output.getvalue())
+
     def test_make_reservation_with_two_reservations_fail(self):
         """Test the make_reservation method of the Client class for a failure
         when there are already two reservations on the same week.
@@ -132,9 +171,21 @@ class TestSession(unittest.TestCase):
                           "Thank you for choosing our tennis club.\n\n" \
                           "Goodbye. See you again soon."
 
-        with patch('builtins.input', side_effect=['1', 'Thomas Anderson', '5', '2']):
+        with patch('builtins.input', side_effect=['1', 'Thomas Anderson', '6', '2']):
             self.capture_output(self.session.main, expected_output)
 
+    def test_menu_options_in_order(self):
+        """Test if the options of the main menu are numbered in the order they are shown
+        and option 5 shows the export jobs."""
+
+        client = Client("Thomas Anderson")
+        with patch('builtins.input', side_effect=['5', '6']) as prompts, \
+                patch('sys.stdout', new_callable=StringIO) as output:
+            self.session.menu(client)
+        numbers = [line.strip().split('.')[0] for line in prompts.call_args_list[0].args[0].splitlines()[1:]]
+        self.assertEqual(numbers, ['1', '2', '3', '4', '5', '6'])
+        self.assertIn("There are no export jobs.", output.getvalue())
+
     def test_main_exit(self):
         """Test of the main method of Session class.
         The client chooses to exit.
@@ -219,15 +270,17 @@ class TestSession(unittest.TestCase):
         expected_date = datetime.strptime(date_input, "%d.%m.%Y %H:%M").date()
         expected_time = datetime.strptime(date_input, "%d.%m.%Y %H:%M").time()
 
-        # Mock user input and client.make_reservation() method
+        # Mock user input and the client.choose_reservation() and client.book() methods
         with patch('builtins.input', return_value=date_input):
-            client.make_reservation.return_value = True
+            client.choose_reservation.return_value = (expected_time, 60)
+            client.book.return_value = True
 
             # Call the _session_make_reservation method
             result = self.session._session_make_reservation(client)
 
-            # Assert client.make_reservation() was called with expected arguments
-            client.make_reservation.assert_called_once_with(expected_date, expected_time)
+            # Assert the chosen reservation was booked
+            client.choose_reservation.assert_called_once_with(expected_date, expected_time)
+            client.book.assert_called_once_with(expected_date, expected_time, 60)
 
             # Assert the method returned True
             self.assertTrue(result)
@@ -251,8 +304,8 @@ class TestSession(unittest.TestCase):
             # Call the method
             result = self.session._session_make_reservation(client)
 
-            # Assert client.make_reservation() was not called
-            client.make_reservation.assert_not_called()
+            # Assert client.choose_reservation() was not called
+            client.choose_reservation.assert_not_called()
 
             # Assert the method returned False
             self.assertFalse(result)
@@ -280,6 +333,16 @@ class TestSession(unittest.TestCase):
         result = self.session._date_valid(date_str)
         self.assertFalse(result)
 
+    def test_save_long_range_in_parallel(self):
+        """Test if schedules of more than a year are saved by worker processes, and shorter ones serially."""
+
+        for date_to, workers in (("31.12.2099", None), ("01.01.2101", os.cpu_count())):
+            with patch('builtins.input', side_effect=["01.01.2099", date_to, '2', '0']), \
+                    patch.object(Reservation, 'schedule') as schedule:
+                self.session._save_to_file()
+            schedule.assert_called_once_with(datetime(2099, 1, 1).date(), parse_date(date_to), 'csv', workers,
+                                             compression=None)
+
 
 class TestReservation(unittest.TestCase):
     """A class that contains unittests for the Reservation class."""
@@ -328,6 +391,86 @@ class TestReservation(unittest.TestCase):
         self.assertEqual(reservation.end_time, end_time)
         Reservation.list_of_reservations().remove(reservation)
 
+    def test_snapshot_is_not_changed_by_writers(self):
+        """Test if a snapshot taken before a change still shows the previous version of the schedule."""
+
+        before = Reservation.snapshot()
+        reservation = Reservation(self.client, self.today, time(8, 0))
+        after = Reservation.snapshot()
+
+        self.assertEqual(after.version, before.version + 1)
+        self.assertNotIn(reservation, before.reservations_on(self.today))
+        self.assertEqual(after.reservations_on(self.today)[0], reservation)
+
+        Reservation.list_of_reservations().remove(reservation)
+        self.assertIn(reservation, after.reservations_on(self.today))
+        self.assertNotIn(reservation, Reservation.snapshot().reservations_on(self.today))
+
+    def test_snapshot_days_sorted_by_start_time(self):
+        """Test if reservations of a day in a snapshot are sorted by start time and dates are sorted."""
+
+        tomorrow = self.today + timedelta(days=1)
+        Reservation(self.client, tomorrow, time(15, 0))
+        Reservation(self.client, tomorrow, time(9, 0))
+        Reservation(self.client, tomorrow, time(12, 0))
+        snapshot = Reservation.snapshot()
+
+        self.assertEqual([reservation.start_time for reservation in snapshot.reservations_on(tomorrow)],
+                         [time(9, 0), time(12, 0), time(15, 0)])
+        self.assertEqual(list(snapshot.dates()), sorted(snapshot.days))
+        self.assertIn(tomorrow, snapshot.dates())
+
+    def test_snapshot_slot_index(self):
+        """Test if vacancy and the next start are answered from the index, with reservations running past midnight."""
+
+        day, tomorrow = self.today + timedelta(days=30), self.today + timedelta(days=31)
+        Reservation(self.client, day, time(9, 0), time(10, 0))
+        Reservation(self.client, day, time(23, 30), time(0, 30))
+        Reservation(self.client, tomorrow, time(8, 0), time(9, 0))
+        snapshot = Reservation.snapshot()
+
+        self.assertEqual([snapshot.is_vacant(day, minute) for minute in (539, 540, 599, 600, 1425)],
+                         [True, False, False, True, False])
+        self.assertEqual([snapshot.is_vacant(tomorrow, minute) for minute in (0, 29, 30)], [False, False, True])
+        self.assertEqual([snapshot.next_start(day, minute) for minute in (0, 540, 1410)],
+                         [540, 1410, 1440 + 480])
+        self.assertIsNone(snapshot.next_start(tomorrow, 480))
+
+    def test_snapshot_slot_index_at_the_ends_of_the_calendar(self):
+        """Test if the first and the last day of the calendar have no previous and next day to look up."""
+
+        snapshot = Reservation.snapshot()
+        self.assertTrue(snapshot.is_vacant(date.min, 600))
+        self.assertIsNone(snapshot.next_start(date.max, 600))
+        self.assertEqual(Client.config.menu(Client._free_slots(date.max, time(10, 0), snapshot))[0],
+                         Client.config.menu(90)[0])
+
+    def test_snapshot_shares_unchanged_chunks(self):
+        """Test if a change copies only the chunk of the changed day, and if every way of changing
+        the list publishes a new snapshot.
+        """
+
+        reservations = ReservationList()
+        batches = []
+        reservations.events.subscribe(batches.append)
+        first, second, third = (Reservation.__new__(Reservation) for _ in range(3))
+        for reservation, day in ((first, self.today), (second, self.today + timedelta(days=400)),
+                                 (third, self.today)):
+            reservation.client, reservation.date = self.client, day
+            reservation.start_time, reservation.end_time = time(10, 0), time(11, 0)
+        reservations += [first, second]
+        before = reservations.snapshot()
+        reservations[0] = third
+        after = reservations.snapshot()
+
+        self.assertEqual(after.reservations_on(self.today), (third,))
+        self.assertIs(after.days.get(self.today + timedelta(days=400)), before.reservations_on(second.date))
+        self.assertEqual(sum(before._chunks[key] is chunk for key, chunk in after._chunks.items()), 1)
+        del reservations[:]
+        self.assertEqual((len(reservations.snapshot().days), list(reservations)), (0, []))
+        self.assertEqual([[event.kind for event in batch] for batch in batches],
+                         [['created', 'created'], ['cancelled', 'created'], ['cancelled', 'cancelled']])
+
     def test_is_valid_file_name(self):
         """Test of the is_valid_file_name method"""
 
@@ -385,6 +528,140 @@ class TestReservation(unittest.TestCase):
         os.remove("test_file.csv")
         print("test_write_to_csv", Reservation.list_of_reservations())
 
+    def test_export_in_parallel_matches_serial(self):
+        """Test of the export_in_parallel method. Checked if JSON and CSV files written by worker
+        processes are identical to the files written by the serial export.
+        """
+
+        for day in range(5):
+            Reservation(self.client, self.today + timedelta(days=day * 3), time(9, 0), time(10, 30))
+        date_end = self.today + timedelta(days=20)
+
+        for param in ('json', 'csv'):
+            with patch('builtins.input', return_value='test_serial'):
+                Reservation.schedule(self.today, date_end, param)
+            with patch('builtins.input', return_value='test_parallel'):
+                Reservation.schedule(self.today, date_end, param, workers=2)
+
+            with open(f'test_serial.{param}', 'rb') as serial_file, \
+                    open(f'test_parallel.{param}', 'rb') as parallel_file:
+                self.assertEqual(serial_file.read(), parallel_file.read())
+            os.remove(f'test_serial.{param}')
+            os.remove(f'test_parallel.{param}')
+
+    def test_export_in_parallel_with_other_threads(self):
+        """Test if worker processes are spawned rather than forked while other threads run,
+        and the files are still identical to the files written by the serial export.
+        """
+
+        Reservation(self.client, self.today + timedelta(days=1), time(9, 0), time(10, 30))
+        date_end = self.today + timedelta(days=3)
+        stop = threading.Event()
+        thread = threading.Thread(target=stop.wait)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(stop.set)
+
+        self.assertEqual(_export_context().get_start_method(), 'spawn')
+        with patch('builtins.input', return_value='test_serial'):
+            Reservation.schedule(self.today, date_end, 'csv')
+        with patch('builtins.input', return_value='test_parallel'):
+            Reservation.schedule(self.today, date_end, 'csv', workers=2)
+        with open('test_serial.csv', 'rb') as serial_file, open('test_parallel.csv', 'rb') as parallel_file:
+            self.assertEqual(serial_file.read(), parallel_file.read())
+        os.remove('test_serial.csv')
+        os.remove('test_parallel.csv')
+
+    def test_streamed_exports_of_more_than_a_year(self):
+        """Test if the parallel and background JSON exports, which write the days as they are formatted,
+        match the serial export when days and months repeat, and if the background job reports its statistics.
+        """
+
+        Reservation(self.client, self.today + timedelta(days=365), time(9, 0))
+        Reservation(self.client, self.today + timedelta(days=2), time(9, 0))
+        date_end = self.today + timedelta(days=400)
+        export_queue = ExportQueue()
+        with patch('builtins.input', return_value='test_serial'):
+            Reservation.schedule(self.today, date_end, 'json')
+        with patch('builtins.input', return_value='test_parallel'):
+            Reservation.schedule(self.today, date_end, 'json', workers=2)
+        job = export_queue.submit(self.today, date_end, 'json', 'test_background')
+        export_queue.close()
+
+        with open('test_serial.json', 'rb') as serial_file:
+            expected = serial_file.read()
+        for name in ('test_parallel', 'test_background'):
+            with open(f'{name}.json', 'rb') as streamed_file:
+                self.assertEqual(streamed_file.read(), expected)
+        self.assertIn(f"{len(expected)} bytes were written in", job.notice())
+        for name in ('test_serial', 'test_parallel', 'test_background'):
+            os.remove(f'{name}.json')
+
+    def test_compressed_export(self):
+        """Test of the compressed exports. Checked if decompressed files are identical to uncompressed files."""
+
+        date_end = self.today + timedelta(days=3)
+        openers = {'gzip': gzip.open, 'bz2': bz2.open, 'lzma': lzma.open}
+        for param in ('json', 'csv'):
+            with patch('builtins.input', return_value='test_plain'):
+                Reservation.schedule(self.today, date_end, param)
+            with open(f'test_plain.{param}', 'rb') as plain_file:
+                expected = plain_file.read()
+            os.remove(f'test_plain.{param}')
+
+            for compression, extension in (('gzip', 'gz'), ('bz2', 'bz2'), ('lzma', 'xz')):
+                with patch('builtins.input', return_value='test_compressed'):
+                    Reservation.schedule(self.today, date_end, param, compression=compression)
+                with openers[compression](f'test_compressed.{param}.{extension}', 'rb') as compressed_file:
+                    self.assertEqual(compressed_file.read(), expected)
+                os.remove(f'test_compressed.{param}.{extension}')
+
+    def test_compact_json(self):
+        """Test of the compact JSON export. Checked if it is not indented and the parallel export matches it."""
+
+        date_end = self.today + timedelta(days=3)
+        with patch('builtins.input', return_value='test_compact'):
+            Reservation.schedule(self.today, date_end, 'json', compact=True)
+        with patch('builtins.input', return_value='test_compact_parallel'):
+            Reservation.schedule(self.today, date_end, 'json', workers=2, compact=True)
+
+        with open('test_compact.json', 'r', encoding='utf-8') as compact_file, \
+                open('test_compact_parallel.json', 'r', encoding='utf-8') as parallel_file:
+            content = compact_file.read()
+            self.assertEqual(content, parallel_file.read())
+        self.assertNotIn('\n', content)
+        self.assertEqual(json.loads(content)[self.today.strftime("%d.%m")][0]["name"], "John Doe")
+        os.remove('test_compact.json')
+        os.remove('test_compact_parallel.json')
+
+    def test_binary_schedule(self):
+        """Test of the binary export. Checked if date-range queries on the memory-mapped file return
+        the exported reservations and if the file can be loaded back. Runs on its own clients and
+        reservations, so reservations left by other tests are not exported.
+        """
+
+        tomorrow = self.today + timedelta(days=1)
+        with differential.isolated_state():
+            client, guest = Client("John Doe"), Client("Jane Roe")
+            Reservation(client, self.today, time(10, 0), time(11, 0))
+            Reservation(guest, tomorrow, time(18, 30), time(20, 0))
+            Reservation(client, self.today + timedelta(days=5), time(7, 0))
+            with patch('builtins.input', return_value='test_file'):
+                Reservation.schedule(self.today, self.today + timedelta(days=5), 'bin')
+
+            with BinarySchedule('test_file.bin') as binary_schedule:
+                self.assertEqual(binary_schedule.dates(),
+                                 [self.today, tomorrow, self.today + timedelta(days=5)])
+                self.assertEqual(binary_schedule.period_schedule(tomorrow, self.today + timedelta(days=2)),
+                                 {tomorrow: [("Jane Roe", time(18, 30), time(20, 0))],
+                                  self.today + timedelta(days=2): []})
+
+            Reservation.list_of_reservations().clear()
+            self.assertEqual(Reservation.load_binary('test_file.bin'), 3)
+            loaded = Reservation.snapshot().reservations_on(tomorrow)[0]
+            self.assertIs(loaded.client, guest)
+            self.assertIn(loaded, guest.reservation)
+
     def test_schedule(self):
         """Test of the schedule method of class Reservation and its ability to provide expected output."""
 
@@ -404,6 +681,1227 @@ class TestReservation(unittest.TestCase):
         # Compare output
         self.assertEqual(output.strip(), expected_output)
 
+    def test_sparse_schedule(self):
+        """Test if a sparse schedule visits only the days with reservations."""
+
+        with differential.isolated_state(), patch('sys.stdout', new_callable=StringIO) as output:
+            client = Client("Ivy Sparse")
+            first_day = datetime(2030, 2, 4).date()
+            Reservation(client, first_day, time(10, 0))
+            Reservation(client, first_day + timedelta(days=2), time(12, 0))
+            Reservation(client, first_day + timedelta(days=40), time(9, 0))
+            date_start, date_end = first_day - timedelta(days=1), first_day + timedelta(days=3650)
+
+            dense = Reservation.period_schedule(date_start, date_end)
+            sparse = Reservation.period_schedule(date_start, date_end, sparse=True)
+            self.assertEqual(sparse, {day: details for day, details in dense.items() if details})
+            self.assertEqual(Reservation.snapshot().dates_between(first_day + timedelta(days=1), date_end),
+                             (first_day + timedelta(days=2), first_day + timedelta(days=40)))
+
+            Reservation.schedule(date_start, first_day + timedelta(days=45), 'print', sparse=True)
+            self.assertEqual(output.getvalue().strip().split("\n\n"), [
+                "Sunday, 03.02.2030\nNo Reservations",
+                "Monday, 04.02.2030\n* Ivy Sparse, from 10:00 to 11:00",
+                "Tuesday, 05.02.2030\nNo Reservations",
+                "Wednesday, 06.02.2030\n* Ivy Sparse, from 12:00 to 13:00",
+                "No Reservations from 07.02.2030 to 15.03.2030",
+                "Saturday, 16.03.2030\n* Ivy Sparse, from 09:00 to 10:00",
+                "No Reservations from 17.03.2030 to 21.03.2030"])
+
+            with patch('builtins.input', return_value='sparse'):
+                Reservation.schedule(date_start, date_end, 'json', sparse=True)
+            with open('sparse.json', 'r', encoding='utf-8') as json_file:
+                self.assertEqual(list(json.load(json_file)), ["04.02", "06.02", "16.03"])
+
+
+class _AggregateScenarios:
+    """The set up and the scenarios shared by the tests of the subscribers keeping aggregates of all reservations.
+    Test classes set aggregate_class.
+    """
+
+    aggregate_class = None
+
+    def setUp(self):
+        self.enterContext(isolated_state(clients=("Ann Lee", "Bob Ray")))
+        self.monday = datetime(2099, 3, 16).date()
+        self.ann, self.bob = Client.list_of_client()
+        Reservation(self.ann, self.monday, time(10, 0), time(11, 30))
+        self.aggregate = self.aggregate_class()
+        self.addCleanup(self.aggregate.close)
+
+    def _cancel_loaded_muted(self, day):
+        """Cancels a reservation of Bob Ray from 12:00 to 13:00 on the given day, loaded without events.
+        The aggregates never counted it, so the cancellation must be ignored without an error.
+        """
+
+        with Reservation.events.muted():
+            loaded, = Reservation.load_records([(day, "Bob Ray", time(12, 0), time(13, 0))])
+        with self.assertNoLogs('events', level='ERROR'):
+            Reservation.list_of_reservations().remove(loaded)
+
+    def _days_of_the_store(self, measure):
+        """Keeps new aggregates of two reservations of Bob Ray on days of the store, last year from 10:00
+        to 11:00 and on the next day from 12:00 to 12:30. Returns what the given function of the aggregates
+        and the first of the days measures while the days are in the store only, after they are loaded,
+        and after the reservation of the first day is cancelled.
+        """
+
+        last_year = self.monday - timedelta(days=365)
+        write_schedule('aggregates.bin', {last_year: [("Bob Ray", time(10, 0), time(11, 0))],
+                                          last_year + timedelta(days=1): [("Bob Ray", time(12, 0), time(12, 30))]})
+        Reservation.store = LazyScheduleStore('aggregates.bin', horizon_days=1, max_loaded_days=1)
+        self.addCleanup(Reservation.store.close)
+        aggregate = self.aggregate_class()
+        self.addCleanup(aggregate.close)
+        measures = [measure(aggregate, last_year)]
+
+        Reservation.fault_in(last_year, last_year)
+        Reservation.fault_in(last_year + timedelta(days=1), last_year + timedelta(days=1))
+        measures.append(measure(aggregate, last_year))
+
+        with patch('builtins.input', return_value='y'), patch('sys.stdout', StringIO()):
+            self.assertTrue(self.bob.cancel_reservation(last_year))
+        measures.append(measure(aggregate, last_year))
+        return measures
+
+
+class TestClientStatistics(_AggregateScenarios, unittest.TestCase):
+    """A class that contains unittests for the ClientStatistics class."""
+
+    aggregate_class = ClientStatistics
+
+    def test_aggregates(self):
+        """Test if the aggregates include existing reservations and are updated on booking and cancellation."""
+
+        Reservation(self.ann, self.monday + timedelta(days=2), time(23, 30), time(0, 30))
+        cancelled = Reservation(self.ann, self.monday + timedelta(days=20), time(9, 0))
+        Reservation.list_of_reservations().remove(cancelled)
+
+        record = self.aggregate.record("Ann Lee")
+        self.assertEqual(record.total_minutes, 150)
+        self.assertEqual(record.bookings, 2)
+        self.assertEqual(record.cancellations, 1)
+        self.assertEqual(record.last_booking(), datetime(2099, 3, 18, 23, 30))
+        self.assertEqual(self.aggregate.bookings_in_week("Ann Lee", self.monday + timedelta(days=6)), 2)
+        self.assertEqual(self.aggregate.bookings_in_month("Ann Lee", self.monday), 2)
+        self.assertEqual(self.aggregate.bookings_in_week("Bob Ray", self.monday), 0)
+
+    def test_leaderboards(self):
+        """Test if top-K queries return clients ordered by minutes booked and by cancellations."""
+
+        Reservation(self.bob, self.monday, time(12, 0), time(12, 30))
+        Reservation.list_of_reservations().remove(Reservation(self.bob, self.monday, time(14, 0)))
+        carl = Client("Carl Fox")
+        Reservation(carl, self.monday, time(15, 0), time(17, 0))
+
+        self.assertEqual(self.aggregate.top_by_minutes(2), [("Carl Fox", 120), ("Ann Lee", 90)])
+        self.assertEqual(self.aggregate.top_by_cancellations(1), [("Bob Ray", 1)])
+
+    def test_cancel_reservation_loaded_muted(self):
+        """Test if cancelling a reservation which was loaded without events is ignored."""
+
+        self._cancel_loaded_muted(self.monday)
+        record = self.aggregate.record("Bob Ray")
+        self.assertEqual((record.bookings, record.cancellations), (0, 0))
+        self.assertEqual(self.aggregate.top_by_minutes(1), [("Ann Lee", 90)])
+
+    def test_days_of_the_store(self):
+        """Test if reservations of days which are not loaded are counted, and loading, unloading
+        and cancelling them keep the statistics right.
+        """
+
+        def bob(statistics, day):
+            record = statistics.record("Bob Ray")
+            return record.total_minutes, record.bookings, record.cancellations
+
+        self.assertEqual(self._days_of_the_store(bob), [(90, 2, 0), (90, 2, 0), (30, 1, 1)])
+
+
+class TestScheduleAggregates(_AggregateScenarios, unittest.TestCase):
+    """A class that contains unittests for the ScheduleAggregates and FenwickTree classes."""
+
+    aggregate_class = ScheduleAggregates
+
+    def _covered(self):
+        """Returns the first and the last day covered by the trees of the aggregates."""
+
+        origin = self.aggregate._origin
+        return date.fromordinal(origin), date.fromordinal(origin + len(self.aggregate._counts) - 1)
+
+    def test_fenwick_tree(self):
+        """Test if prefix and range sums match the sums of the numbers after updates."""
+
+        values = [3, 0, 5, 1, 4, 0, 2]
+        tree = FenwickTree.from_values(values)
+        tree.add(2, -5)
+        values[2] -= 5
+        for start in range(len(values) + 1):
+            for stop in range(start, len(values) + 1):
+                self.assertEqual(tree.range_sum(start, stop), sum(values[start:stop]))
+
+    def test_totals_and_days(self):
+        """Test if the totals and the summaries of the days are updated on booking and cancellation."""
+
+        Reservation(self.bob, self.monday, time(8, 0), time(9, 0))
+        Reservation.list_of_reservations().remove(Reservation(self.ann, self.monday + timedelta(days=2), time(7, 0)))
+        sunday = self.monday + timedelta(days=6)
+
+        self.assertEqual(self.aggregate.totals(self.monday, sunday), (2, 150))
+        self.assertEqual(self.aggregate.totals(self.monday + timedelta(days=1), sunday), (0, 0))
+        self.assertEqual(self.aggregate.day(self.monday), DaySummary(self.monday, 2, 150, time(8, 0), time(10, 0)))
+        self.assertEqual(self.aggregate.day(self.monday + timedelta(days=2)),
+                         DaySummary(self.monday + timedelta(days=2)))
+        self.assertEqual([summary.date for summary in self.aggregate.days(self.monday, sunday)], [self.monday])
+
+    def test_span_grows_in_both_directions(self):
+        """Test if reservations before and after the covered days grow the trees away from them,
+        and the totals of all days are kept, also after cancelling reservations on the grown span.
+        """
+
+        first, last = self._covered()
+        before = Reservation(self.bob, first - timedelta(days=400), time(9, 0), time(10, 0))
+        first = self._covered()[0]
+        self.assertLessEqual(first, before.date)
+        self.assertEqual(self._covered()[1], last)
+        after = Reservation(self.bob, last + timedelta(days=3000), time(9, 0), time(9, 30))
+        last = self._covered()[1]
+        self.assertGreaterEqual(last, after.date)
+        self.assertEqual(self._covered()[0], first)
+        Reservation(self.ann, first - timedelta(days=1), time(18, 0), time(19, 0))
+        self.assertEqual(self._covered()[1], last)
+
+        self.assertEqual(self.aggregate.totals(date(2000, 1, 1), date(2200, 1, 1)), (4, 240))
+        self.assertEqual(self.aggregate.totals(first - timedelta(days=1), first - timedelta(days=1)), (1, 60))
+        self.assertEqual(self.aggregate.totals(before.date, self.monday - timedelta(days=1)), (1, 60))
+        self.assertEqual(self.aggregate.totals(self.monday, after.date - timedelta(days=1)), (1, 90))
+        self.assertEqual(self.aggregate.totals(after.date, date(2200, 1, 1)), (1, 30))
+
+        Reservation.list_of_reservations().remove(before)
+        Reservation.list_of_reservations().remove(after)
+        self.assertEqual(self.aggregate.totals(date(2000, 1, 1), date(2200, 1, 1)), (2, 150))
+        self.assertEqual(self.aggregate.totals(self.monday + timedelta(days=1), date(2200, 1, 1)), (0, 0))
+
+    def test_first_and_last_booking_across_empty_ranges(self):
+        """Test if the first and the last booking skip the days without reservations,
+        and are None for ranges without reservations, inside and outside of the covered days.
+        """
+
+        later = self.monday + timedelta(days=10)
+        Reservation(self.bob, later, time(18, 0), time(19, 0))
+        Reservation(self.ann, later, time(8, 0), time(9, 0))
+        first, last = self._covered()
+
+        self.assertEqual(self.aggregate.first_booking(self.monday + timedelta(days=1), later + timedelta(days=5)),
+                         datetime.combine(later, time(8, 0)))
+        self.assertEqual(self.aggregate.last_booking(self.monday - timedelta(days=5), later - timedelta(days=1)),
+                         datetime.combine(self.monday, time(10, 0)))
+        self.assertEqual(self.aggregate.last_booking(first, last), datetime.combine(later, time(18, 0)))
+        for date_start, date_end in ((self.monday + timedelta(days=1), later - timedelta(days=1)),
+                                     (first - timedelta(days=100), self.monday - timedelta(days=1)),
+                                     (later + timedelta(days=1), last + timedelta(days=100)),
+                                     (later, self.monday)):
+            self.assertIsNone(self.aggregate.first_booking(date_start, date_end))
+            self.assertIsNone(self.aggregate.last_booking(date_start, date_end))
+
+        Reservation.list_of_reservations().remove(Reservation.snapshot().reservations_on(self.monday)[0])
+        self.assertIsNone(self.aggregate.first_booking(self.monday, later - timedelta(days=1)))
+        self.assertEqual(self.aggregate.last_booking(self.monday, later), datetime.combine(later, time(18, 0)))
+
+    def test_reservations_past_midnight(self):
+        """Test if a reservation running past midnight counts all its minutes on the day it starts."""
+
+        wednesday, thursday = self.monday + timedelta(days=2), self.monday + timedelta(days=3)
+        late = Reservation(self.bob, wednesday, time(23, 30), time(0, 30))
+        Reservation(self.ann, wednesday, time(22, 0), time(22, 45))
+
+        self.assertEqual(self.aggregate.day(wednesday), DaySummary(wednesday, 2, 105, time(22, 0), time(23, 30)))
+        self.assertEqual(self.aggregate.totals(thursday, thursday), (0, 0))
+        self.assertIsNone(self.aggregate.first_booking(thursday, thursday))
+        self.assertEqual(self.aggregate.last_booking(self.monday, thursday), datetime.combine(wednesday, time(23, 30)))
+
+        Reservation.list_of_reservations().remove(late)
+        self.assertEqual(self.aggregate.totals(wednesday, thursday), (1, 45))
+
+    def test_cancel_reservation_loaded_muted(self):
+        """Test if cancelling a reservation which was loaded without events is ignored."""
+
+        tuesday = self.monday + timedelta(days=1)
+        self._cancel_loaded_muted(tuesday)
+        self.assertEqual(self.aggregate.totals(self.monday, self.monday + timedelta(days=6)), (1, 90))
+        self.assertEqual(self.aggregate.day(tuesday), DaySummary(tuesday))
+
+    def test_days_of_the_store(self):
+        """Test if reservations of days which are not loaded are counted, and loading, unloading
+        and cancelling them keep the aggregates right.
+        """
+
+        def totals(aggregates, day):
+            return aggregates.totals(day, day + timedelta(days=1)), aggregates.first_booking(day, self.monday)
+
+        last_year = self.monday - timedelta(days=365)
+        self.assertEqual(self._days_of_the_store(totals),
+                         [((2, 90), datetime.combine(last_year, time(10, 0)))] * 2 +
+                         [((1, 30), datetime.combine(last_year + timedelta(days=1), time(12, 0)))])
+
+
+class TestDifferential(unittest.TestCase):
+    """A class that contains unittests for the differential test harness."""
+
+    def test_backends_agree(self):
+        """Test if the engine behaves exactly like the reference backend."""
+
+        for seed in range(5):
+            self.assertIsNone(differential.check_seed(seed, length=150), f"Seed {seed} fails")
+
+    def test_generate_operations_is_reproducible(self):
+        """Test if the same seed always generates the same operations."""
+
+        self.assertEqual(differential.generate_operations(7), differential.generate_operations(7))
+
+    def test_detects_and_shrinks_difference(self):
+        """Test if an index which ignores reservations of the next day is detected and the failure is shrunk."""
+
+        def same_day_only(snapshot, date, minute):
+            starts = [reservation.start_time.hour * 60 + reservation.start_time.minute
+                      for reservation in snapshot.reservations_on(date)]
+            return next((start for start in starts if start > minute), None)
+
+        with patch.object(ScheduleSnapshot, 'next_start', same_day_only):
+            failing = next(filter(None, (differential.check_seed(seed) for seed in range(20))))
+            self.assertIsNotNone(differential.first_difference(failing))
+        self.assertLessEqual(len(failing), 3)
+
+    def test_detects_difference_of_the_engine(self):
+        """Test if a bug of the engine, free time ignoring later reservations, is detected."""
+
+        def up_to_closing(cls, date, time, snapshot):
+            table = Client.config.table(date)
+            return table.free_slots(table.slot_of(time.hour * 60 + time.minute), table.limit)
+
+        with patch.object(Client, '_free_slots', classmethod(up_to_closing)):
+            self.assertIsNotNone(next(filter(None, (differential.check_seed(seed) for seed in range(20))), None))
+
+    def test_shrink(self):
+        """Test if shrink removes all operations which are not needed for the failure."""
+
+        operations = list(range(50))
+        self.assertEqual(differential.shrink(operations, lambda candidate: 13 in candidate and 31 in candidate),
+                         [13, 31])
+
+
+class TestEvents(unittest.TestCase):
+    """A class that contains unittests for the change events of reservations."""
+
+    def setUp(self):
+        self.client = Client("John Doe")
+        self.tomorrow = datetime.now().date() + timedelta(days=1)
+        self.batches = []
+        Reservation.events.subscribe(self.batches.append)
+
+    def tearDown(self):
+        Reservation.events.unsubscribe(self.batches.append)
+        Reservation.list_of_reservations().clear()
+
+    def test_created_and_cancelled_events(self):
+        """Test if making and cancelling a reservation publish typed events with increasing sequence numbers."""
+
+        reservation = Reservation(self.client, self.tomorrow, time(10, 0))
+        self.client.reservation.append(reservation)
+        with patch('sys.stdout', StringIO()):
+            self.client.cancel_reservation(self.tomorrow)
+
+        (created,), (cancelled,) = self.batches
+        self.assertIsInstance(created, ReservationCreated)
+        self.assertIsInstance(cancelled, ReservationCancelled)
+        self.assertIs(created.reservation, reservation)
+        self.assertEqual(cancelled.sequence, created.sequence + 1)
+        self.assertEqual(cancelled.sequence, Reservation.events.last_sequence())
+
+    def test_batch_and_muted(self):
+        """Test if events are delivered in a single batch and not published while muted."""
+
+        with Reservation.events.batch():
+            Reservation(self.client, self.tomorrow, time(10, 0))
+            Reservation(self.client, self.tomorrow, time(12, 0))
+            self.assertEqual(self.batches, [])
+        with Reservation.events.muted():
+            Reservation(self.client, self.tomorrow, time(14, 0))
+
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual([event.start_time for event in self.batches[0]], [time(10, 0), time(12, 0)])
+
+    def test_event_log_tail(self):
+        """Test if a tail reader returns only the events appended to the log since the last read."""
+
+        event_log = Reservation.events.subscribe(EventLog('test_events.log'))
+        reader = EventTailReader('test_events.log')
+        reservation = Reservation(self.client, self.tomorrow, time(10, 0))
+        self.assertEqual([(event.kind, event.client, event.start_time) for event in reader.read()],
+                         [('created', "John Doe", time(10, 0))])
+
+        Reservation.list_of_reservations().remove(reservation)
+        with open('test_events.log', 'a', encoding='utf-8') as log_file:
+            log_file.write('{"sequence": ')
+        events = reader.read()
+        self.assertEqual([(event.kind, event.date) for event in events], [('cancelled', self.tomorrow)])
+        self.assertEqual(reader.read(), [])
+
+        Reservation.events.unsubscribe(event_log)
+        os.remove('test_events.log')
+
+    def test_event_log_tail_after_writer_restart(self):
+        """Test if a tail reader returns the events of a restarted writer, whose sequence numbers start again at 1."""
+
+        reservation = Reservation(self.client, self.tomorrow, time(10, 0))
+        Reservation.list_of_reservations().remove(reservation)
+        reader = EventTailReader('test_events.log')
+        for count in (3, 2):
+            bus = EventBus()
+            bus.subscribe(EventLog('test_events.log'))
+            bus.publish(ReservationCreated, [reservation] * count)
+            self.assertEqual([event.sequence for event in reader.read()], list(range(1, count + 1)))
+        self.assertEqual(reader.read(), [])
+        os.remove('test_events.log')
+
+    def test_clear_publishes_no_events(self):
+        """Test if clearing the list of reservations resets it without publishing cancellations."""
+
+        Reservation(self.client, self.tomorrow, time(10, 0))
+        self.batches.clear()
+        Reservation.list_of_reservations().clear()
+
+        self.assertEqual(self.batches, [])
+        self.assertEqual(list(Reservation.snapshot().dates()), [])
+
+    def test_subscribers_run_outside_the_lock(self):
+        """Test if subscribers are called after the list is unlocked, and a failing subscriber
+        neither stops the delivery to the others nor undoes the change.
+        """
+
+        reservations = Reservation.list_of_reservations()
+        unlocked = []
+
+        def failing(events):
+            raise RuntimeError("subscriber failed")
+
+        def take_lock():
+            if reservations._lock.acquire(timeout=5):
+                reservations._lock.release()
+                unlocked.append(True)
+
+        def check_lock(events):
+            other = threading.Thread(target=take_lock)
+            other.start()
+            other.join()
+
+        Reservation.events.subscribe(failing)
+        Reservation.events.subscribe(check_lock)
+        try:
+            with self.assertLogs('events', 'ERROR'):
+                reservation = Reservation(self.client, self.tomorrow, time(10, 0))
+        finally:
+            Reservation.events.unsubscribe(failing)
+            Reservation.events.unsubscribe(check_lock)
+
+        self.assertEqual(unlocked, [True])
+        self.assertEqual([event.reservation for event in self.batches[0]], [reservation])
+        self.assertIn(reservation, reservations)
+
+
+class TestExportQueue(unittest.TestCase):
+    """A class that contains unittests for the ExportQueue and ExportJob classes."""
+
+    def setUp(self):
+        self.client = Client("John Doe")
+        self.today = datetime.now().date()
+        for day in range(3):
+            Reservation(self.client, self.today + timedelta(days=day), time(10, 0), time(11, 0))
+
+    def tearDown(self):
+        Reservation.list_of_reservations().clear()
+
+    def test_background_export_matches_serial(self):
+        """Test if a background job writes the same file as the serial export and is reported once."""
+
+        export_queue = ExportQueue()
+        date_end = self.today + timedelta(days=4)
+        for param in ('json', 'csv'):
+            with patch('builtins.input', return_value='test_serial'):
+                Reservation.schedule(self.today, date_end, param)
+            job = export_queue.submit(self.today, date_end, param, 'test_background')
+            export_queue.wait()
+
+            self.assertEqual(job.status, 'done')
+            self.assertEqual(job.progress(), "5/5 days")
+            self.assertEqual(export_queue.finished_jobs(), [job])
+            self.assertEqual(export_queue.finished_jobs(), [])
+            with open(f'test_serial.{param}', 'rb') as serial_file, \
+                    open(f'test_background.{param}', 'rb') as background_file:
+                self.assertEqual(serial_file.read(), background_file.read())
+            os.remove(f'test_serial.{param}')
+            os.remove(f'test_background.{param}')
+
+    def test_snapshot_ignores_later_bookings(self):
+        """Test if reservations made after the job was submitted are not exported."""
+
+        export_queue = ExportQueue()
+        with patch.object(ExportQueue, '_run'):
+            job = export_queue.submit(self.today, self.today, 'csv', 'test_snapshot')
+        Reservation(self.client, self.today, time(12, 0), time(13, 0))
+        job.run()
+
+        with open('test_snapshot.csv', 'r', encoding='utf-8') as test_file:
+            self.assertEqual(len(list(csv.DictReader(test_file))), 1)
+        os.remove('test_snapshot.csv')
+
+    def test_cancelled_job(self):
+        """Test if a cancelled job does not leave any file behind."""
+
+        job = ExportJob(1, lambda: [(self.today, ())], 'json', 'test_cancelled')
+        job.cancel()
+        job.run()
+        self.assertEqual(job.status, 'cancelled')
+        self.assertFalse(os.path.exists('test_cancelled.json'))
+        self.assertFalse(os.path.exists('test_cancelled.json.part'))
+
+    def test_failed_job_does_not_stop_the_queue(self):
+        """Test if an unexpected error fails only its job, and if closing the queue waits for the others."""
+
+        export_queue = ExportQueue()
+        with patch.object(ExportJob, '_write_json', side_effect=ValueError("broken")):
+            failed = export_queue.submit(self.today, self.today, 'json', 'test_failed')
+            done = export_queue.submit(self.today, self.today, 'csv', 'test_after_failure')
+            export_queue.close()
+
+        self.assertEqual((failed.status, str(failed.error)), ('failed', "broken"))
+        self.assertFalse(os.path.exists('test_failed.json.part'))
+        self.assertEqual(done.status, 'done')
+        self.assertFalse(export_queue.cancel(done.job_id))
+        os.remove('test_after_failure.csv')
+
+
+class TestLazyScheduleStore(unittest.TestCase):
+    """A class that contains unittests for the LazyScheduleStore class."""
+
+    def setUp(self):
+        Reservation.list_of_reservations().clear()
+        self.clients = list(Client.list_of_client())
+        self.today = datetime.now().date()
+        self.last_year = self.today - timedelta(days=365)
+        self.next_year = self.today + timedelta(days=365)
+        write_schedule('test_store.bin', {
+            self.last_year: [("Ann Lee", time(10, 0), time(11, 0))],
+            self.last_year + timedelta(days=1): [("Bob Ray", time(12, 0), time(13, 0))],
+            self.today + timedelta(days=1): [("Ann Lee", time(9, 0), time(10, 0))],
+            self.next_year: [("Bob Ray", time(23, 0), time(23, 30))],
+        })
+        self.store = LazyScheduleStore('test_store.bin', horizon_days=7, max_loaded_days=1)
+        Reservation.store = self.store
+
+    def tearDown(self):
+        Reservation.store = None
+        self.store.close()
+        Reservation.list_of_reservations().clear()
+        Client.list_of_client()[:] = self.clients
+        os.remove('test_store.bin')
+
+    def test_load_horizon(self):
+        """Test if only the reservations of the booking horizon are loaded at startup."""
+
+        self.assertEqual(self.store.load_horizon(self.today), 1)
+        self.assertEqual(Reservation.snapshot().dates(), (self.today + timedelta(days=1),))
+
+    def test_schedule_reads_days_not_loaded(self):
+        """Test if the schedule contains days which are not loaded, without loading them."""
+
+        self.store.load_horizon(self.today)
+        period_schedule = Reservation.period_schedule(self.last_year, self.last_year + timedelta(days=1))
+        self.assertEqual(period_schedule[self.last_year], [("Ann Lee", time(10, 0), time(11, 0))])
+        self.assertEqual(self.store.loaded_days(), 0)
+        self.assertEqual(len(Reservation.list_of_reservations()), 1)
+
+    def test_background_export_reads_the_store_in_the_job(self):
+        """Test if a background export reads the days not in memory when it runs, not when it is submitted,
+        and exports the days in memory at submission even if they are unloaded meanwhile.
+        """
+
+        self.store.load_horizon(self.today)
+        Reservation.fault_in(self.last_year, self.last_year)
+        export_queue = ExportQueue()
+        with patch.object(ExportQueue, '_run'), \
+                patch.object(self.store, 'stored_between', wraps=self.store.stored_between) as stored_between:
+            job = export_queue.submit(self.last_year, self.last_year + timedelta(days=1), 'csv', 'test_store_export')
+            self.assertFalse(stored_between.called)
+            Reservation.fault_in(self.last_year + timedelta(days=1), self.last_year + timedelta(days=1))
+            self.assertEqual(job.progress(), "0/? days")
+            job.run()
+            self.assertTrue(stored_between.called)
+
+        with open('test_store_export.csv', 'r', encoding='utf-8') as test_file:
+            self.assertEqual([row['name'] for row in csv.DictReader(test_file)], ["Ann Lee", "Bob Ray"])
+        os.remove('test_store_export.csv')
+
+    def test_parallel_export_reads_days_not_loaded(self):
+        """Test if the parallel export writes the days which are not loaded, read from the store,
+        as the serial export does, for dense and sparse, compact and compressed files.
+        """
+
+        self.store.load_horizon(self.today)
+        for param, compression, compact, sparse in (('json', None, False, False), ('json', 'gzip', True, True),
+                                                    ('csv', None, False, False), ('csv', 'bz2', False, True)):
+            with self.subTest(param=param, compression=compression, compact=compact, sparse=sparse), \
+                    patch('sys.stdout', new_callable=StringIO):
+                with patch('builtins.input', return_value='test_serial'):
+                    Reservation.schedule(self.last_year, self.next_year, param, compression=compression,
+                                         compact=compact, sparse=sparse)
+                with patch('builtins.input', return_value='test_parallel'):
+                    Reservation.schedule(self.last_year, self.next_year, param, workers=2, compression=compression,
+                                         compact=compact, sparse=sparse)
+                extension = {'gzip': '.gz', 'bz2': '.bz2', None: ''}[compression]
+                opener = {'gzip': gzip.open, 'bz2': bz2.open, None: open}[compression]
+                with opener(f'test_serial.{param}{extension}', 'rb') as serial_file, \
+                        opener(f'test_parallel.{param}{extension}', 'rb') as parallel_file:
+                    serial = serial_file.read()
+                    self.assertEqual(parallel_file.read(), serial)
+                self.assertIn(b"Bob Ray", serial)
+                os.remove(f'test_serial.{param}{extension}')
+                os.remove(f'test_parallel.{param}{extension}')
+        self.assertEqual(self.store.loaded_days(), 0)
+
+    def test_fault_in_and_eviction(self):
+        """Test if days are loaded on demand and the least recently used day is unloaded."""
+
+        self.store.load_horizon(self.today)
+        Reservation.fault_in(self.last_year, self.last_year)
+        self.assertEqual(len(Reservation.snapshot().reservations_on(self.last_year)), 1)
+
+        Reservation.fault_in(self.last_year + timedelta(days=1), self.last_year + timedelta(days=1))
+        self.assertEqual(Reservation.snapshot().reservations_on(self.last_year), ())
+        self.assertEqual(len(Reservation.snapshot().reservations_on(self.last_year + timedelta(days=1))), 1)
+        self.assertEqual(self.store.loaded_days(), 1)
+
+    def test_checked_days_stay_loaded(self):
+        """Test if the days checked by a reservation are not unloaded while it is made,
+        even if the cache holds fewer days.
+        """
+
+        self.store.close()
+        day = self.today + timedelta(days=10)
+        write_schedule('test_store.bin', {day: [("Ann Lee", time(10, 0), time(11, 0))]})
+        self.store = Reservation.store = LazyScheduleStore('test_store.bin', horizon_days=1, max_loaded_days=0)
+        self.store.load_horizon(self.today)
+        with patch('builtins.input', return_value='no'), patch('sys.stdout', new_callable=StringIO) as output:
+            self.assertFalse(Client("Bob Ray").make_reservation(day, time(10, 0)))
+            self.assertFalse(Client("Cy Twombly").book(day, time(10, 0), 60))
+        self.assertIn("already occupied", output.getvalue())
+        self.assertEqual(self.store.loaded_days(), 0)
+
+    def test_cancel_loads_the_day(self):
+        """Test if a reservation which is not loaded can be cancelled and the cancellation is saved."""
+
+        self.store.load_horizon(self.today)
+        client = Client("Bob Ray")
+        with patch('builtins.input', return_value='y'):
+            self.assertTrue(client.cancel_reservation(self.next_year))
+        self.store.save()
+
+        with BinarySchedule('test_store.bin') as binary_schedule:
+            self.assertNotIn(self.next_year, binary_schedule.dates())
+            self.assertEqual(len(binary_schedule.dates()), 3)
+
+
+class TestTranscript(unittest.TestCase):
+    """A class that contains unittests for recording and replaying session transcripts."""
+
+    answers = "1\nKeanu Reeves\n1\n15.03.2099 15:30\n2\n3\n15.03.2099\n16.03.2099\n5\n2\n"
+
+    def setUp(self):
+        self.path = os.path.abspath('test_transcript.json')
+        # Records with a client and a reservation existing before the session, which the replay has to restore
+        with differential.isolated_state(now=datetime.now()), \
+                patch('sys.stdin', StringIO(self.answers)), patch('sys.stdout', StringIO()):
+            Reservation(Client("Ada Byron"), datetime(2099, 3, 16).date(), time(9, 0))
+            Client("Keanu Reeves")
+            transcript.record(self.path)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_record(self):
+        """Test if the initial state, the answers with their moments and the output of the session,
+        prompts included, are recorded.
+        """
+
+        with open(self.path, 'r', encoding='utf-8') as transcript_file:
+            recorded = json.load(transcript_file)
+        self.assertEqual(recorded["answers"], self.answers.splitlines())
+        self.assertEqual(len(recorded["answered"]), len(recorded["answers"]))
+        self.assertEqual(recorded["clients"], ["Ada Byron", "Keanu Reeves"])
+        self.assertEqual(recorded["reservations"], [["2099-03-16", "Ada Byron", "09:00", "10:00"]])
+        self.assertIn("Welcome back, Keanu Reeves!\n", recorded["output"])
+        self.assertIn("* Ada Byron, from 09:00 to 10:00", recorded["output"])
+        self.assertIn("When would you like to book? {DD.MM.YYYY HH:MM}\n15.03.2099 15:30\n", recorded["output"])
+
+    def test_replay_matches(self):
+        """Test if a replay answers all prompts and produces the recorded output."""
+
+        operations, _, difference = transcript.replay(self.path)
+        self.assertEqual(operations, 10)
+        self.assertIsNone(difference)
+
+    def test_replay_uses_recorded_moments(self):
+        """Test if the clock of a replay shows the moments the answers were typed."""
+
+        with open(self.path, 'r', encoding='utf-8') as transcript_file:
+            recorded = json.load(transcript_file)
+        recorded["answered"] = ["2099-03-15T15:00:00"] * len(recorded["answers"])
+        with open(self.path, 'w', encoding='utf-8') as transcript_file:
+            json.dump(recorded, transcript_file)
+
+        # Half an hour before the reservation, the booking is refused and the next prompt differs
+        _, _, difference = transcript.replay(self.path)
+        self.assertIsNotNone(difference)
+
+    def test_replay_detects_regression(self):
+        """Test if a replay reports the first line of output which differs from the recording."""
+
+        with patch.object(Session, 'greeting', lambda session: print("Hello!") or Client("Keanu Reeves")):
+            _, _, difference = transcript.replay(self.path)
+        self.assertEqual(difference, 3)
+
+
+class TestClubConfig(unittest.TestCase):
+    """An unittest class for testing the opening hours and slot grid of the club."""
+
+    def setUp(self):
+        self.config = ClubConfig((('08:00', '22:00'),) * 5 + (('09:00', '24:00'), ('00:00', '12:00')),
+                                 slot_minutes=30, durations=(30, 60, 120))
+        self.monday = datetime(2030, 1, 7).date()
+        self.saturday = self.monday + timedelta(days=5)
+
+    def test_slot_table(self):
+        """Test if booking times are looked up on the grid of the weekday."""
+
+        table = self.config.table(self.monday)
+        self.assertEqual(table.slot_of(8 * 60), 0)
+        self.assertEqual(table.slot_of(10 * 60 + 30), 5)
+        self.assertIsNone(table.slot_of(10 * 60 + 15))
+        self.assertIsNone(table.slot_of(22 * 60))
+        self.assertIsNone(table.slot_of(7 * 60 + 30))
+        self.assertEqual(table.next_slot(10 * 60 + 15), 5)
+        self.assertEqual(table.time_of(5), time(10, 30))
+
+    def test_open_past_midnight(self):
+        """Test if a day closing at midnight continues into the next day opening at midnight."""
+
+        table = self.config.table(self.saturday)
+        self.assertEqual(table.free_slots(table.slot_of(23 * 60 + 30), 10 ** 6), 25)
+        self.assertEqual(table.time_of(table.slot_of(23 * 60 + 30) + 4), time(1, 30))
+        self.assertEqual(self.config.table(self.monday).free_slots(27, 10 ** 6), 1)
+
+    def test_menu(self):
+        """Test if the duration menu offers the durations fitting in the free slots."""
+
+        prompt, answers, default = self.config.menu(3)
+        self.assertIn("\t2. 60 minutes\n", prompt)
+        self.assertNotIn("120 minutes", prompt)
+        self.assertEqual((answers['2'], answers['60'], answers['yes'], answers['no'], default), (60, 60, 30, None, 60))
+        self.assertEqual(self.config.menu(1)[0],
+                         "Would you like to book the court for 30 minutes?\n\t0. No\n\t1. Yes\n")
+        self.assertIsNone(self.config.menu(0)[0])
+        self.assertEqual(self.config.menu(40), self.config.menu(4))
+
+    def test_invalid_config(self):
+        """Test if durations off the slot grid are rejected."""
+
+        with self.assertRaises(ValueError):
+            ClubConfig(slot_minutes=45)
+        with self.assertRaises(ValueError):
+            ClubConfig((('08:00', '22:00'),) * 6)
+
+    def test_from_json(self):
+        """Test if a configuration is read from a JSON file."""
+
+        path = os.path.abspath('test_club.json')
+        with open(path, 'w', encoding='utf-8') as config_file:
+            json.dump({"opening_hours": [["08:00", "22:00"]] * 6 + [None], "slot_minutes": 15}, config_file)
+        try:
+            config = ClubConfig.from_json(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(config.durations, (30, 60, 90))
+        self.assertFalse(config.table(self.monday + timedelta(days=6)).is_open(12 * 60))
+
+    def test_make_reservation_follows_config(self):
+        """Test if reservations are only made on the grid, within the opening hours, and until closing time."""
+
+        with differential.isolated_state(now=datetime(2030, 1, 1, 8, 0)), patch('sys.stdout', new_callable=StringIO):
+            Client.config = self.config
+            client = Client("Ada Grid")
+            self.assertFalse(client.make_reservation(self.monday, time(7, 0)))
+            self.assertFalse(client.make_reservation(self.monday, time(10, 15)))
+            with patch('builtins.input', return_value='3'):
+                self.assertTrue(client.make_reservation(self.monday, time(21, 0)))
+            reservation = Reservation.list_of_reservations()[-1]
+            self.assertEqual((reservation.start_time, reservation.end_time), (time(21, 0), time(22, 0)))
+            other = Client("Bea Grid")
+            self.assertFalse(other.make_reservation(self.monday, time(21, 0)))
+            self.assertIn("There is no free time later on this day.", sys.stdout.getvalue())
+            self.assertEqual(len(Reservation.list_of_reservations()), 1)
+
+
+class TestDateParser(unittest.TestCase):
+    """An unittest class for testing the parser of dates and times."""
+
+    texts = ["15.03.2099 15:30", "15.03.99 15:30", "1.3.24 9:05", "01.03.1969 00:00", "31.12.68 23:59",
+             "29.02.2024 10:00", "29.02.2023 10:00", "32.01.2024 10:00", "15.13.2024 10:00", "15.03.2024 24:00",
+             "15.03.2024 10:60", "15.03.202 10:00", "15.03.20245 10:00", "15.03.2024", "15/03/2024 10:00",
+             "15.03.2024  10:00", "15.03.2024 10", "a5.03.2024 10:00", "15.03.2024 10:00 x", "", "١٥.03.2024 10:00"]
+
+    @staticmethod
+    def strptime_chain(text, formats):
+        """Returns the result of the first strptime format which parses the text, None if none does."""
+
+        for date_format in formats:
+            try:
+                return datetime.strptime(text, date_format)
+            except ValueError:
+                continue
+        return None
+
+    def test_date_time_matches_strptime(self):
+        """Test if dates and times are parsed like the strptime formats used before."""
+
+        for text in self.texts:
+            with self.subTest(text=text):
+                self.assertEqual(parse_date_time(text), self.strptime_chain(text, ("%d.%m.%y %H:%M", "%d.%m.%Y %H:%M")))
+
+    def test_date_matches_strptime(self):
+        """Test if dates are parsed like the strptime formats used before."""
+
+        for text in [text.split(' ')[0] for text in self.texts]:
+            with self.subTest(text=text):
+                expected = self.strptime_chain(text, ("%d.%m.%y", "%d.%m.%Y"))
+                self.assertEqual(parse_date(text), expected.date() if expected else None)
+
+    def test_normalize_separators(self):
+        """Test if the separators users type in dates are replaced with dots."""
+
+        self.assertEqual(normalize_separators(" 15/03-2024 10:00\n"), "15.03.2024 10:00")
+        self.assertIsNone(parse_date("15-03-2024"))
+
+    def test_cache(self):
+        """Test if repeated texts are answered from the cache."""
+
+        parse_date_time.cache_clear()
+        parse_date_time("16.03.2099 15:30")
+        parse_date_time("16.03.2099 15:30")
+        self.assertEqual(parse_date_time.cache_info().hits, 1)
+
+
+def _book_in_other_process(path, name, day, start_time, answers):
+    """Makes a reservation in a forked process with its own SharedScheduleStore on the database."""
+
+    def book():
+        # The store inherited from the parent process shares its connection, so the child opens its own
+        Client.list_of_client().clear()
+        Reservation.list_of_reservations().clear()
+        Reservation.store = SharedScheduleStore(path)
+        Reservation.store.load_horizon(differential.NOW.date())
+        with patch('builtins.input', side_effect=answers), patch('sys.stdout', new_callable=StringIO):
+            booked = Client(name).make_reservation(day, start_time)
+        Reservation.store.close()
+        sys.exit(0 if booked else 1)
+
+    process = multiprocessing.get_context('fork').Process(target=book)
+    process.start()
+    process.join()
+    return process.exitcode == 0
+
+
+def _day_locked_in_other_process(path, day):
+    """Checks from a forked process if the lock of the given day is held."""
+
+    def check():
+        import fcntl
+
+        with open(f"{path}.lock", 'a+b') as lock_file:
+            try:
+                fcntl.lockf(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, GENERATION.size + day.toordinal())
+            except OSError:
+                sys.exit(0)
+        sys.exit(1)
+
+    process = multiprocessing.get_context('fork').Process(target=check)
+    process.start()
+    process.join()
+    return process.exitcode == 0
+
+
+@unittest.skipUnless(SharedScheduleStore is not None, "fcntl is not available on this platform")
+class TestSharedScheduleStore(unittest.TestCase):
+    """An unittest class for testing the store shared by several processes."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'club.sqlite')
+        state = differential.isolated_state()
+        state.__enter__()
+        self.addCleanup(state.__exit__, None, None, None)
+        output = patch('sys.stdout', new_callable=StringIO)
+        output.start()
+        self.addCleanup(output.stop)
+        self.day = differential.NOW.date() + timedelta(days=2)
+        self.store = Reservation.store = SharedScheduleStore(self.path)
+        self.addCleanup(self.store.close)
+        self.store.load_horizon(differential.NOW.date())
+        self.client = Client("Fay Shared")
+
+    def test_bookings_are_shared(self):
+        """Test if reservations made by another process are seen, and reservations made here are seen by it."""
+
+        with patch('builtins.input', return_value='2'):
+            self.assertTrue(self.client.make_reservation(self.day, time(10, 0)))
+        self.assertTrue(_book_in_other_process(self.path, "Gus Shared", self.day, time(12, 0), ['1']))
+        self.assertFalse(_book_in_other_process(self.path, "Gus Shared", self.day, time(10, 30), ['no']))
+
+        schedule = Reservation.period_schedule(self.day, self.day)[self.day]
+        self.assertEqual([(str(client), start, end) for client, start, end in schedule],
+                         [("Fay Shared", time(10, 0), time(11, 0)), ("Gus Shared", time(12, 0), time(12, 30))])
+
+    def test_router_does_not_use_the_store(self):
+        """Test if clubs served by worker processes forked from a process using the store do not write to it."""
+
+        generation = self.store.generation()
+        with Router({"Riverside": None}, workers=1) as router:
+            self.assertTrue(router.book("Riverside", "Hal Club", self.day, time(10, 0), 60))
+            self.assertTrue(router.cancel("Riverside", "Hal Club", self.day))
+            self.assertTrue(router.book("Riverside", "Hal Club", self.day, time(11, 0), 60))
+        self.assertEqual(self.store.generation(), generation)
+        self.assertEqual(self.store.stored_between(self.day, self.day), {})
+        self.assertIs(Reservation.store, self.store)
+
+    def test_generation(self):
+        """Test if only writes of other processes make the days in memory reload."""
+
+        generation = self.store.generation()
+        with patch('builtins.input', return_value='1'):
+            self.client.make_reservation(self.day, time(10, 0))
+        self.assertEqual(self.store.generation(), generation + 1)
+        self.assertEqual(self.store.sync(), set())
+        _book_in_other_process(self.path, "Gus Shared", self.day + timedelta(days=1), time(9, 0), ['1'])
+        self.assertEqual(self.store.generation(), generation + 2)
+        self.assertEqual(self.store.sync(), {self.day + timedelta(days=1)})
+        self.assertEqual(len(Reservation.snapshot().reservations_on(self.day + timedelta(days=1))), 1)
+
+    def test_cancel_is_shared(self):
+        """Test if a reservation cancelled here is removed from the database."""
+
+        with patch('builtins.input', return_value='1'):
+            self.client.make_reservation(self.day, time(10, 0))
+        self.assertTrue(self.client.cancel_reservation(self.day))
+        self.assertTrue(_book_in_other_process(self.path, "Gus Shared", self.day, time(10, 0), ['1']))
+
+    def test_conflicting_booking(self):
+        """Test if a time booked by another process while the client was choosing the duration is not booked."""
+
+        def choose_duration(prompt):
+            _book_in_other_process(self.path, "Gus Shared", self.day, time(10, 30), ['1'])
+            return '2'
+
+        with patch('builtins.input', side_effect=choose_duration):
+            self.client.make_reservation(self.day, time(10, 0))
+        self.assertIn("has just been booked by someone else", sys.stdout.getvalue())
+        self.assertEqual([str(reservation.client) for reservation in Reservation.snapshot().reservations_on(self.day)],
+                         ["Gus Shared"])
+
+    def test_weekly_cap_is_checked_again(self):
+        """Test if a third reservation of the week, made by another process while the client was choosing
+        the duration, is not exceeded, and if a reservation running past midnight blocks the next day.
+        """
+
+        with patch('builtins.input', return_value='2'):
+            self.assertTrue(self.client.make_reservation(self.day, time(23, 30)))
+
+        def choose_duration(prompt):
+            _book_in_other_process(self.path, "Fay Shared", self.day + timedelta(days=1), time(12, 0), ['1'])
+            return '1'
+
+        with patch('builtins.input', side_effect=choose_duration):
+            self.client.make_reservation(self.day - timedelta(days=1), time(9, 0))
+        self.assertIn("you already have 2 reservations that week", sys.stdout.getvalue())
+        self.assertFalse(_book_in_other_process(self.path, "Gus Shared", self.day + timedelta(days=1), time(0, 0),
+                                                ['no']))
+        self.assertEqual(len(self.client.reservation), 2)
+
+    def test_failed_write_books_nothing(self):
+        """Test if a booking which cannot be written to the database raises and is not made in memory."""
+
+        self.store._database.execute("PRAGMA busy_timeout = 0")
+        other = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute("BEGIN IMMEDIATE")
+        with self.assertRaises(sqlite3.OperationalError):
+            self.client.book(self.day, time(10, 0), 60)
+        self.assertEqual(Reservation.snapshot().reservations_on(self.day), ())
+        self.assertEqual(self.client.reservation, [])
+        other.execute("ROLLBACK")
+        self.assertTrue(self.client.book(self.day, time(10, 0), 60))
+        self.assertTrue(_book_in_other_process(self.path, "Gus Shared", self.day, time(11, 0), ['1']))
+        self.assertFalse(_book_in_other_process(self.path, "Gus Shared", self.day, time(10, 0), ['no']))
+
+    def test_day_locks(self):
+        """Test if the days being changed are locked against other processes, and only them."""
+
+        with Reservation.editing(self.day, self.day):
+            self.assertTrue(_day_locked_in_other_process(self.path, self.day))
+            self.assertFalse(_day_locked_in_other_process(self.path, self.day + timedelta(days=1)))
+        self.assertFalse(_day_locked_in_other_process(self.path, self.day))
+
+
+class TestAdmissionController(unittest.TestCase):
+    """An unittest class for testing the admission of booking attempts."""
+
+    def setUp(self):
+        self.now = 0.0
+        self.controller = AdmissionController(rate=0.5, burst=2, max_queue=4, clock=lambda: self.now)
+        self.runs = []
+
+    def attempt(self, client):
+        """Submits an attempt recording the client when it is run."""
+
+        return self.controller.submit(client, lambda: self.runs.append(client) or True)
+
+    def test_token_bucket(self):
+        """Test if a bucket allows a burst, then one attempt per 1 / rate seconds."""
+
+        bucket = TokenBucket(0.5, 2, clock=lambda: self.now)
+        self.assertTrue(bucket.take())
+        self.assertTrue(bucket.take())
+        self.assertFalse(bucket.take())
+        self.assertEqual(bucket.retry_after(), 2.0)
+        self.now = 2.0
+        self.assertTrue(bucket.take())
+        self.assertFalse(bucket.take())
+
+    def test_rate_limit(self):
+        """Test if a client over the limit is rejected without affecting other clients."""
+
+        self.attempt("Ann")
+        self.attempt("Ann")
+        rejected = self.attempt("Ann")
+        self.assertEqual((rejected.status, rejected.reason, rejected.retry_after), ('rejected', 'rate limited', 2.0))
+        self.assertIn("try again in 2 seconds", rejected.notice())
+        self.assertEqual(self.attempt("Bob").status, 'queued')
+
+    def test_load_shedding(self):
+        """Test if attempts are shed when the queue is full, and admitted again once it has been served."""
+
+        for client in ("Ann", "Ann", "Bob", "Bob"):
+            self.attempt(client)
+        shed = self.attempt("Cy")
+        self.assertEqual((shed.status, shed.reason), ('rejected', 'queue full'))
+        self.assertEqual(self.controller.process(), 4)
+        self.assertEqual(self.attempt("Cy").status, 'queued')
+
+    def test_fair_order(self):
+        """Test if the queue is served round-robin across clients."""
+
+        self.controller.max_queue = 10
+        requests = [self.attempt(client) for client in ("Ann", "Ann", "Bob", "Bob", "Cy")]
+        self.assertEqual(self.controller.process(), 5)
+        self.assertEqual(self.runs, ["Ann", "Bob", "Cy", "Ann", "Bob"])
+        self.assertTrue(all(request.status == 'done' and request.result for request in requests))
+
+    def test_metrics(self):
+        """Test if the queue depth and the outcomes of the attempts are counted."""
+
+        for client in ("Ann", "Ann", "Ann", "Bob", "Cy", "Dan", "Eve"):
+            self.attempt(client)
+        self.controller.submit("Fay", lambda: 1 / 0)
+        metrics = self.controller.metrics()
+        self.assertEqual((metrics['queue_depth'], metrics['clients_waiting'], metrics['rate_limited'], metrics['shed']),
+                         (4, 3, 1, 3))
+        self.controller.process()
+        metrics = self.controller.metrics()
+        self.assertEqual((metrics['queue_depth'], metrics['peak_queue_depth'], metrics['admitted'],
+                          metrics['completed']), (0, 4, 4, 4))
+        self.assertIn("4 booking attempts admitted", self.controller.report())
+
+    def test_worker_thread(self):
+        """Test if a started controller runs the attempts on its worker thread."""
+
+        self.controller.start()
+        request = self.attempt("Ann")
+        self.assertTrue(request.wait(5))
+        self.assertEqual(self.runs, ["Ann"])
+
+    def test_session_rejects_over_limit(self):
+        """Test if the session tells a client over the limit to try again later."""
+
+        session = Session(AdmissionController(rate=0.5, burst=1, clock=lambda: self.now))
+        client = MagicMock()
+        client.name = "Ann Lee"
+        client.choose_reservation.return_value = (time(15, 30), 60)
+        with patch('builtins.input', return_value='15.03.2099 15:30'), \
+                patch('sys.stdout', new_callable=StringIO) as output:
+            self.assertTrue(session._session_make_reservation(client))
+            self.assertFalse(session._session_make_reservation(client))
+        self.assertEqual(client.choose_reservation.call_count, 2)
+        client.book.assert_called_once_with(datetime(2099, 3, 15).date(), time(15, 30), 60)
+        self.assertIn("You are trying to book too often.", output.getvalue())
+
+    def test_session_admits_only_the_booking(self):
+        """Test if the questions to the user are asked before the attempt is admitted, not inside it."""
+
+        controller = AdmissionController(rate=0.5, burst=1, clock=lambda: self.now)
+        session = Session(controller)
+        with isolated_state(now=datetime(2099, 3, 1, 8, 0)), \
+                patch('builtins.input', side_effect=['15.03.2099 15:30', '2']) as prompts, \
+                patch('sys.stdout', new_callable=StringIO), \
+                patch.object(controller, 'submit', wraps=controller.submit) as submit:
+            client = Client("Ann Lee")
+            self.assertTrue(session._session_make_reservation(client))
+            function = submit.call_args.args[1]
+        self.assertEqual(prompts.call_count, 2)
+        self.assertEqual((function.func, function.args), (client.book, (datetime(2099, 3, 15).date(), time(15, 30), 60)))
+        self.assertEqual(controller.metrics()['completed'], 1)
+
+    def test_rate_must_be_positive(self):
+        """Test if a bucket or a controller without a positive rate is rejected."""
+
+        for rate in (0, -1):
+            with self.assertRaises(ValueError):
+                TokenBucket(rate, 1)
+            with self.assertRaises(ValueError):
+                AdmissionController(rate=rate)
+
+
+class TestRouter(unittest.TestCase):
+    """An unittest class for testing clubs served by worker processes."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.clubs = ("Riverside", "Hillside", "Lakeside", "Downtown")
+        cls.router = Router({"Riverside": None, "Hillside": None, "Lakeside": ClubConfig(('08:00', '20:00'), 30, (60,)),
+                             "Downtown": None}, workers=2)
+        cls.day = datetime(2099, 3, 17).date()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.router.close()
+
+    def test_shards(self):
+        """Test if clubs are assigned to workers by a stable hash."""
+
+        self.assertEqual(self.router.workers, 2)
+        self.assertEqual(shard_of("Riverside", 2), shard_of("Riverside", 2))
+        self.assertEqual({shard_of(club, 2) for club in self.clubs}, {0, 1})
+        with self.assertRaises(KeyError):
+            self.router.book("Nowhere", "Ann Lee", self.day, time(10, 0), 60)
+
+    def test_clubs_are_separate(self):
+        """Test if the same time can be booked at different clubs, but not twice at one club."""
+
+        self.assertTrue(self.router.book("Riverside", "Ann Lee", self.day, time(10, 0), 60))
+        self.assertTrue(self.router.book("Hillside", "Bob Ray", self.day, time(10, 0), 90))
+        self.assertFalse(self.router.book("Riverside", "Cy Twombly", self.day, time(10, 30), 30))
+        self.assertFalse(self.router.book("Lakeside", "Cy Twombly", self.day, time(10, 0), 90))
+        self.assertEqual(self.router.schedule("Riverside", self.day - timedelta(days=7), self.day + timedelta(days=7)),
+                         {self.day: [("Ann Lee", time(10, 0), time(11, 0))]})
+        self.assertEqual(self.router.schedule("Hillside", self.day, self.day),
+                         {self.day: [("Bob Ray", time(10, 0), time(11, 30))]})
+        self.assertTrue(self.router.cancel("Hillside", "Bob Ray", self.day))
+        self.assertEqual(self.router.schedule("Hillside", self.day, self.day), {})
+
+    def test_find_free(self):
+        """Test if free courts are found across all clubs."""
+
+        day = self.day + timedelta(days=7)
+        self.router.book("Downtown", "Dee Dee", day, time(18, 0), 60)
+        self.assertEqual(self.router.find_free(day, time(18, 30), 60), ["Riverside", "Hillside", "Lakeside"])
+        self.assertEqual(self.router.find_free(day, time(19, 30), 60), ["Riverside", "Hillside", "Downtown"])
+        self.assertEqual(self.router.find_free(day, time(18, 0), 30), ["Riverside", "Hillside"])
+
+    def test_book_many(self):
+        """Test if many bookings are made across workers, with the outcomes in the order of the bookings."""
+
+        day = self.day + timedelta(days=14)
+        bookings = [(club, f"Member{index} Many", day, time(8 + index, 0), 60)
+                    for index in range(3) for club in self.clubs]
+        bookings.append(("Riverside", "Late Many", day, time(8, 0), 60))
+        self.assertEqual(self.router.book_many(bookings), [True] * 12 + [False])
+
+    def test_club_state(self):
+        """Test if a club state is only installed on the classes while it is active."""
+
+        clients, reservations = Client.list_of_client(), Reservation.list_of_reservations()
+        state = ClubState()
+        with state.active():
+            Client("Eve Club")
+            self.assertIs(Client.list_of_client(), state.clients)
+        self.assertIs(Client.list_of_client(), clients)
+        self.assertIs(Reservation.list_of_reservations(), reservations)
+        self.assertEqual([client.name for client in state.clients], ["Eve Club"])
+
+    def test_club_state_books_without_prompts(self):
+        """Test if a club state books and checks free courts with the rules of Client, never asking for input."""
+
+        state = ClubState(ClubConfig(('08:00', '20:00'), 30, (60, 90)))
+        with patch('builtins.input', side_effect=AssertionError("No prompt expected.")):
+            self.assertTrue(state.book("Ann Lee", self.day, time(10, 0), 60))
+            self.assertFalse(state.book("Bob Ray", self.day, time(10, 30), 60))
+            self.assertFalse(state.book("Bob Ray", self.day, time(12, 0), 45))
+            self.assertFalse(state.is_free(self.day, time(9, 30), 60))
+            self.assertTrue(state.is_free(self.day, time(9, 0), 60))
+            self.assertFalse(state.is_free(self.day, time(19, 30), 60))
+        self.assertEqual(len(state.reservations), 1)
+
+    def test_club_state_cancel_of_unknown_client(self):
+        """Test if cancelling for a client the club does not know is refused without creating the client."""
+
+        state = ClubState()
+        self.assertTrue(state.book("Ann Lee", self.day, time(10, 0), 60))
+        self.assertFalse(state.cancel("Nobody Known", self.day))
+        self.assertEqual([client.name for client in state.clients], ["Ann Lee"])
+        self.assertEqual(len(state.reservations), 1)
+
+    def test_cpu_times(self):
+        """Test if the CPU time of every worker is reported."""
+
+        cpu_times = self.router.cpu_times()
+        self.assertEqual(len(cpu_times), self.router.workers)
+        self.assertTrue(all(cpu_time >= 0 for cpu_time in cpu_times))
+
+
+class TestMemoryProfile(unittest.TestCase):
+    """A class that contains unittests for the memory profile of the reservation system."""
+
+    def test_profile_within_budgets(self):
+        """Test if a small club stays within the memory budgets per client and per reservation."""
+
+        per_client, per_reservation = memory_profile.profile_club(50, 400)
+        self.assertGreater(per_client['Client objects'], 0)
+        self.assertGreater(per_reservation['Reservation objects'], 0)
+        self.assertEqual(memory_profile.check_budgets(per_client, per_reservation), [])
+
+    def test_profile_leaves_state_untouched(self):
+        """Test if profiling does not change the clients and reservations of the program."""
+
+        clients = list(Client.list_of_client())
+        reservations = list(Reservation.list_of_reservations())
+        memory_profile.profile_club(10, 20)
+        self.assertEqual(Client.list_of_client(), clients)
+        self.assertEqual(Reservation.list_of_reservations(), reservations)
+
+    def test_exceeded_budget(self):
+        """Test if a profile over a budget is reported."""
+
+        exceeded = memory_profile.check_budgets({'Client objects': 100}, {'Reservation objects': 300},
+                                                {'client': 200, 'reservation': 200})
+        self.assertEqual(exceeded, ["300 bytes per reservation exceed the budget of 200 bytes"])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,148 @@
+"""This module records interactive sessions to transcripts and replays them non-interactively.
+
+A transcript is a JSON file with the moment the session started, the configuration of the club,
+the clients and reservations existing at that moment, the answers the user typed with the moments
+they were typed, and everything the session printed, prompts included. A replay runs on a separate
+state set up from the recorded clients and reservations, see the isolation module. It answers the
+prompts from the transcript with the clock showing the moment each answer was typed, and compares
+the printed output with the recorded one.
+
+It includes the following functions:
+- record: Runs an interactive session and saves its transcript.
+- replay: Replays a transcript and compares the output with the recorded one.
+- replay_many: Replays transcripts, optionally in parallel processes, and reports the throughput.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import date, datetime, time
+from io import StringIO
+import json
+import sys
+from time import perf_counter
+
+from isolation import answering, current_state, isolated_state
+from opening_hours import ClubConfig
+from reservation import Client
+from session import Session
+
+
+def _comparable(output):
+    """Returns the lines of the output without the times exports took, which differ from run to run."""
+
+    return [line for line in output.splitlines() if not line.endswith(" seconds.")]
+
+
+class _Tee:
+    """Writes to the given stream and keeps a copy of everything written."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.copy = StringIO()
+
+    def write(self, text):
+        self.copy.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def record(path):
+    """Runs an interactive session and saves its transcript to the given path."""
+
+    started = datetime.now()
+    clients, records = current_state()
+    answers = []
+    answered = []
+    tee = _Tee(sys.stdout)
+
+    def recording_input(prompt=''):
+        tee.write(prompt)
+        tee.flush()
+        line = sys.stdin.readline()
+        if not line:
+            raise EOFError
+        answer = line.rstrip('\n')
+        answers.append(answer)
+        answered.append(datetime.now().isoformat())
+        tee.copy.write(f"{answer}\n")
+        return answer
+
+    with answering(recording_input), redirect_stdout(tee):
+        try:
+            Session().main()
+        except EOFError:
+            pass
+    reservations = [[day.isoformat(), name, start_time.isoformat(timespec='minutes'),
+                     end_time.isoformat(timespec='minutes')] for day, name, start_time, end_time in records]
+    with open(path, 'w', encoding='utf-8') as transcript_file:
+        json.dump({"started": started.isoformat(), "config": Client.config.to_dict(), "clients": clients,
+                   "reservations": reservations, "answers": answers, "answered": answered,
+                   "output": tee.copy.getvalue()}, transcript_file, indent=2)
+    print(f"The transcript has been saved in {path} file.")
+
+
+def replay(path):
+    """Replays a transcript. Returns a tuple of the number of answered prompts,
+    the time the replay took, and the index of the first differing output line or None.
+    """
+
+    with open(path, 'r', encoding='utf-8') as transcript_file:
+        transcript = json.load(transcript_file)
+    answers = iter(transcript["answers"])
+    moments = iter(transcript.get("answered", ()))
+    records = [(date.fromisoformat(day), name, time.fromisoformat(start_time), time.fromisoformat(end_time))
+               for day, name, start_time, end_time in transcript.get("reservations", ())]
+    config = ClubConfig.from_dict(transcript["config"]) if "config" in transcript else None
+    output = StringIO()
+
+    def replaying_input(prompt=''):
+        output.write(prompt)
+        answer = next(answers, None)
+        if answer is None:
+            raise EOFError
+        moment = next(moments, None)
+        if moment is not None:
+            clock.moment = datetime.fromisoformat(moment)
+        output.write(f"{answer}\n")
+        return answer
+
+    started = perf_counter()
+    with isolated_state(datetime.fromisoformat(transcript["started"]), transcript.get("clients", ()), records,
+                        config) as clock, answering(replaying_input), redirect_stdout(output):
+        try:
+            Session().main()
+        except EOFError:
+            pass
+    elapsed = perf_counter() - started
+
+    expected, actual = _comparable(transcript["output"]), _comparable(output.getvalue())
+    difference = next((index for index, (line, other) in enumerate(zip(expected, actual)) if line != other), None)
+    if difference is None and len(expected) != len(actual):
+        difference = min(len(expected), len(actual))
+    return len(transcript["answers"]), elapsed, difference
+
+
+def replay_many(paths, jobs=1):
+    """Replays transcripts, in the given number of parallel processes, and prints the results
+    and the throughput. Returns True if the output of all transcripts matched.
+    """
+
+    started = perf_counter()
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(replay, paths))
+    else:
+        results = [replay(path) for path in paths]
+    elapsed = perf_counter() - started
+
+    for path, (_, _, difference) in zip(paths, results):
+        if difference is None:
+            print(f"{path}: OK")
+        else:
+            print(f"{path}: the output differs from line {difference + 1}")
+    operations = sum(result[0] for result in results)
+    print(f"{len(paths)} sessions with {operations} operations were replayed in {elapsed:.3f} seconds, "
+          f"{operations / max(elapsed, 1e-9):.0f} operations per second.")
+    return all(result[2] is None for result in results)